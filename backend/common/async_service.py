@@ -0,0 +1,38 @@
+from typing import Any, Optional, Type
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+def dump(result: Any, model: Type[BaseModel]):
+    """Build response model(s) from ORM result(s). Must run inside the sync bridge."""
+    if result is None:
+        return None
+    if isinstance(result, list):
+        return [model.model_validate(r, from_attributes=True) for r in result]
+    return model.model_validate(result, from_attributes=True)
+
+class AsyncServiceProxy:
+    """
+    Async variant of a sync service class.
+    Each method call runs the sync implementation through AsyncSession.run_sync,
+    so queries await the async driver (asyncpg / aiosqlite) on the event loop
+    instead of holding a threadpool thread.
+
+    ORM objects must not lazy-load outside the bridge, so pass `serialize=<schema>`
+    to build the response model(s) inside it.
+    """
+    service_class: Optional[type] = None
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def method(*args, serialize: Optional[Type[BaseModel]] = None, **kwargs):
+            def run(sync_db):
+                result = getattr(self.service_class(sync_db), name)(*args, **kwargs)
+                return dump(result, serialize) if serialize else result
+            return await self.db.run_sync(run)
+
+        return method
@@ -1,4 +1,4 @@
-from fastapi import Request, status
+from fastapi import Request, Response, status
 from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -25,6 +25,9 @@ async def http_exception_handler(request: Request, exc: StarletteHTTPException):
     """
     Handle standard HTTP exceptions (400, 401, 403, 404, etc).
     """
+    if exc.status_code == status.HTTP_304_NOT_MODIFIED:
+        # Conditional GET hit (see utils/catalog.py): validators only, no body
+        return Response(status_code=exc.status_code, headers=exc.headers)
     return JSONResponse(
         status_code=exc.status_code,
         content=error_response(
@@ -1,32 +1,98 @@
 from datetime import datetime, timedelta
+from sqlalchemy import select, update, func
 from .database import SessionLocal
 from . import models
-from .utils import scheduler
+from .utils import scheduler, order_archive, order_events, order_status
+
+CANCEL_AFTER_MINUTES = 30
+CANCEL_BATCH_SIZE = 1000
+
+def cancel_stale_orders(db, older_than: datetime, batch_size: int = CANCEL_BATCH_SIZE, on_batch=None) -> int:
+    """
+    Cancels orders still 'created' before `older_than`, one set-based
+    UPDATE ... RETURNING per chunk of `batch_size` rows (committed per chunk).
+    `on_batch(rows)` receives the cancelled rows (id, user_id, restaurant_id, ...) of each committed chunk.
+    """
+    total = 0
+    while True:
+        stale = select(models.Order.id).where(
+            models.Order.status == 'created',
+            models.Order.created_at < older_than
+        ).order_by(models.Order.created_at).limit(batch_size)
+
+        # status is re-checked on the outer UPDATE so a concurrent run can't cancel (and notify) twice
+        rows = db.execute(
+            update(models.Order)
+            .where(models.Order.id.in_(stale.scalar_subquery()), models.Order.status == 'created')
+            .values(status='cancelled', updated_at=func.now())
+            .returning(
+                models.Order.id, models.Order.user_id, models.Order.restaurant_id,
+                models.Order.batch_id, models.Order.status, models.Order.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        order_status.refresh_batch_status(db, {row.batch_id for row in rows})
+        order_status.bump_bill_versions(db, {row.user_id for row in rows})
+        db.commit()
+
+        if rows and on_batch:
+            on_batch(rows)
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+
+def _notify_cancelled(rows):
+    # One push per checkout, not per line: a large backlog mustn't flood the dispatcher
+    order_status.notify_customers(rows, order_status.CANCELLED, reason="because it wasn't confirmed in time")
+    # Open order/kitchen streams (the bulk UPDATE bypasses the ORM events)
+    order_events.publish_orders(row._mapping for row in rows)
 
 def cancel_pending_orders_job():
-    """Calculates orders stuck in 'created' state for > 30 mins and cancels them."""
+    """Cancels orders stuck in 'created' state for > 30 mins, in chunks."""
     db = SessionLocal()
     try:
-        # 30 minutes ago
-        timeout_threshold = datetime.utcnow() - timedelta(minutes=30)
-        
-        pending_orders = db.query(models.Order).filter(
-            models.Order.status == 'created', 
-            models.Order.created_at < timeout_threshold
-        ).all()
-        
-        if pending_orders:
-            print(f"Found {len(pending_orders)} stale orders to cancel.")
-            for order in pending_orders:
-                order.status = 'cancelled'
-                # Optionally send push notification here too
-            
-            db.commit()
+        timeout_threshold = datetime.utcnow() - timedelta(minutes=CANCEL_AFTER_MINUTES)
+        cancelled = cancel_stale_orders(db, timeout_threshold, on_batch=_notify_cancelled)
+        if cancelled:
+            print(f"Cancelled {cancelled} stale orders.")
     except Exception as e:
         print(f"Error in auto-cancel job: {e}")
     finally:
         db.close()
 
+def rating_consistency_job():
+    """Repairs food/restaurant rating aggregates that drifted from the feedbacks table."""
+    from .utils import ratings
+    db = SessionLocal()
+    try:
+        drift = ratings.check_consistency(db, repair=True)
+        if drift:
+            print(f"Repaired {len(drift)} drifted rating aggregates: {drift[:10]}")
+    except Exception as e:
+        print(f"Error in rating consistency job: {e}")
+    finally:
+        db.close()
+
+def archive_orders_job():
+    """Moves finished orders older than ORDER_ARCHIVE_DAYS to orders_archive; keeps Postgres partitions ahead."""
+    db = SessionLocal()
+    try:
+        cutoff = datetime.utcnow() - timedelta(days=order_archive.ORDER_ARCHIVE_DAYS)
+        moved = order_archive.archive_orders(db, cutoff)
+        if moved:
+            print(f"Archived {moved} orders.")
+        if db.bind.dialect.name == "postgresql":
+            with db.bind.begin() as conn:
+                if order_archive.is_partitioned(conn):
+                    order_archive.ensure_partitions(conn)
+                    dropped = order_archive.drop_empty_partitions(conn, cutoff)
+                    if dropped:
+                        print(f"Dropped empty order partitions: {dropped}")
+    except Exception as e:
+        print(f"Error in order archive job: {e}")
+    finally:
+        db.close()
+
 def register_system_jobs():
     """Register all system maintenance jobs."""
     # Run every 5 minutes
@@ -37,3 +103,18 @@ def register_system_jobs():
         id='auto_cancel_orders', 
         replace_existing=True
     )
+    # Nightly
+    scheduler.schedule_task(
+        rating_consistency_job,
+        'interval',
+        hours=24,
+        id='rating_consistency',
+        replace_existing=True
+    )
+    scheduler.schedule_task(
+        archive_orders_job,
+        'interval',
+        hours=24,
+        id='archive_orders',
+        replace_existing=True
+    )
@@ -0,0 +1,54 @@
+from sqlalchemy.orm import selectinload, joinedload
+from . import models
+
+# Eager-loading options matching the nested response schemas.
+# Each relationship is fetched with one extra SELECT ... IN (...) per list,
+# instead of one lazy load per row during serialization.
+# Built lazily because backref attributes (Order.food, ...) only exist once mappers are configured.
+
+def food_options():
+    """schemas.Food -> variants, images"""
+    return [
+        selectinload(models.Food.variants),
+        selectinload(models.Food.images),
+    ]
+
+def order_options():
+    """schemas.Order -> food (variants, images), variant, feedbacks"""
+    food = selectinload(models.Order.food)
+    return [
+        food.selectinload(models.Food.variants),
+        food.selectinload(models.Food.images),
+        selectinload(models.Order.variant),
+        selectinload(models.Order.feedbacks),
+    ]
+
+def archived_order_options():
+    """order_options for ArchivedOrder (same schema)"""
+    food = selectinload(models.ArchivedOrder.food)
+    return [
+        food.selectinload(models.Food.variants),
+        food.selectinload(models.Food.images),
+        selectinload(models.ArchivedOrder.variant),
+        selectinload(models.ArchivedOrder.feedbacks),
+    ]
+
+def collection_options():
+    """schemas.Collection -> foods (variants, images)"""
+    foods = selectinload(models.Collection.foods)
+    return [
+        foods.selectinload(models.Food.variants),
+        foods.selectinload(models.Food.images),
+    ]
+
+def favorite_options():
+    """Favorites are returned as their schemas.Food"""
+    food = selectinload(models.Favorite.food)
+    return [
+        food.selectinload(models.Food.variants),
+        food.selectinload(models.Food.images),
+    ]
+
+def user_coupon_options():
+    """schemas.UserCoupon -> coupon"""
+    return [joinedload(models.UserCoupon.coupon)]
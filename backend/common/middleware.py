@@ -1,44 +1,66 @@
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse, Response
 from .responses import success_response
 import json
 
-class ResponseWrapperMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-
-        # Skip non-success and already-handled errors
-        if response.status_code >= 400:
-            return response
-            
-        # Skip weird content types (like images, streams)
-        if "application/json" not in response.headers.get("content-type", ""):
-            return response
-
-        # Read the response body
-        response_body = [section async for section in response.body_iterator]
-        response.body_iterator = iter(response_body)
-        
-        try:
-            body_content = b"".join(response_body).decode()
-            if not body_content:
-                return response
-                
-            data = json.loads(body_content)
-            
-            # Use standard wrapper
-            wrapped = success_response(data=data)
-            
-            # Create new headers without Content-Length (it changes)
-            new_headers = dict(response.headers)
-            if "content-length" in new_headers:
-                del new_headers["content-length"]
-                
-            return JSONResponse(
-                content=wrapped,
-                status_code=response.status_code,
-                headers=new_headers
-            )
-        except Exception:
-            # If parsing fails or anything goes wrong, return original
-            return response
+# success_response(data=...) split around `data`, so the envelope can be
+# written around the already-serialized body without parsing it.
+_ENVELOPE = json.dumps(success_response(data="__DATA__"), separators=(",", ":")).encode()
+ENVELOPE_PREFIX, ENVELOPE_SUFFIX = _ENVELOPE.split(b'"__DATA__"')
+
+class ResponseWrapperMiddleware:
+    """
+    Pure ASGI middleware wrapping successful JSON responses in the
+    {success, message, data, error} envelope.
+    Body chunks are streamed through with the envelope bytes prepended/appended,
+    so the payload is never buffered, decoded or re-encoded.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        wrap = False
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal wrap, started
+
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = b""
+                content_length = None
+                for key, value in headers:
+                    if key == b"content-type":
+                        content_type = value
+                    elif key == b"content-length":
+                        content_length = value
+
+                # Skip non-success, weird content types (images, streams) and empty bodies
+                wrap = (
+                    message["status"] < 400
+                    and b"application/json" in content_type
+                    and content_length != b"0"
+                )
+                if wrap and content_length is not None:
+                    new_length = int(content_length) + len(ENVELOPE_PREFIX) + len(ENVELOPE_SUFFIX)
+                    headers = [(k, v) for k, v in headers if k != b"content-length"]
+                    headers.append((b"content-length", str(new_length).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+                return
+
+            if message["type"] == "http.response.body" and wrap:
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                if body and not started:
+                    body = ENVELOPE_PREFIX + body
+                    started = True
+                if not more_body and started:
+                    body = body + ENVELOPE_SUFFIX
+                message = {**message, "body": body}
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
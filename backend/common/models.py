@@ -1,9 +1,18 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Float, Boolean, DateTime, Date, Table as SATable
+from sqlalchemy import Column, ForeignKey, Integer, String, Float, Boolean, DateTime, Date, Index, UniqueConstraint, JSON, Table as SATable
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.dialects import sqlite
 from .database import Base
 from datetime import datetime
 
+# Timestamps used as pagination keys. SQLite writes CURRENT_TIMESTAMP as
+# 'YYYY-MM-DD HH:MM:SS'; store ORM-written values in the same shape so
+# text comparison against cursor values stays exact.
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
 class User(Base):
     """
     Unified User model replacing 'Customer' from main_backend and 'User' from mobile_auth.
@@ -51,7 +60,10 @@ class Restaurant(Base):
     image_url = Column(String, nullable=True)
     latitude = Column(Float, nullable=True)
     longitude = Column(Float, nullable=True)
+    geo_cell = Column(String, nullable=True, index=True) # Grid bucket for nearest lookup (see utils/geo.py)
     is_active = Column(Boolean, default=True)
+    rating_sum = Column(Integer, default=0, server_default="0") # Running totals over all its foods, see utils/ratings.py
+    rating_count = Column(Integer, default=0, server_default="0")
     
     # Owner/Manager (Optional link to User)
     owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -61,6 +73,10 @@ class Restaurant(Base):
     tables = relationship("Table", backref="restaurant")
     orders = relationship("Order", backref="restaurant")
 
+    @property
+    def rating(self):
+        return round(self.rating_sum / self.rating_count, 1) if self.rating_count else 0.0
+
 class Auth(Base):
     """
     Auth model for OTP storage from mobile_auth.
@@ -86,15 +102,44 @@ class Food(Base):
     offer_price = Column(Float, nullable=True) # Deprecated but kept for safety
     food_quantity = Column(Integer)
     image_url = Column(String, nullable=True)
+    thumbnail_url = Column(String, nullable=True) # Smallest derivative of image_url, see utils/images.py
     description = Column(String, nullable=True) # New: Food Description
     is_veg = Column(Boolean, default=False) # New: Dietary preference
     rating = Column(Float, default=0.0) # New: Cached average rating
+    rating_sum = Column(Integer, default=0, server_default="0") # Running totals behind `rating`, see utils/ratings.py
+    rating_count = Column(Integer, default=0, server_default="0")
 
     orders = relationship("Order", backref="food")
     variants = relationship("FoodVariant", backref="food")
     favorites = relationship("Favorite", backref="food") # Relationship to favorites
     images = relationship("FoodImage", backref="food") # Multiple images
 
+    # Keyset pagination of the menu per sort option
+    __table_args__ = (
+        Index("ix_foods_restaurant_food_id", "restaurant_id", "food_id"),
+        Index("ix_foods_restaurant_price_food_id", "restaurant_id", "food_price", "food_id"),
+        Index("ix_foods_restaurant_rating_food_id", "restaurant_id", "rating", "food_id"),
+    )
+
+class MenuFacet(Base):
+    """
+    Per-restaurant, per-category summary for the menu filter sheet.
+    Maintained on Food writes by common/utils/menu_facets.py.
+    """
+    __tablename__ = "menu_facets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id"), index=True)
+    food_category = Column(String, nullable=False, default="") # "" for uncategorised foods
+    item_count = Column(Integer, default=0)
+    veg_count = Column(Integer, default=0)
+    min_price = Column(Float, nullable=True)
+    max_price = Column(Float, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("restaurant_id", "food_category", name="uq_menu_facets_restaurant_category"),
+    )
+
 class FoodImage(Base):
     """
     Gallery images for a food item.
@@ -104,6 +149,20 @@ class FoodImage(Base):
     id = Column(Integer, primary_key=True, index=True)
     food_id = Column(Integer, ForeignKey("foods.food_id"))
     image_url = Column(String)
+    derivatives = Column(JSON, nullable=True) # {"webp": {"160": url, ...}, "avif": {...}}, filled by utils/images.py
+
+class ImageDerivative(Base):
+    """
+    Derivative URLs of an uploaded original, written when processing finishes
+    (utils/images.py). Lets a food created later, in any worker, from an
+    /menu/upload-image URL get its thumbnail.
+    """
+    __tablename__ = "image_derivatives"
+
+    image_url = Column(String, primary_key=True)
+    digest = Column(String, index=True) # Content hash naming the original and its derivatives
+    derivatives = Column(JSON)
+    created_at = Column(DateTime, server_default=func.now())
 
 class UserAddress(Base):
     """
@@ -171,12 +230,99 @@ class Order(Base):
     # Status: created, pending, progress, finished, dispatched, delivered, cancelled
     status = Column(String, default="created") 
     
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    # default too: tables upgraded in place (utils/schema.py) keep the baseline column without a server default
+    updated_at = Column(Timestamp, default=func.now(), server_default=func.now(), onupdate=func.now())
 
-    feedbacks = relationship("Feedback", backref="order")
+    feedbacks = relationship("Feedback", primaryjoin="Order.id == foreign(Feedback.order_id)", backref="order")
     # address = relationship("UserAddress")
 
+    archived = False # See ArchivedOrder
+
+    # Keyset pagination: newest-first history, per-user history, FIFO kitchen queue
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_user_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_orders_restaurant_status_created_at_id", "restaurant_id", "status", "created_at", "id"),
+        # Kitchen board: the snapshot filters on status, deltas only on updated_at (any status,
+        # so delivered/cancelled lines can be reported as removed)
+        Index("ix_orders_restaurant_status_updated_at", "restaurant_id", "status", "updated_at"),
+        Index("ix_orders_restaurant_updated_at", "restaurant_id", "updated_at"),
+        # Stale order cancellation (common/jobs.py)
+        Index("ix_orders_status_created_at", "status", "created_at"),
+    )
+
+class OrderBatch(Base):
+    """
+    Header of one checkout: the Order rows sharing its batch_id are the lines.
+    Written in the same transaction as the lines; `status` is the least advanced
+    line that isn't cancelled (see utils/order_status.py).
+    """
+    __tablename__ = "order_batches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    batch_id = Column(String, unique=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    restaurant_id = Column(Integer, ForeignKey("restaurants.id"), default=1)
+    address_id = Column(Integer, ForeignKey("user_addresses.id"), nullable=True)
+
+    item_count = Column(Integer, default=0) # Lines (cart items)
+    subtotal = Column(Float, default=0.0)
+    discount_amount = Column(Float, default=0.0)
+    final_amount = Column(Float, default=0.0)
+    coupon_code = Column(String, nullable=True)
+    status = Column(String, default="created")
+
+    created_at = Column(Timestamp, server_default=func.now())
+    updated_at = Column(Timestamp, server_default=func.now(), onupdate=func.now())
+
+    # Order history: newest first, per user and overall
+    __table_args__ = (
+        Index("ix_order_batches_user_created_at_id", "user_id", "created_at", "id"),
+        Index("ix_order_batches_created_at_id", "created_at", "id"),
+    )
+
+class Invoice(Base):
+    """
+    Stored /bill result for one (user, scope), computed at the user's BillVersion
+    `version`. Every change to the user's billable lines (a new checkout or a
+    cancelled line; see utils/order_status.py) advances that version, so a repeated
+    bill is one unique-key lookup and an invoice from an older version is a miss.
+    """
+    __tablename__ = "invoices"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    scope = Column(String, nullable=False) # batch, date range and coupon the bill was asked for
+    batch_id = Column(String, nullable=True)
+    date_from = Column(Date, nullable=True)
+    date_to = Column(Date, nullable=True)
+    coupon_code = Column(String, nullable=True)
+
+    order_count = Column(Integer, default=0) # Billable (not cancelled) lines
+    subtotal = Column(Float, default=0.0)
+    discount_amount = Column(Float, default=0.0)
+    total_amount = Column(Float, default=0.0)
+    expires_at = Column(DateTime, nullable=True) # Coupon validity: recomputed after it
+    version = Column(Integer, default=0, server_default="0") # BillVersion.version the lines were read at
+
+    created_at = Column(Timestamp, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "scope", name="uq_invoices_user_scope"),
+    )
+
+class BillVersion(Base):
+    """
+    Per-user counter of changes to billable lines, advanced in the writing
+    transaction. Stored invoices are only valid at the version they were computed at.
+    """
+    __tablename__ = "bill_versions"
+
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
 class Table(Base):
     __tablename__ = "tables"
 
@@ -209,10 +355,14 @@ class Feedback(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id")) # Renamed from customer_id
-    order_id = Column(Integer, ForeignKey("orders.id"))
+    order_id = Column(Integer)
     rate = Column(Integer)
     comment = Column(String)
 
+    # No database-level FK to orders: Postgres partitions orders on created_at, so orders.id
+    # alone can't be referenced, and archived orders move to orders_archive with their
+    # feedback left in place (see utils/order_archive.py).
+
 class Waiting(Base):
     __tablename__ = "waitings"
 
@@ -296,3 +446,56 @@ class UserCoupon(Base):
     # Relationships
     user = relationship("User", backref="user_coupons") # Avoid conflict with backref="coupons" if any
     coupon = relationship("Coupon")
+
+class SchedulerLease(Base):
+    """
+    Leader lease for scheduled jobs on databases without advisory locks (see utils/scheduler.py)
+    """
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String)
+    expires_at = Column(DateTime)
+
+class CatalogVersion(Base):
+    """
+    Per-restaurant catalog version, bumped with every menu/table/restaurant write
+    (restaurant_id 0: banners and collections). Drives ETags, see utils/catalog.py.
+    """
+    __tablename__ = "catalog_versions"
+
+    restaurant_id = Column(Integer, primary_key=True, autoincrement=False)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+class ArchivedOrder(Base):
+    """
+    Delivered/cancelled orders moved out of `orders` after ORDER_ARCHIVE_DAYS
+    (see utils/order_archive.py). Same columns, no foreign keys, read-only.
+    """
+    __tablename__ = "orders_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    batch_id = Column(String, index=True) # Order history detail (OrderBatch lines)
+    restaurant_id = Column(Integer)
+    food_id = Column(Integer)
+    variant_id = Column(Integer, nullable=True)
+    user_id = Column(Integer)
+    address_id = Column(Integer, nullable=True)
+    quantity = Column(Integer)
+    price_at_order = Column(Float)
+    status = Column(String)
+    created_at = Column(Timestamp)
+    updated_at = Column(Timestamp)
+    archived_at = Column(Timestamp)
+
+    food = relationship("Food", primaryjoin="foreign(ArchivedOrder.food_id) == Food.food_id", viewonly=True)
+    variant = relationship("FoodVariant", primaryjoin="foreign(ArchivedOrder.variant_id) == FoodVariant.id", viewonly=True)
+    feedbacks = relationship("Feedback", primaryjoin="ArchivedOrder.id == foreign(Feedback.order_id)", viewonly=True)
+
+    archived = True
+
+    # Deep history only: per-user, newest first
+    __table_args__ = (
+        Index("ix_orders_archive_user_created_at_id", "user_id", "created_at", "id"),
+    )
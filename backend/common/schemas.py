@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, validator, ConfigDict
 from datetime import datetime, date
 
@@ -79,6 +79,9 @@ class RestaurantCreate(RestaurantBase):
 
 class Restaurant(RestaurantBase):
     id: int
+    rating: float = 0.0
+    rating_count: int = 0
+    distance_km: Optional[float] = None # Set when listing by user location
     class Config:
         orm_mode = True
 
@@ -148,6 +151,7 @@ class FoodImageBase(BaseModel):
 class FoodImage(FoodImageBase):
     id: int
     food_id: int
+    derivatives: Optional[Dict[str, Dict[str, str]]] = None # format -> width -> URL, once processed
     class Config:
         orm_mode = True
 
@@ -167,9 +171,12 @@ class FoodCreate(FoodBase):
 
 class Food(FoodBase):
     food_id: int
+    thumbnail_url: Optional[str] = None
     rating: float = 0.0
+    rating_count: int = 0
     variants: List[FoodVariant] = [] # Return variants
     images: List[FoodImage] = [] # Multiple images
+    search_score: Optional[float] = None # Set when the listing was searched
     # is_favorite: bool = False # TODO: Add this dynamically based on user context if needed
     
     class Config:
@@ -212,10 +219,28 @@ class OrderCreate(OrderBase):
 
 class OrderUpdateStatus(BaseModel):
     status: str
+    expected_status: Optional[str] = None # Only apply if the order is still in this status
+
+class BulkOrderStatusUpdate(BaseModel):
+    status: str
+    batch_id: Optional[str] = None # Every line of one checkout...
+    order_ids: Optional[List[int]] = None # ...or these orders (exactly one of the two)
+    expected_status: Optional[str] = None
+
+class SkippedOrder(BaseModel):
+    id: int
+    status: str
+
+class BulkOrderStatusResult(BaseModel):
+    status: str
+    updated: List[int] = []
+    skipped: List[SkippedOrder] = [] # Lines whose current status doesn't allow the move
+    not_found: List[int] = []
 
 class Order(OrderBase):
     id: int
     user_id: int
+    batch_id: Optional[str] = None # Checkout this line belongs to (see OrderBatch)
     status: str
     price_at_order: Optional[float] = None  # Snapshot of price at order time
     created_at: Optional[datetime]
@@ -223,10 +248,65 @@ class Order(OrderBase):
     food: Optional[Food] = None
     variant: Optional[FoodVariant] = None
     feedbacks: List[Feedback] = []
+    archived: bool = False # Served from the order archive (include_archive=true)
 
     class Config:
         orm_mode = True
 
+class OrderBatch(BaseModel):
+    """Order history entry: one checkout, without its lines."""
+    id: int
+    batch_id: str
+    user_id: int
+    restaurant_id: Optional[int] = None
+    address_id: Optional[int] = None
+    item_count: int = 0
+    subtotal: float = 0.0
+    discount_amount: float = 0.0
+    final_amount: float = 0.0
+    coupon_code: Optional[str] = None
+    status: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class OrderBatchDetail(OrderBatch):
+    orders: List[Order] = []
+
+class Bill(BaseModel):
+    """GET /bill/{user_id}: the user's lines (cancelled ones excluded) in the requested scope."""
+    user_id: int
+    batch_id: Optional[str] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    coupon_code: Optional[str] = None
+    order_count: int = 0
+    subtotal: float = 0.0
+    discount_amount: float = 0.0
+    total_amount: float = 0.0
+    created_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class BoardOrder(BaseModel):
+    """Slim kitchen board row: no nested food/variant/feedback objects."""
+    id: int
+    batch_id: Optional[str] = None
+    food_id: Optional[int] = None
+    food_name: Optional[str] = None
+    variant_id: Optional[int] = None
+    variant_name: Optional[str] = None
+    quantity: Optional[int] = None
+    status: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class KitchenBoard(BaseModel):
+    version: Optional[str] = None # Pass back as since_version to get only what changed
+    full: bool # True: `orders` is the whole board; False: apply as a delta
+    orders: List[BoardOrder] = [] # Added or changed active orders
+    removed: List[int] = [] # Ids that left the board (delivered / cancelled)
+
 # --- Table Schemas ---
 class TableBase(BaseModel):
     name: int
@@ -306,6 +386,13 @@ class Collection(CollectionBase):
     foods: List[Food] = [] # Nested objects
     model_config = ConfigDict(from_attributes=True)
 
+class HomeScreen(BaseModel):
+    banners: List[Banner] = []
+    collections: List[Collection] = []
+    restaurants: List[Restaurant] = [] # Nearest first when lat/lng given
+    filters: Dict[str, Any] = {} # Same shape as /menu/filters
+    model_config = ConfigDict(from_attributes=True)
+
 class CouponBase(BaseModel):
     code: str
     discount_type: str # "percentage" or "flat"
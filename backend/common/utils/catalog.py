@@ -0,0 +1,134 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, List, Optional, Set, Union
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .. import models, database
+
+# Conditional GET for catalog reads.
+# Every write to a restaurant's catalog (menu, tables, the restaurant itself) bumps
+# its row in catalog_versions in the same transaction. Reads derive their ETag and
+# Last-Modified from that row, so a matching If-None-Match / If-Modified-Since is
+# answered with 304 after one primary-key lookup, before the route loads anything.
+
+GLOBAL_SCOPE = 0 # Banners and collections: not tied to one restaurant
+
+versions = models.CatalogVersion.__table__
+
+Scope = Union[int, Callable[[Request], int]]
+
+# In-process caches derived from the catalog (e.g. the /home screen) register with
+# `on_commit`; they are told which scopes moved once the bumping transaction commits.
+BUMPED_KEY = "catalog_bumped"
+_commit_listeners: List[Callable[[Set[int]], None]] = []
+
+def on_commit(listener: Callable[[Set[int]], None]):
+    """Call `listener(scopes)` after every commit that bumped catalog versions (this process only)."""
+    _commit_listeners.append(listener)
+    return listener
+
+def bump(db: Session, *scopes: int):
+    """Advance the version of each scope. Call before the write's commit."""
+    db.info.setdefault(BUMPED_KEY, set()).update(scopes)
+    now = datetime.utcnow()
+    dialect = db.bind.dialect.name
+    for scope in sorted(set(scopes)): # Fixed order, so concurrent bumps can't deadlock
+        if dialect in ("postgresql", "sqlite"):
+            stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(versions)
+            db.execute(stmt.values(restaurant_id=scope, version=1, updated_at=now).on_conflict_do_update(
+                index_elements=["restaurant_id"],
+                set_={"version": versions.c.version + 1, "updated_at": now}
+            ))
+            continue
+        bumped = db.execute(
+            update(versions).where(versions.c.restaurant_id == scope)
+            .values(version=versions.c.version + 1, updated_at=now)
+        ).rowcount
+        if not bumped:
+            db.execute(insert(versions).values(restaurant_id=scope, version=1, updated_at=now))
+
+@event.listens_for(Session, "after_commit")
+def _notify_committed(session):
+    scopes = session.info.pop(BUMPED_KEY, None)
+    if scopes:
+        for listener in _commit_listeners:
+            listener(scopes)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    session.info.pop(BUMPED_KEY, None)
+
+def _current_query(scope: int):
+    return select(versions.c.version, versions.c.updated_at).where(versions.c.restaurant_id == scope)
+
+def query_scope(name: str = "restaurant_id", default: int = 1) -> Callable[[Request], int]:
+    """Scope taken from a query parameter (e.g. /menu/?restaurant_id=2)."""
+    def resolve(request: Request) -> int:
+        try:
+            return int(request.query_params.get(name, default))
+        except ValueError:
+            return default
+    return resolve
+
+def path_scope(name: str = "restaurant_id") -> Callable[[Request], int]:
+    """Scope taken from a path parameter (e.g. /restaurants/{restaurant_id})."""
+    def resolve(request: Request) -> int:
+        try:
+            return int(request.path_params[name])
+        except (KeyError, ValueError):
+            return -1 # Unknown resource: an ETag that never matches a real scope
+    return resolve
+
+def _resolve(scope: Scope, request: Request) -> int:
+    return scope(request) if callable(scope) else scope
+
+def _etag(request: Request, scope: int, version: int) -> str:
+    # Same catalog version, different listing (filters, page): different representation
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{request.url.path}?{query}".encode(), digest_size=6).hexdigest()
+    return f'W/"{scope}-{version}-{digest}"'
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return if_none_match.strip() == "*" or etag in {t.strip() for t in if_none_match.split(",")}
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+def _apply(request: Request, response: Response, scope: int, row):
+    version, updated_at = row if row else (0, None)
+    etag = _etag(request, scope, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    last_modified = updated_at.replace(tzinfo=timezone.utc) if updated_at else None
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    if _not_modified(request, etag, last_modified):
+        raise HTTPException(status_code=304, headers=headers)
+    response.headers.update(headers)
+
+def catalog_conditional(scope: Scope):
+    """
+    Route dependency: 304 when the client's validators match the scope's version,
+    otherwise ETag/Last-Modified headers on the normal response.
+    """
+    def check(request: Request, response: Response, db: Session = Depends(database.get_db)):
+        scope_id = _resolve(scope, request)
+        _apply(request, response, scope_id, db.execute(_current_query(scope_id)).first())
+    return check
+
+def catalog_conditional_async(scope: Scope):
+    """catalog_conditional for the async request path (DB_ASYNC=true)."""
+    async def check(request: Request, response: Response, db: AsyncSession = Depends(database.get_async_db)):
+        scope_id = _resolve(scope, request)
+        _apply(request, response, scope_id, (await db.execute(_current_query(scope_id))).first())
+    return check
@@ -0,0 +1,207 @@
+import math
+import threading
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+from sqlalchemy import event
+from .. import models
+
+EARTH_RADIUS_KM = 6371
+
+# Grid Cell Size (degrees). 0.1 deg ~ 11km of latitude.
+# Restaurants are bucketed into fixed cells so a nearest lookup only
+# touches the cells around the user instead of the whole table.
+CELL_SIZE_DEG = 0.1
+
+# Upper bound on ring expansion when no radius is given (~ 32 * 11km)
+MAX_RINGS = 32
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    d_lat = math.radians(lat2 - lat1)
+    d_lng = math.radians(lng2 - lng1)
+    a = math.sin(d_lat / 2) ** 2 + \
+        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
+        math.sin(d_lng / 2) ** 2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return EARTH_RADIUS_KM * c
+
+def cell_index(lat: float, lng: float) -> Tuple[int, int]:
+    return math.floor(lat / CELL_SIZE_DEG), math.floor(lng / CELL_SIZE_DEG)
+
+def cell_key(lat: Optional[float], lng: Optional[float]) -> Optional[str]:
+    """
+    Grid bucket key stored on the row (e.g. "129:775").
+    Returns None for rows without coordinates.
+    """
+    if lat is None or lng is None:
+        return None
+    row, col = cell_index(lat, lng)
+    return f"{row}:{col}"
+
+def ring_cells(lat: float, lng: float, ring: int) -> List[str]:
+    """
+    Keys of the cells exactly `ring` steps away from the cell containing (lat, lng).
+    Ring 0 is the centre cell itself.
+    """
+    row, col = cell_index(lat, lng)
+    if ring == 0:
+        return [f"{row}:{col}"]
+
+    keys = []
+    for d in range(-ring, ring + 1):
+        keys.append(f"{row - ring}:{col + d}")
+        keys.append(f"{row + ring}:{col + d}")
+    for d in range(-ring + 1, ring):
+        keys.append(f"{row + d}:{col - ring}")
+        keys.append(f"{row + d}:{col + ring}")
+    return keys
+
+def covered_radius_km(lat: float, rings: int) -> float:
+    """
+    Distance that is guaranteed to be fully covered after scanning rings 0..rings-1.
+    Uses the narrower longitude side, which shrinks with cos(lat).
+    """
+    if rings <= 0:
+        return 0.0
+    cell_lat_km = math.radians(CELL_SIZE_DEG) * EARTH_RADIUS_KM
+    cell_lng_km = cell_lat_km * max(math.cos(math.radians(abs(lat) + CELL_SIZE_DEG * rings)), 0.0)
+    return (rings - 1) * min(cell_lat_km, cell_lng_km)
+
+def rings_for_radius(lat: float, radius_km: float) -> int:
+    """Number of rings needed so that `radius_km` is fully covered."""
+    rings = 1
+    while covered_radius_km(lat, rings) < radius_km and rings < MAX_RINGS:
+        rings += 1
+    return rings
+
+class CoordinateTable:
+    """
+    In-process, array-backed copy of restaurant coordinates.
+    Radians and cos(lat) are computed once per restaurant, so ranking a batch of
+    candidates is a single vectorized haversine pass. Ids map to slots through an
+    array too, so spotting rows that are new or moved is a vectorized compare.
+    """
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._slot_of = np.full(capacity, -1, dtype=np.int64) # restaurant id -> slot, -1 when absent
+        self._free: List[int] = [] # Slots released by remove(), reused first
+        self._count = 0
+        self._size = 0
+        self._lat_deg = np.empty(capacity, dtype=np.float64) # As stored, to spot moved rows
+        self._lng_deg = np.empty(capacity, dtype=np.float64)
+        self._lat = np.empty(capacity, dtype=np.float64)
+        self._lng = np.empty(capacity, dtype=np.float64)
+        self._cos_lat = np.empty(capacity, dtype=np.float64)
+
+    def __len__(self):
+        return self._count
+
+    def _grow(self):
+        capacity = len(self._lat) * 2
+        for name in ("_lat_deg", "_lng_deg", "_lat", "_lng", "_cos_lat"):
+            arr = np.empty(capacity, dtype=np.float64)
+            arr[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, arr)
+
+    def _slots(self, ids: np.ndarray) -> np.ndarray:
+        in_range = (ids >= 0) & (ids < len(self._slot_of))
+        return np.where(in_range, self._slot_of[np.where(in_range, ids, 0)], -1)
+
+    def upsert(self, restaurant_id: int, lat: Optional[float], lng: Optional[float]):
+        if lat is None or lng is None:
+            self.remove(restaurant_id)
+            return
+        with self._lock:
+            if restaurant_id >= len(self._slot_of):
+                slot_of = np.full(max(restaurant_id + 1, len(self._slot_of) * 2), -1, dtype=np.int64)
+                slot_of[:len(self._slot_of)] = self._slot_of
+                self._slot_of = slot_of
+            slot = int(self._slot_of[restaurant_id])
+            if slot < 0:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    if self._size == len(self._lat):
+                        self._grow()
+                    slot = self._size
+                    self._size += 1
+                self._slot_of[restaurant_id] = slot
+                self._count += 1
+            lat_rad = math.radians(lat)
+            self._lat_deg[slot] = lat
+            self._lng_deg[slot] = lng
+            self._lat[slot] = lat_rad
+            self._lng[slot] = math.radians(lng)
+            self._cos_lat[slot] = math.cos(lat_rad)
+
+    def remove(self, restaurant_id: int):
+        with self._lock:
+            if 0 <= restaurant_id < len(self._slot_of) and self._slot_of[restaurant_id] >= 0:
+                self._free.append(int(self._slot_of[restaurant_id]))
+                self._slot_of[restaurant_id] = -1
+                self._count -= 1
+
+    def load(self, db):
+        """Warm the table from the restaurants table (once per process)."""
+        rows = db.query(models.Restaurant.id, models.Restaurant.latitude, models.Restaurant.longitude).filter(
+            models.Restaurant.latitude != None,
+            models.Restaurant.longitude != None
+        ).all()
+        for r_id, lat, lng in rows:
+            self.upsert(r_id, lat, lng)
+
+    def distances_km(self, lat: float, lng: float, restaurants: Sequence) -> np.ndarray:
+        """
+        Distances from (lat, lng) to each restaurant, in input order (inf without coordinates).
+        The rows are fresh from the database: ones this table hasn't seen, or has at other
+        coordinates (inserted or moved by another worker), are taken from their attributes.
+        """
+        ids = np.array([r.id for r in restaurants], dtype=np.int64)
+        lats = np.array([r.latitude for r in restaurants], dtype=np.float64) # None -> nan
+        lngs = np.array([r.longitude for r in restaurants], dtype=np.float64)
+        located = ~(np.isnan(lats) | np.isnan(lngs))
+
+        with self._lock:
+            idx = self._slots(ids)
+            known = idx >= 0
+            safe_idx = np.where(known, idx, 0)
+            stale = np.where(
+                located,
+                ~known | (self._lat_deg[safe_idx] != lats) | (self._lng_deg[safe_idx] != lngs),
+                known
+            )
+        if stale.any():
+            for i in np.flatnonzero(stale).tolist():
+                r = restaurants[i]
+                self.upsert(r.id, r.latitude, r.longitude)
+
+        with self._lock:
+            idx = self._slots(ids)
+            valid = idx >= 0
+            safe_idx = np.where(valid, idx, 0)
+            r_lat = self._lat[safe_idx]
+            r_lng = self._lng[safe_idx]
+            r_cos = self._cos_lat[safe_idx]
+
+        u_lat = math.radians(lat)
+        a = np.sin((r_lat - u_lat) / 2) ** 2 + \
+            math.cos(u_lat) * r_cos * np.sin((r_lng - math.radians(lng)) / 2) ** 2
+        dist = 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        dist[~valid] = np.inf
+        return dist
+
+restaurant_coordinates = CoordinateTable()
+
+@event.listens_for(models.Restaurant, "before_insert")
+@event.listens_for(models.Restaurant, "before_update")
+def _assign_geo_cell(mapper, connection, target):
+    # Every ORM write path (services, seed scripts) lands in the right grid cell
+    target.geo_cell = cell_key(target.latitude, target.longitude)
+
+@event.listens_for(models.Restaurant, "after_insert")
+@event.listens_for(models.Restaurant, "after_update")
+def _sync_restaurant_coordinates(mapper, connection, target):
+    restaurant_coordinates.upsert(target.id, target.latitude, target.longitude)
+
+@event.listens_for(models.Restaurant, "after_delete")
+def _drop_restaurant_coordinates(mapper, connection, target):
+    restaurant_coordinates.remove(target.id)
@@ -0,0 +1,209 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, NamedTuple, Optional
+from PIL import Image, ImageOps, features
+from sqlalchemy.dialects import postgresql, sqlite
+from .. import models
+from .minio_service import MinioService
+
+logger = logging.getLogger(__name__)
+
+# Image derivatives.
+# Uploads are stored under their content hash ("<sha256>/original.jpg"), so a key never
+# changes meaning and every object can be cached forever. Resized WebP/AVIF copies
+# ("<sha256>/w160.webp", ...) are encoded on a worker pool after the request returns,
+# then written to image_derivatives (by original URL), FoodImage.derivatives and Food.thumbnail_url.
+
+DERIVATIVE_WIDTHS = tuple(int(w) for w in os.getenv("IMAGE_WIDTHS", "160,480,960").split(","))
+DERIVATIVE_FORMATS = [f for f in ("webp", "avif") if features.check(f)]
+FORMAT_OPTIONS = {
+    "webp": {"quality": 80, "method": 4},
+    "avif": {"quality": 55, "speed": 6},
+}
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Resizing and encoding release the GIL inside Pillow, so threads use every core
+# without shipping image bytes to another process.
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(os.cpu_count() or 2)))
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class StoredImage(NamedTuple):
+    url: str
+    digest: str
+    key: str # Object key of the original; the worker reads it back from the store
+
+def hash_stream(file_obj) -> tuple:
+    """(sha256 hex digest, byte length) of a stream, read in chunks."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: file_obj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+def original_key(digest: str, file_name: Optional[str]) -> str:
+    """Object key for an original upload; the extension is kept for content sniffing."""
+    ext = os.path.splitext(file_name or "")[1].lower()[:8]
+    return f"{digest}/original{ext}"
+
+def derivative_key(digest: str, width: int, fmt: str) -> str:
+    return f"{digest}/w{width}.{fmt}"
+
+def derivative_urls(digest: str) -> Dict[str, Dict[str, str]]:
+    """URLs the derivatives of `digest` are (or will be) published under."""
+    return {
+        fmt: {str(w): MinioService.public_url(derivative_key(digest, w, fmt)) for w in DERIVATIVE_WIDTHS}
+        for fmt in DERIVATIVE_FORMATS
+    }
+
+def thumbnail_from(derivatives: Dict[str, Dict[str, str]]) -> Optional[str]:
+    """Smallest WebP (decoded by every current client), else the smallest of any format."""
+    for fmt in ["webp"] + [f for f in derivatives if f != "webp"]:
+        by_width = derivatives.get(fmt)
+        if by_width:
+            return by_width[min(by_width, key=int)]
+    return None
+
+def render_derivatives(data: bytes) -> List[tuple]:
+    """[(width, fmt, bytes)] for every configured width and format. Raises on undecodable input."""
+    img = Image.open(io.BytesIO(data))
+    widest = max(DERIVATIVE_WIDTHS)
+    # JPEG can decode straight at 1/2..1/8 scale, much cheaper than decoding full size
+    img.draft("RGB", (widest, widest * img.height // max(img.width, 1)))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+    results = []
+    source = img
+    # Largest first, each resized from the previous one
+    for width in sorted(DERIVATIVE_WIDTHS, reverse=True):
+        target = min(width, source.width) # Never upscale; the key still names the requested width
+        if target != source.width:
+            height = max(round(source.height * target / source.width), 1)
+            source = source.resize((target, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        for fmt in DERIVATIVE_FORMATS:
+            out = io.BytesIO()
+            source.save(out, fmt.upper(), **FORMAT_OPTIONS.get(fmt, {}))
+            results.append((width, fmt, out.getvalue()))
+    return results
+
+def derivatives_for(db, url: Optional[str]) -> Optional[Dict[str, Dict[str, str]]]:
+    """Derivatives recorded for an original URL, by any worker (None until processed)."""
+    if not url:
+        return None
+    row = db.get(models.ImageDerivative, url)
+    return row.derivatives if row is not None else None
+
+def _save_derivatives(db, url: str, digest: str, derivatives: Dict[str, Dict[str, str]]):
+    table = models.ImageDerivative.__table__
+    dialect = db.bind.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        # The same content can be uploaded (and processed) twice at once
+        stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(table).values(
+            image_url=url, digest=digest, derivatives=derivatives
+        )
+        db.execute(stmt.on_conflict_do_update(index_elements=["image_url"], set_={"derivatives": stmt.excluded.derivatives}))
+    else:
+        db.merge(models.ImageDerivative(image_url=url, digest=digest, derivatives=derivatives))
+
+class ImageProcessor:
+    """
+    Worker pool that renders, uploads and records derivatives.
+    Requests submit and return; rows are matched by image_url, so FoodImage and Food
+    rows written before the job finishes are filled in by it, and rows created later
+    (in any worker) look the result up with `derivatives_for`.
+    """
+    def __init__(self, session_factory=None, workers: int = IMAGE_WORKERS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.stats = {"submitted": 0, "processed": 0, "failed": 0}
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image")
+            return self._executor
+
+    def submit(self, image: StoredImage) -> Future:
+        future = self._get_executor().submit(self._process, image)
+        with self._lock:
+            self.stats["submitted"] += 1
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def stop(self):
+        """Finish queued jobs and release the worker threads."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def flush(self, timeout: Optional[float] = None):
+        """Block until everything submitted so far has been processed."""
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.exception(timeout)
+
+    def _process(self, image: StoredImage):
+        try:
+            derivatives: Dict[str, Dict[str, str]] = {}
+            # Read back from the store: requests don't hold upload bytes for the queue
+            for width, fmt, payload in render_derivatives(MinioService.read_file(image.key)):
+                url = MinioService.upload_file(
+                    io.BytesIO(payload), derivative_key(image.digest, width, fmt), f"image/{fmt}",
+                    len(payload), cache_control=IMMUTABLE_CACHE_CONTROL
+                )
+                if not url:
+                    raise Exception("Failed to upload derivative to MinIO")
+                derivatives.setdefault(fmt, {})[str(width)] = url
+
+            self._record(image, derivatives)
+            self._count("processed")
+        except Exception as e:
+            self._count("failed")
+            logger.error(f"Image derivatives failed for {image.url}: {e}")
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _record(self, image: StoredImage, derivatives: Dict[str, Dict[str, str]]):
+        if self.session_factory is None:
+            from ..database import SessionLocal
+            self.session_factory = SessionLocal
+        from . import catalog
+
+        url = image.url
+        db = self.session_factory()
+        try:
+            _save_derivatives(db, url, image.digest, derivatives)
+            restaurant_ids = [r for (r,) in db.query(models.Food.restaurant_id).distinct().filter(
+                (models.Food.image_url == url)
+                | models.Food.food_id.in_(db.query(models.FoodImage.food_id).filter(models.FoodImage.image_url == url))
+            )]
+            db.query(models.FoodImage).filter(models.FoodImage.image_url == url).update(
+                {models.FoodImage.derivatives: derivatives}, synchronize_session=False
+            )
+            db.query(models.Food).filter(models.Food.image_url == url).update(
+                {models.Food.thumbnail_url: thumbnail_from(derivatives)}, synchronize_session=False
+            )
+            if restaurant_ids:
+                catalog.bump(db, catalog.GLOBAL_SCOPE, *restaurant_ids)
+            db.commit()
+        finally:
+            db.close()
+
+image_processor = ImageProcessor()
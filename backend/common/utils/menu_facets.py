@@ -0,0 +1,125 @@
+from typing import Optional
+from sqlalchemy import event, inspect, case, or_, func, select, insert, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from .. import models
+
+# Menu filter metadata (price range, categories with counts, veg/non-veg counts)
+# kept in the menu_facets table, one row per (restaurant, category).
+# Food inserts bump the row in the same flush; category/price/veg edits and
+# deletes recompute just the affected rows. Reading is one indexed query.
+
+facets = models.MenuFacet.__table__
+foods = models.Food.__table__
+
+def _category_key(category: Optional[str]) -> str:
+    return category or ""
+
+def _add_food(connection, restaurant_id: int, category: Optional[str], price: Optional[float], is_veg: bool):
+    values = {
+        "restaurant_id": restaurant_id,
+        "food_category": _category_key(category),
+        "item_count": 1,
+        "veg_count": 1 if is_veg else 0,
+        "min_price": price,
+        "max_price": price,
+    }
+    dialect = connection.dialect.name
+    if dialect not in ("postgresql", "sqlite"):
+        _recompute(connection, restaurant_id, category)
+        return
+
+    stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(facets).values(**values)
+    new = stmt.excluded
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=["restaurant_id", "food_category"],
+        set_={
+            "item_count": facets.c.item_count + new.item_count,
+            "veg_count": facets.c.veg_count + new.veg_count,
+            "min_price": case((or_(facets.c.min_price == None, new.min_price < facets.c.min_price), new.min_price), else_=facets.c.min_price),
+            "max_price": case((or_(facets.c.max_price == None, new.max_price > facets.c.max_price), new.max_price), else_=facets.c.max_price),
+        }
+    ))
+
+def _recompute(connection, restaurant_id: int, category: Optional[str]):
+    key = _category_key(category)
+    if key:
+        in_category = foods.c.food_category == key
+    else:
+        in_category = or_(foods.c.food_category == None, foods.c.food_category == "")
+
+    row = connection.execute(select(
+        func.count(),
+        func.sum(case((foods.c.is_veg == True, 1), else_=0)),
+        func.min(foods.c.food_price),
+        func.max(foods.c.food_price),
+    ).where(foods.c.restaurant_id == restaurant_id, in_category)).one()
+
+    connection.execute(delete(facets).where(facets.c.restaurant_id == restaurant_id, facets.c.food_category == key))
+    if row[0]:
+        connection.execute(insert(facets).values(
+            restaurant_id=restaurant_id, food_category=key,
+            item_count=row[0], veg_count=row[1] or 0, min_price=row[2], max_price=row[3]
+        ))
+
+def rebuild(db):
+    """Recompute every facet row from the foods table (backfill, or after bulk imports)."""
+    veg = func.sum(case((foods.c.is_veg == True, 1), else_=0))
+    category = func.coalesce(foods.c.food_category, "")
+    db.execute(delete(facets))
+    db.execute(insert(facets).from_select(
+        ["restaurant_id", "food_category", "item_count", "veg_count", "min_price", "max_price"],
+        select(foods.c.restaurant_id, category, func.count(), veg, func.min(foods.c.food_price), func.max(foods.c.food_price))
+        .where(foods.c.restaurant_id != None)
+        .group_by(foods.c.restaurant_id, category)
+    ))
+    db.commit()
+
+def get_menu_facets(db, restaurant_id: int):
+    rows = db.query(models.MenuFacet).filter(models.MenuFacet.restaurant_id == restaurant_id)\
+        .order_by(models.MenuFacet.food_category).all()
+
+    prices_min = [r.min_price for r in rows if r.min_price is not None]
+    prices_max = [r.max_price for r in rows if r.max_price is not None]
+    total = sum(r.item_count for r in rows)
+    veg = sum(r.veg_count for r in rows)
+    return {
+        "min_price": min(prices_min, default=0),
+        "max_price": max(prices_max, default=0),
+        "categories": [r.food_category for r in rows if r.food_category],
+        "category_counts": [
+            {"category": r.food_category, "count": r.item_count}
+            for r in rows if r.food_category
+        ],
+        "total_items": total,
+        "veg_count": veg,
+        "non_veg_count": total - veg,
+    }
+
+@event.listens_for(models.Food, "after_insert")
+def _facets_food_inserted(mapper, connection, target):
+    if target.restaurant_id is not None:
+        _add_food(connection, target.restaurant_id, target.food_category, target.food_price, bool(target.is_veg))
+
+@event.listens_for(models.Food, "after_update")
+def _facets_food_updated(mapper, connection, target):
+    state = inspect(target)
+    tracked = ("restaurant_id", "food_category", "food_price", "is_veg")
+    if not any(state.attrs[name].history.has_changes() for name in tracked):
+        return
+
+    def previous(name):
+        deleted = state.attrs[name].history.deleted
+        return deleted[0] if deleted else getattr(target, name)
+
+    affected = {
+        (previous("restaurant_id"), _category_key(previous("food_category"))),
+        (target.restaurant_id, _category_key(target.food_category)),
+    }
+    for restaurant_id, category in affected:
+        if restaurant_id is not None:
+            _recompute(connection, restaurant_id, category)
+
+@event.listens_for(models.Food, "after_delete")
+def _facets_food_deleted(mapper, connection, target):
+    if target.restaurant_id is not None:
+        _recompute(connection, target.restaurant_id, target.food_category)
@@ -1,8 +1,58 @@
 from minio import Minio
 from minio.error import S3Error
+from typing import Optional
+import io
 import os
+import threading
+import time
 from datetime import timedelta
 
+# Uploads of unknown length are streamed as multipart in parts of this size (S3 minimum is 5 MiB)
+UPLOAD_PART_SIZE = int(os.getenv("MINIO_PART_SIZE", str(10 * 1024 * 1024)))
+
+class FakeObjectStore:
+    """
+    In-memory stand-in for the Minio client (STORAGE_BACKEND=fake), for local runs and benchmarks.
+    `latency` is added per request and `bandwidth` (bytes/s) per byte read, sleeping like network I/O would.
+    """
+    def __init__(self, latency: float = 0.0, bandwidth: Optional[float] = None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.objects = {}
+        self.buckets = set()
+        self._lock = threading.Lock()
+
+    def bucket_exists(self, bucket):
+        return bucket in self.buckets
+
+    def make_bucket(self, bucket):
+        self.buckets.add(bucket)
+
+    def put_object(self, bucket, name, data, length, content_type="application/octet-stream", metadata=None, part_size=0, **kwargs):
+        if length < 0 and not part_size:
+            raise ValueError("part_size must be set for unknown length")
+        parts, received = [], 0
+        while length < 0 or received < length:
+            part = data.read(part_size if length < 0 else length - received)
+            if not part:
+                break
+            parts.append(part)
+            received += len(part)
+            time.sleep(self.latency + (len(part) / self.bandwidth if self.bandwidth else 0))
+        with self._lock:
+            self.objects[(bucket, name)] = (b"".join(parts), content_type, metadata or {})
+
+    def get_object(self, bucket, name, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            data = self.objects[(bucket, name)][0]
+        return FakeResponse(data)
+
+class FakeResponse(io.BytesIO):
+    """get_object result: read() the body, then close() and release_conn()."""
+    def release_conn(self):
+        pass
+
 class MinioService:
     _client = None
     _bucket = os.getenv("MINIO_BUCKET", "food-images")
@@ -10,6 +60,11 @@ class MinioService:
     @classmethod
     def get_client(cls):
         if cls._client is None:
+            if os.getenv("STORAGE_BACKEND", "minio") == "fake":
+                cls._client = FakeObjectStore()
+                cls._ensure_bucket()
+                return cls._client
+
             endpoint = os.getenv("MINIO_ENDPOINT", "localhost:9000")
             access_key = os.getenv("MINIO_ROOT_USER", "minioadmin")
             secret_key = os.getenv("MINIO_ROOT_PASSWORD", "minioadmin")
@@ -36,22 +91,34 @@ class MinioService:
             print(f"MinIO Bucket Error: {e}")
 
     @classmethod
-    def upload_file(cls, file_data, file_name: str, content_type: str) -> str:
+    def use_client(cls, client):
+        """Swap the object store client (e.g. a FakeObjectStore for benchmarks)."""
+        cls._client = client
+        cls._ensure_bucket()
+
+    @classmethod
+    def public_url(cls, file_name: str) -> str:
+        # Construct public URL (assuming the bucket policy allows anonymous reads)
+        endpoint = os.getenv("MINIO_EXTERNAL_ENDPOINT", "http://localhost:9000")
+        return f"{endpoint}/{cls._bucket}/{file_name}"
+
+    @classmethod
+    def upload_file(cls, file_data, file_name: str, content_type: str, size: Optional[int] = None,
+                    cache_control: Optional[str] = None) -> str:
         """
         Uploads a file to MinIO and returns the URL.
         file_data: bytes or file-like object
+        size: byte length if already known (UploadFile.size); otherwise the stream is
+        sent as multipart parts of UPLOAD_PART_SIZE without seeking to measure it.
+        cache_control: stored on the object and sent back as the Cache-Control header.
+        Blocking: call from a worker thread (see StorageService).
         """
         client = cls.get_client()
         length = -1
-        if hasattr(file_data, "getbuffer"):
-             length = len(file_data.getbuffer())
-        elif hasattr(file_data, "read"):
-             # It's a file-like object, usually need to seek/tell or standard size
-             # MinIO put_object requires length. 
-             # For SpooledTemporaryFile (FastAPI UploadFile), logic is needed.
-             file_data.seek(0, 2)
-             length = file_data.tell()
-             file_data.seek(0)
+        if size is not None:
+            length = size
+        elif hasattr(file_data, "getbuffer"):
+            length = len(file_data.getbuffer())
         
         try:
             client.put_object(
@@ -59,7 +126,9 @@ class MinioService:
                 file_name,
                 file_data,
                 length,
-                content_type=content_type
+                content_type=content_type,
+                metadata={"Cache-Control": cache_control} if cache_control else None,
+                part_size=0 if length >= 0 else UPLOAD_PART_SIZE
             )
             # Generate URL (Presigned or Construct Public)
             # If using localhost/docker, presigned might have connectivity issues if host is different
@@ -68,10 +137,18 @@ class MinioService:
             # Presigned URL (valid for 7 days)
             # url = client.get_presigned_url("GET", cls._bucket, file_name, expires=timedelta(days=7))
             
-            # Or construct public URL if policy allows (assuming localhost access)
-            endpoint = os.getenv("MINIO_EXTERNAL_ENDPOINT", "http://localhost:9000")
-            return f"{endpoint}/{cls._bucket}/{file_name}"
+            return cls.public_url(file_name)
             
         except S3Error as e:
             print(f"Upload Failed: {e}")
             return None
+
+    @classmethod
+    def read_file(cls, file_name: str) -> bytes:
+        """Whole object body. Blocking: call from a worker thread."""
+        response = cls.get_client().get_object(cls._bucket, file_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
@@ -1,7 +1,12 @@
 import firebase_admin
 from firebase_admin import credentials, messaging
+from firebase_admin import exceptions as firebase_exceptions
+from typing import Dict, List, NamedTuple, Optional
 import os
 import logging
+import queue
+import threading
+import time
 
 logger = logging.getLogger("notification")
 
@@ -73,3 +78,227 @@ def send_push_notification(token: str, title: str, body: str, data: dict = None)
     except Exception as e:
         logger.error(f"Error sending message: {e}")
         return False
+
+# --- Background Dispatcher (batched multicast) ---
+SEND_OK = "ok"
+SEND_INVALID = "invalid" # Token is dead, prune it
+SEND_RETRY = "retry" # Transient failure
+SEND_REJECTED = "rejected" # The message itself was refused (e.g. invalid data): keep the token, don't retry
+
+FCM_MULTICAST_LIMIT = 500
+
+class Notification(NamedTuple):
+    user_id: int
+    title: str
+    body: str
+    data: Optional[dict] = None
+
+class FCMSink:
+    """
+    Sends one multicast per call through Firebase (send_each_for_multicast).
+    Returns one SEND_* result per token.
+    """
+    def send_multicast(self, tokens: List[str], title: str, body: str, data: dict = None) -> List[str]:
+        if not _is_initialized:
+            logger.warning("Firebase not initialized. Skipping notification.")
+            return [SEND_OK] * len(tokens)
+
+        message = messaging.MulticastMessage(
+            notification=messaging.Notification(title=title, body=body),
+            data=data or {},
+            tokens=tokens,
+        )
+        response = messaging.send_each_for_multicast(message)
+        results = []
+        rejected = []
+        for r in response.responses:
+            if r.success:
+                results.append(SEND_OK)
+            elif isinstance(r.exception, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+                results.append(SEND_INVALID)
+            elif isinstance(r.exception, firebase_exceptions.InvalidArgumentError):
+                # Usually the payload (oversized or non-string data), which fails for every
+                # recipient alike: not a reason to drop their devices
+                results.append(SEND_REJECTED)
+                rejected.append(r.exception)
+            else:
+                results.append(SEND_RETRY)
+        if rejected:
+            logger.error(f"FCM rejected '{title}' for {len(rejected)} tokens: {rejected[0]}")
+        return results
+
+class FakeFCMSink:
+    """
+    Local stand-in for FCM (tests and offline benchmarks).
+    Tokens in `invalid_tokens` are reported dead; `latency` simulates the network call.
+    """
+    def __init__(self, latency: float = 0.0, invalid_tokens=None, fail_first: int = 0):
+        self.latency = latency
+        self.invalid_tokens = set(invalid_tokens or [])
+        self.fail_first = fail_first # Number of calls to fail with SEND_RETRY
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def send_multicast(self, tokens: List[str], title: str, body: str, data: dict = None) -> List[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls.append({"tokens": list(tokens), "title": title, "body": body, "data": data})
+            if self.fail_first > 0:
+                self.fail_first -= 1
+                return [SEND_RETRY] * len(tokens)
+        return [SEND_INVALID if t in self.invalid_tokens else SEND_OK for t in tokens]
+
+_STOP = object()
+
+class NotificationDispatcher:
+    """
+    Background worker for push notifications.
+    Requests enqueue and return immediately; the worker coalesces queued messages
+    (same title/body/data -> one multicast), retries transient failures with
+    exponential backoff and prunes dead tokens from user_devices.
+    """
+    def __init__(self, session_factory=None, sink=None, batch_window: float = 0.05,
+                 max_batch: int = 500, max_retries: int = 3, backoff_base: float = 0.5):
+        self.session_factory = session_factory
+        self.sink = sink or FCMSink()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.stats = {"queued": 0, "multicasts": 0, "sent": 0, "failed": 0, "pruned": 0}
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notification-dispatcher", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Drain remaining messages and stop the worker."""
+        if self._thread and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._thread = None
+
+    def flush(self):
+        """Block until everything queued so far has been processed."""
+        self._queue.join()
+
+    def notify_user(self, user_id: int, title: str, body: str, data: dict = None):
+        self.notify_users([user_id], title, body, data)
+
+    def notify_users(self, user_ids: List[int], title: str, body: str, data: dict = None):
+        self.start()
+        for user_id in user_ids:
+            self._queue.put(Notification(user_id, title, body, data))
+            self.stats["queued"] += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                break
+
+            # Collect whatever arrives within the batch window
+            batch = [first]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"Notification batch failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _process(self, batch: List[Notification]):
+        if self.session_factory is None:
+            from ..database import SessionLocal
+            self.session_factory = SessionLocal
+        from .. import models
+
+        db = self.session_factory()
+        try:
+            # 1. Resolve tokens for every user in the batch (one query)
+            user_ids = {n.user_id for n in batch}
+            tokens_by_user: Dict[int, List[str]] = {}
+            for user_id, token in db.query(models.UserDevice.user_id, models.UserDevice.fcm_token).filter(
+                models.UserDevice.user_id.in_(user_ids)
+            ).all():
+                tokens_by_user.setdefault(user_id, []).append(token)
+
+            # 2. Coalesce identical messages into one token list
+            groups: Dict[tuple, List[str]] = {}
+            for n in batch:
+                key = (n.title, n.body, tuple(sorted((n.data or {}).items())))
+                tokens = groups.setdefault(key, [])
+                for token in tokens_by_user.get(n.user_id, []):
+                    if token not in tokens:
+                        tokens.append(token)
+
+            # 3. Multicast (FCM caps tokens per call)
+            invalid = set()
+            for (title, body, data), tokens in groups.items():
+                for i in range(0, len(tokens), FCM_MULTICAST_LIMIT):
+                    invalid |= self._send_with_retry(tokens[i:i + FCM_MULTICAST_LIMIT], title, body, dict(data))
+
+            # 4. Prune dead tokens
+            if invalid:
+                db.query(models.UserDevice).filter(
+                    models.UserDevice.fcm_token.in_(invalid)
+                ).delete(synchronize_session=False)
+                db.commit()
+                self.stats["pruned"] += len(invalid)
+        finally:
+            db.close()
+
+    def _send_with_retry(self, tokens: List[str], title: str, body: str, data: dict) -> set:
+        invalid = set()
+        pending = tokens
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.backoff_base * (2 ** (attempt - 1)))
+            try:
+                results = self.sink.send_multicast(pending, title, body, data)
+            except Exception as e:
+                logger.error(f"Multicast failed (attempt {attempt + 1}): {e}")
+                results = [SEND_RETRY] * len(pending)
+            self.stats["multicasts"] += 1
+
+            retry = []
+            for token, result in zip(pending, results):
+                if result == SEND_OK:
+                    self.stats["sent"] += 1
+                elif result == SEND_INVALID:
+                    invalid.add(token)
+                elif result == SEND_REJECTED:
+                    self.stats["failed"] += 1
+                else:
+                    retry.append(token)
+            if not retry:
+                break
+            pending = retry
+        else:
+            self.stats["failed"] += len(pending)
+        return invalid
+
+notification_dispatcher = NotificationDispatcher()
@@ -0,0 +1,188 @@
+import logging
+import os
+import re
+from datetime import date, datetime
+from typing import Optional, Sequence
+from sqlalchemy import MetaData, PrimaryKeyConstraint, delete, func, insert, inspect, select, text
+from .. import models
+from ..database import Base
+from . import schema
+
+logger = logging.getLogger(__name__)
+
+# Order storage lifecycle.
+# Postgres: `orders` is range partitioned by month on created_at (orders_pYYYYMM,
+# plus orders_default for anything outside the created months), so the kitchen and
+# history indexes stay per month and old months are dropped instead of deleted row by row.
+# Everywhere: delivered/cancelled orders older than ORDER_ARCHIVE_DAYS move to
+# orders_archive, which only deep history reads (get_user_orders(include_archive=True)).
+
+ORDER_ARCHIVE_DAYS = int(os.getenv("ORDER_ARCHIVE_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = 5000
+ARCHIVE_STATUSES = ("delivered", "cancelled")
+PARTITION_MONTHS_AHEAD = 3
+
+orders = models.Order.__table__
+archive = models.ArchivedOrder.__table__
+COLUMNS = [c.name for c in orders.c]
+PARTITION_RE = re.compile(r"^orders_p(\d{4})(\d{2})$")
+
+def _month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+def partition_name(month: date) -> str:
+    return f"orders_p{month:%Y%m}"
+
+def _partitioned_orders():
+    """The orders table as Postgres needs it partitioned: the primary key must include created_at."""
+    md = MetaData()
+    for fk in orders.foreign_keys:
+        if fk.column.table.name not in md.tables:
+            fk.column.table.to_metadata(md)
+    table = orders.to_metadata(md)
+    table.c.created_at.primary_key = True
+    table.append_constraint(PrimaryKeyConstraint(table.c.id, table.c.created_at))
+    table.c.id.autoincrement = True
+    table.dialect_kwargs["postgresql_partition_by"] = "RANGE (created_at)"
+    return table
+
+def is_partitioned(conn) -> bool:
+    return conn.execute(text(
+        "SELECT c.relkind = 'p' FROM pg_class c WHERE c.oid = to_regclass('orders')"
+    )).scalar() or False
+
+def create_tables(engine):
+    """
+    Startup replacement for Base.metadata.create_all that creates `orders` partitioned on
+    Postgres, then adds columns and indexes newer than the existing tables (utils/schema.py).
+    """
+    if engine.dialect.name != "postgresql":
+        Base.metadata.create_all(bind=engine)
+        schema.upgrade(engine)
+        return
+
+    Base.metadata.create_all(bind=engine, tables=[t for t in Base.metadata.sorted_tables if t is not orders])
+    with engine.begin() as conn:
+        if not inspect(conn).has_table("orders"):
+            _partitioned_orders().create(conn)
+            conn.execute(text("CREATE TABLE IF NOT EXISTS orders_default PARTITION OF orders DEFAULT"))
+        if is_partitioned(conn):
+            ensure_partitions(conn)
+        else:
+            logger.warning("orders is not partitioned; run `python -m backend.common.utils.order_archive partition` once")
+    schema.upgrade(engine)
+
+def ensure_partitions(conn, since: Optional[date] = None, months_ahead: int = PARTITION_MONTHS_AHEAD):
+    """Create the monthly partitions from `since` (default: this month) up to `months_ahead`."""
+    today = date.today()
+    month = _month_start(since or today)
+    last = _month_start(today)
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    while month <= last:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF orders "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+        ))
+        month = _next_month(month)
+
+def drop_empty_partitions(conn, before: datetime) -> list:
+    """Drop monthly partitions that end before `before` and hold no rows (fully archived)."""
+    dropped = []
+    names = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass('orders')"
+    )).scalars().all()
+    for name in sorted(names):
+        match = PARTITION_RE.match(name)
+        if not match:
+            continue
+        month = date(int(match.group(1)), int(match.group(2)), 1)
+        if _next_month(month) > before.date():
+            continue
+        if conn.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first() is None:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+def migrate_to_partitioned(engine) -> bool:
+    """
+    One-off conversion of an existing unpartitioned `orders` (Postgres), in one transaction.
+    Locks orders for the duration of the copy: run it in a maintenance window.
+    """
+    with engine.begin() as conn:
+        if is_partitioned(conn):
+            return False
+        conn.execute(text("LOCK TABLE orders IN ACCESS EXCLUSIVE MODE"))
+        inspector = inspect(conn)
+        for fk in inspector.get_foreign_keys("feedbacks"):
+            if fk["referred_table"] == "orders":
+                conn.execute(text(f'ALTER TABLE feedbacks DROP CONSTRAINT "{fk["name"]}"'))
+        # Free the index and key names for the new table
+        for index in inspector.get_indexes("orders"):
+            conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        conn.execute(text("ALTER TABLE orders RENAME TO orders_unpartitioned"))
+        conn.execute(text("ALTER TABLE orders_unpartitioned RENAME CONSTRAINT orders_pkey TO orders_unpartitioned_pkey"))
+
+        _partitioned_orders().create(conn)
+        conn.execute(text("CREATE TABLE orders_default PARTITION OF orders DEFAULT"))
+        first = conn.execute(text("SELECT min(created_at) FROM orders_unpartitioned")).scalar()
+        ensure_partitions(conn, since=first.date() if first else None)
+
+        values = ", ".join("coalesce(created_at, now())" if c == "created_at" else c for c in COLUMNS)
+        conn.execute(text(f"INSERT INTO orders ({', '.join(COLUMNS)}) SELECT {values} FROM orders_unpartitioned"))
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('orders', 'id'), (SELECT coalesce(max(id), 0) + 1 FROM orders), false)"
+        ))
+        conn.execute(text("DROP TABLE orders_unpartitioned"))
+    return True
+
+def archive_orders(db, older_than: datetime, batch_size: int = ARCHIVE_BATCH_SIZE,
+                   statuses: Sequence[str] = ARCHIVE_STATUSES) -> int:
+    """
+    Moves finished orders created before `older_than` into orders_archive,
+    `batch_size` rows per transaction. Returns the number of orders moved.
+    """
+    total = 0
+    while True:
+        stale = select(orders.c.id).where(
+            orders.c.status.in_(statuses),
+            orders.c.created_at < older_than
+        ).order_by(orders.c.created_at).limit(batch_size)
+
+        if db.bind.dialect.name == "postgresql":
+            # One statement per chunk: DELETE ... RETURNING feeds the INSERT
+            moved = delete(orders).where(
+                orders.c.id.in_(stale.scalar_subquery()),
+                orders.c.created_at < older_than, # Lets Postgres prune partitions
+                orders.c.status.in_(statuses)
+            ).returning(*orders.c).cte("moved")
+            count = db.execute(
+                insert(archive).from_select(
+                    COLUMNS + ["archived_at"], select(*(moved.c[name] for name in COLUMNS), func.now())
+                )
+            ).rowcount
+        else:
+            ids = db.execute(stale).scalars().all()
+            if ids:
+                db.execute(insert(archive).from_select(
+                    COLUMNS + ["archived_at"], select(*orders.c, func.now()).where(orders.c.id.in_(ids))
+                ))
+                db.execute(delete(orders).where(orders.c.id.in_(ids)))
+            count = len(ids)
+        db.commit()
+
+        total += count
+        if count < batch_size:
+            return total
+
+if __name__ == "__main__":
+    import sys
+    from ..database import engine
+    if sys.argv[1:] == ["partition"]:
+        print("Migrated." if migrate_to_partitioned(engine) else "orders is already partitioned.")
+    else:
+        print("usage: python -m backend.common.utils.order_archive partition")
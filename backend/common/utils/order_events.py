@@ -0,0 +1,399 @@
+import asyncio
+import json
+import logging
+import os
+import queue
+import select
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Mapping
+from fastapi.responses import StreamingResponse
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.orm import Session, attributes, object_session
+from .. import models
+
+logger = logging.getLogger("order_events")
+
+# Order status fan-out.
+# Every committed order insert or status change becomes one small event, pushed to the
+# customer's channel ("user:<id>") and the restaurant's kitchen channel ("kitchen:<id>").
+# /orders/stream and /kitchen/stream hold one subscription each, so one write costs one
+# push per open screen instead of every screen re-polling the orders table.
+#
+# local: events are delivered inside this process only (single worker, tests).
+# postgres: events go through NOTIFY and every worker LISTENs, so a write handled by
+# one uvicorn worker reaches subscribers connected to any of them.
+
+ORDER_EVENTS_BACKEND = os.getenv("ORDER_EVENTS_BACKEND", "auto") # auto | local | postgres
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SUBSCRIBER_QUEUE_SIZE", "64"))
+PG_CHANNEL = "order_events"
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15")) # Keeps proxies from closing idle streams
+SSE_RETRY_MS = 3000 # Client reconnect delay
+
+CLOSED = None # Queued to end a subscription (lagging client or shutdown)
+PING = "ping" # Queued every heartbeat interval
+
+def user_channel(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def kitchen_channel(restaurant_id: int) -> str:
+    return f"kitchen:{restaurant_id}"
+
+def order_event(values: Mapping, kind: str) -> dict:
+    """Event payload from order column values (an instance __dict__ or a RETURNING row mapping)."""
+    updated_at = values.get("updated_at") or values.get("created_at")
+    return {
+        "type": kind,
+        "order_id": values.get("id"),
+        "user_id": values.get("user_id"),
+        "restaurant_id": values.get("restaurant_id"),
+        "batch_id": values.get("batch_id"),
+        "status": values.get("status"),
+        "updated_at": updated_at.isoformat() if isinstance(updated_at, datetime) else None,
+    }
+
+def channels_for(event: dict) -> List[str]:
+    channels = []
+    if event.get("user_id") is not None:
+        channels.append(user_channel(event["user_id"]))
+    if event.get("restaurant_id") is not None:
+        channels.append(kitchen_channel(event["restaurant_id"]))
+    return channels
+
+class Subscription:
+    """One stream's mailbox. Lives on the event loop that created it."""
+    __slots__ = ("channels", "queue", "loop", "closed")
+
+    def __init__(self, channels: Iterable[str], loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.channels = tuple(channels)
+        self.queue = asyncio.Queue(maxsize)
+        self.loop = loop
+        self.closed = False
+
+    def _put(self, item) -> bool:
+        """Runs on `loop`. False when the client is too far behind and was cut off."""
+        if self.closed:
+            return True
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            # The client reconnects and refetches; better than buffering without bound
+            self.closed = True
+            self.queue.get_nowait()
+            self.queue.put_nowait(CLOSED)
+            return False
+
+    async def get(self):
+        """Next event dict, PING, or CLOSED at the end."""
+        return await self.queue.get()
+
+class LocalBackend:
+    name = "local"
+
+    def __init__(self, broker: "OrderBroker"):
+        self.broker = broker
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def publish(self, events: List[dict]):
+        for e in events:
+            self.broker.deliver(e)
+
+class PostgresBackend:
+    """
+    NOTIFY on publish; a listener thread per process, on its own connection, LISTENs and
+    hands notifications to the local broker (this process's own events come back that way too).
+    Publishing only enqueues: it runs in Session.after_commit, possibly on the event loop
+    (DB_ASYNC), so the NOTIFYs are sent by a publisher thread.
+    Drivers: psycopg2 (select + poll) and psycopg 3.2+ (Connection.notifies with a timeout).
+    """
+    name = "postgres"
+    RECONNECT_DELAY = 2.0
+    POLL_SECONDS = 1.0 # How often the listener re-checks for stop()
+
+    def __init__(self, broker: "OrderBroker", bind):
+        self.broker = broker
+        self.bind = bind
+        self._stop = threading.Event()
+        self._threads = []
+        self._outbox = queue.Queue()
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if not any(t.is_alive() for t in self._threads):
+                self._stop.clear()
+                self._threads = [
+                    threading.Thread(target=self._listen, name="order-events-listener", daemon=True),
+                    threading.Thread(target=self._send, name="order-events-publisher", daemon=True),
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._threads:
+            self._outbox.put(CLOSED) # Wake the publisher; events queued before it are still sent
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def publish(self, events: List[dict]):
+        self._outbox.put(events)
+
+    def _send(self):
+        while True:
+            batches = [self._outbox.get()]
+            while True: # Everything committed meanwhile goes out on one connection
+                try:
+                    batches.append(self._outbox.get_nowait())
+                except queue.Empty:
+                    break
+            events = [e for batch in batches if batch is not CLOSED for e in batch]
+            if events:
+                try:
+                    with self.bind.connect() as conn:
+                        for e in events:
+                            conn.execute(sql_select(func.pg_notify(PG_CHANNEL, json.dumps(e, separators=(",", ":")))))
+                        conn.commit()
+                except Exception as e:
+                    logger.error(f"Failed to publish {len(events)} order events: {e}")
+            if CLOSED in batches:
+                return
+
+    def _listen(self):
+        while not self._stop.is_set():
+            raw = None
+            try:
+                raw = self.bind.raw_connection()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cur:
+                    cur.execute(f"LISTEN {PG_CHANNEL}")
+                if hasattr(conn, "poll"):
+                    self._listen_psycopg2(conn)
+                else:
+                    self._listen_psycopg(conn)
+            except Exception as e:
+                logger.error(f"Order event listener failed: {e}")
+                self._stop.wait(self.RECONNECT_DELAY)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.invalidate() # Don't return a LISTENing connection to the pool
+                    except Exception:
+                        pass
+
+    def _listen_psycopg2(self, conn):
+        while not self._stop.is_set():
+            if select.select([conn], [], [], self.POLL_SECONDS)[0]:
+                conn.poll()
+                while conn.notifies:
+                    self.broker.deliver(json.loads(conn.notifies.pop(0).payload))
+
+    def _listen_psycopg(self, conn):
+        while not self._stop.is_set():
+            for notify in conn.notifies(timeout=self.POLL_SECONDS):
+                self.broker.deliver(json.loads(notify.payload))
+
+class OrderBroker:
+    """
+    In-process pub/sub for order events.
+    `publish` may be called from any thread (sync routes, scheduler jobs); each
+    subscriber's loop receives one callback per event, however many channels match.
+    Heartbeats are one timer per event loop, not one per subscriber.
+    """
+    def __init__(self, backend: str = ORDER_EVENTS_BACKEND, bind=None, queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+                 heartbeat: float = SSE_HEARTBEAT_SECONDS):
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._heartbeats = {} # loop -> TimerHandle
+        self.stats = {"published": 0, "delivered": 0, "dropped": 0}
+        self._channels: Dict[str, set] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._backend_name = backend
+        self._bind = bind
+        self._backend = None
+
+    @property
+    def backend(self):
+        with self._lock:
+            if self._backend is None:
+                self._backend = self._create_backend()
+            return self._backend
+
+    def _create_backend(self):
+        bind = self._bind
+        if bind is None:
+            from ..database import engine
+            bind = engine
+        name = self._backend_name
+        if name == "auto":
+            name = "postgres" if bind.dialect.name == "postgresql" else "local"
+        backend = PostgresBackend(self, bind) if name == "postgres" else LocalBackend(self)
+        backend.start()
+        return backend
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        """Must be called on the event loop that will consume the subscription."""
+        self.backend # Listener up before the first event can matter
+        loop = asyncio.get_running_loop()
+        sub = Subscription(channels, loop, self.queue_size)
+        with self._lock:
+            for channel in sub.channels:
+                self._channels[channel].add(sub)
+            if loop not in self._heartbeats:
+                self._heartbeats[loop] = loop.call_later(self.heartbeat, self._beat, loop)
+        return sub
+
+    def _beat(self, loop):
+        with self._lock:
+            subs = [s for subs in self._channels.values() for s in subs if s.loop is loop]
+            if not subs:
+                del self._heartbeats[loop]
+                return
+            self._heartbeats[loop] = loop.call_later(self.heartbeat, self._beat, loop)
+        self._fanout(set(subs), PING)
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            for channel in sub.channels:
+                subs = self._channels.get(channel)
+                if subs is not None:
+                    subs.discard(sub)
+                    if not subs:
+                        del self._channels[channel]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({s for subs in self._channels.values() for s in subs})
+
+    def publish(self, events: List[dict]):
+        if not events:
+            return
+        with self._lock:
+            self.stats["published"] += len(events)
+        try:
+            self.backend.publish(events)
+        except Exception as e:
+            logger.error(f"Failed to publish {len(events)} order events: {e}")
+
+    def deliver(self, event: dict):
+        """Hand `event` to every local subscriber of its channels."""
+        with self._lock:
+            subs = set()
+            for channel in channels_for(event):
+                subs |= self._channels.get(channel, set())
+        self._schedule(subs, event)
+
+    def _schedule(self, subs, item):
+        # One thread-safe callback per event loop, not per subscriber
+        by_loop = defaultdict(list)
+        for sub in subs:
+            by_loop[sub.loop].append(sub)
+        for loop, targets in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(self._fanout, targets, item)
+            except RuntimeError:
+                pass # Loop already closed; its streams are gone
+
+    def _fanout(self, subs: List[Subscription], item):
+        delivered = dropped = 0
+        for sub in subs:
+            if sub._put(item):
+                delivered += 1
+            else:
+                dropped += 1
+        if isinstance(item, dict):
+            with self._lock:
+                self.stats["delivered"] += delivered
+                self.stats["dropped"] += dropped
+
+    def close_all(self):
+        """End every open stream in this process (shutdown)."""
+        with self._lock:
+            subs = {s for subs in self._channels.values() for s in subs}
+        self._schedule(subs, CLOSED)
+
+    def stop(self):
+        self.close_all()
+        if self._backend is not None:
+            self._backend.stop()
+            self._backend = None
+
+    def get_status(self):
+        with self._lock:
+            stats = dict(self.stats)
+            channels = len(self._channels)
+        return {
+            "backend": self._backend.name if self._backend else None,
+            "channels": channels,
+            "subscribers": self.subscriber_count(),
+            **stats,
+        }
+
+broker = OrderBroker()
+
+def publish_orders(rows: Iterable[Mapping], kind: str = "order.status"):
+    """For writes that bypass the ORM (bulk UPDATE ... RETURNING): call after the commit."""
+    broker.publish([order_event(row, kind) for row in rows])
+
+def format_sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+async def sse_events(channels: Iterable[str]):
+    """
+    text/event-stream body for `channels`. Ends when the client disconnects, falls
+    too far behind, or the process shuts down; EventSource then reconnects on its own.
+    """
+    sub = broker.subscribe(channels)
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        while True:
+            event = await sub.get()
+            if event is CLOSED:
+                return
+            yield ": keep-alive\n\n" if event is PING else format_sse(event)
+    finally:
+        broker.unsubscribe(sub)
+
+def stream_response(channels: Iterable[str]) -> StreamingResponse:
+    return StreamingResponse(
+        sse_events(list(channels)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ORM writes publish themselves: inserts and status changes are captured at flush
+# and published after the session commits (never for rolled back work).
+PENDING_KEY = "order_events"
+
+def _collect(target, kind: str):
+    session = object_session(target)
+    if session is not None:
+        # Loaded values only: server defaults (created_at) aren't fetched mid-flush
+        session.info.setdefault(PENDING_KEY, []).append(order_event(attributes.instance_dict(target), kind))
+
+@event.listens_for(models.Order, "after_insert")
+def _order_inserted(mapper, connection, target):
+    _collect(target, "order.created")
+
+@event.listens_for(models.Order, "after_update")
+def _order_updated(mapper, connection, target):
+    if attributes.get_history(target, "status").has_changes():
+        _collect(target, "order.status")
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    broker.publish(session.info.pop(PENDING_KEY, None))
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,144 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from .. import models
+
+# Order lifecycle.
+#   created -> pending -> progress -> finished -> dispatched -> delivered
+# Orders only move forward (skipping steps is allowed: a kitchen may go straight
+# from created to progress) and can be cancelled until they are dispatched.
+# Transitions are applied as conditional UPDATEs (WHERE status IN <allowed sources>),
+# so two screens racing on the same order can't both win.
+
+ORDER_FLOW = ("created", "pending", "progress", "finished", "dispatched", "delivered")
+CANCELLED = "cancelled"
+ORDER_STATUSES = ORDER_FLOW + (CANCELLED,)
+TERMINAL_STATUSES = ("delivered", CANCELLED)
+CANCELLABLE_STATUSES = ("created", "pending", "progress", "finished")
+
+class InvalidTransition(ValueError):
+    """The order exists but is not in a state the requested status can follow."""
+    def __init__(self, order_id: int, current: str, target: str):
+        self.order_id = order_id
+        self.current = current
+        self.target = target
+        super().__init__(f"Order #{order_id} is {current}; cannot move to {target}")
+
+def validate_status(status: str) -> str:
+    if status not in ORDER_STATUSES:
+        raise ValueError(f"Unknown status '{status}'. Expected one of: {', '.join(ORDER_STATUSES)}")
+    return status
+
+def allowed_sources(target: str, expected: Optional[str] = None) -> Tuple[str, ...]:
+    """Statuses an order may be in to move to `target` (narrowed to `expected` when given)."""
+    validate_status(target)
+    if target == CANCELLED:
+        sources = CANCELLABLE_STATUSES
+    else:
+        sources = ORDER_FLOW[:ORDER_FLOW.index(target)]
+    if expected is not None:
+        validate_status(expected)
+        sources = tuple(s for s in sources if s == expected)
+    return sources
+
+def can_transition(current: str, target: str) -> bool:
+    return current in allowed_sources(target)
+
+def batch_status(statuses: Iterable[str]) -> str:
+    """Checkout (OrderBatch) status: its least advanced line, ignoring cancelled ones."""
+    live = [s for s in statuses if s != CANCELLED]
+    if not live:
+        return CANCELLED
+    return min(live, key=lambda s: ORDER_FLOW.index(s) if s in ORDER_FLOW else 0)
+
+def refresh_batch_status(db, batch_ids: Iterable[Optional[str]]):
+    """
+    Recompute OrderBatch.status for `batch_ids` from their lines, inside the caller's
+    transaction: lock the headers, read the lines, one UPDATE per resulting status.
+    """
+    batch_ids = sorted({b for b in batch_ids if b})
+    if not batch_ids:
+        return
+    # Header locks serialize concurrent transitions of the same batch, so the second
+    # writer reads the lines after the first one's commit (a no-op on SQLite)
+    db.execute(
+        select(models.OrderBatch.id).where(models.OrderBatch.batch_id.in_(batch_ids))
+        .order_by(models.OrderBatch.batch_id).with_for_update()
+    ).all()
+    lines = defaultdict(list)
+    for batch_id, status in db.execute(
+        select(models.Order.batch_id, models.Order.status).where(models.Order.batch_id.in_(batch_ids))
+    ):
+        lines[batch_id].append(status)
+
+    by_status = defaultdict(list)
+    for batch_id, statuses in lines.items():
+        by_status[batch_status(statuses)].append(batch_id)
+    for status, ids in by_status.items():
+        db.execute(
+            update(models.OrderBatch)
+            .where(models.OrderBatch.batch_id.in_(ids), models.OrderBatch.status != status)
+            .values(status=status, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+bill_versions = models.BillVersion.__table__
+
+def _bump(connection, user_ids):
+    now = datetime.utcnow()
+    dialect = connection.dialect.name
+    for user_id in user_ids: # Sorted by the callers, so concurrent bumps can't deadlock
+        if dialect in ("postgresql", "sqlite"):
+            stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(bill_versions)
+            connection.execute(stmt.values(user_id=user_id, version=1, updated_at=now).on_conflict_do_update(
+                index_elements=["user_id"],
+                set_={"version": bill_versions.c.version + 1, "updated_at": now}
+            ))
+            continue
+        bumped = connection.execute(
+            update(bill_versions).where(bill_versions.c.user_id == user_id)
+            .values(version=bill_versions.c.version + 1, updated_at=now)
+        ).rowcount
+        if not bumped:
+            connection.execute(insert(bill_versions).values(user_id=user_id, version=1, updated_at=now))
+
+def bump_bill_versions(db, user_ids: Iterable[Optional[int]]):
+    """
+    Advance the BillVersion of `user_ids`, inside the caller's transaction, so their
+    stored bills (models.Invoice) stop matching. For writes that change what a user is
+    billed for: cancelled lines (new checkouts bump theirs below).
+    """
+    user_ids = sorted({u for u in user_ids if u is not None})
+    if user_ids:
+        _bump(db.connection(), user_ids)
+
+@event.listens_for(models.OrderBatch, "after_insert")
+def _batch_inserted(mapper, connection, target):
+    # Every checkout (and single order) writes its header in the order's transaction
+    if target.user_id is not None:
+        _bump(connection, [target.user_id])
+
+def notify_customers(rows, status: str, reason: str = ""):
+    """
+    Push `status` for moved order rows (id, user_id, batch_id): one notification per
+    (customer, checkout batch), however many lines moved. `reason` is appended to the body.
+    """
+    from .notification_service import notification_dispatcher
+    groups: Dict[tuple, List[int]] = {}
+    for row in rows:
+        groups.setdefault((row.user_id, row.batch_id or f"order:{row.id}"), []).append(row.id)
+
+    for (user_id, batch_id), order_ids in groups.items():
+        if len(order_ids) == 1:
+            body = f"Your order #{order_ids[0]} is now {status}."
+        else:
+            body = f"Your order ({len(order_ids)} items) is now {status}."
+        if reason:
+            body = f"{body[:-1]} {reason}."
+        data = {"order_id": str(order_ids[0]), "status": status}
+        if not batch_id.startswith("order:"):
+            data["batch_id"] = batch_id
+            data["order_ids"] = ",".join(str(i) for i in sorted(order_ids))
+        notification_dispatcher.notify_user(user_id, title=f"Order Update: {status.title()}", body=body, data=data)
@@ -0,0 +1,83 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+from sqlalchemy import literal, tuple_
+
+# Keyset (cursor) pagination.
+# A page is "rows after the last row of the previous page" in a fixed
+# (sort key, unique id) order, so page N costs the same index range scan as page 1
+# instead of walking and discarding `skip` rows.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: Sequence[Any], sort: str = "") -> str:
+    """Opaque token for the position after a row with the given key values."""
+    payload = {
+        "s": sort,
+        "k": [v.isoformat() if isinstance(v, datetime) else v for v in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(token: str, sort: str = "", size: int = 2) -> List[Any]:
+    """Key values from a cursor. Raises ValueError for tampered or foreign tokens."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload["k"]
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if payload.get("s") != sort or not isinstance(values, list) or len(values) != size:
+        raise ValueError("Cursor does not match this listing")
+    return values
+
+def _coerce(column, value):
+    """JSON cursor value back to the column's Python type."""
+    try:
+        python_type = column.type.python_type
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        return python_type(value)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+def decode_values(token: str, columns: Sequence, sort: str = "") -> List[Any]:
+    """decode_cursor, with each value converted back to its column's Python type."""
+    raw = decode_cursor(token, sort, size=len(columns))
+    return [_coerce(c, v) for c, v in zip(columns, raw)]
+
+def keyset(query, columns: Sequence, values: Optional[Sequence[Any]], descending: bool = False):
+    """
+    Order `query` by `columns` (all in the same direction, last one unique)
+    and, when `values` (from the previous page's cursor) are given, keep only rows after them.
+    """
+    if values is not None:
+        # Row-value comparison, so Postgres/SQLite can seek the composite index
+        key = tuple_(*columns)
+        bound = tuple_(*(literal(v, c.type) for c, v in zip(columns, values)))
+        query = query.filter(key < bound if descending else key > bound)
+
+    return query.order_by(*(c.desc() if descending else c.asc() for c in columns))
+
+def paginate(query, columns: Sequence, cursor: Optional[str], limit: int,
+         skip: int = 0, sort: str = "", descending: bool = False):
+    """
+    One page of `query` in keyset order.
+    `skip` is only honoured without a cursor, for callers still paging by offset.
+    """
+    values = None
+    if cursor:
+        values = decode_values(cursor, columns, sort)
+
+    query = keyset(query, columns, values, descending)
+    if values is None and skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def next_cursor(items: Sequence[Any], limit: int, attrs: Sequence[str], sort: str = "") -> Optional[str]:
+    """Cursor after the last item, or None when this was the last page."""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor([getattr(last, a) for a in attrs], sort)
@@ -0,0 +1,135 @@
+from typing import Dict, List
+from sqlalchemy import update, select, func, cast, Numeric, case, union_all
+from .. import models
+from . import catalog
+
+# Running rating aggregates (rating_sum / rating_count) on foods and restaurants.
+# submit_feedback applies a delta in the same transaction as the feedback row;
+# `backfill` and `check_consistency` rebuild them from the feedbacks table, in SQL,
+# with the repaired rows locked.
+
+def _rating_from(sum_expr, count_expr):
+    """Rounded average as a SQL expression (0 when there are no ratings yet)."""
+    return case(
+        (count_expr > 0, func.round(cast(sum_expr, Numeric) / count_expr, 1)),
+        else_=0.0
+    )
+
+def apply_food_delta(db, food_id: int, rate_delta: int, count_delta: int):
+    """Atomically add a rating delta to a food; returns the new rounded average."""
+    new_sum = models.Food.rating_sum + rate_delta
+    new_count = models.Food.rating_count + count_delta
+    result = db.execute(
+        update(models.Food)
+        .where(models.Food.food_id == food_id)
+        .values(rating_sum=new_sum, rating_count=new_count, rating=_rating_from(new_sum, new_count))
+        .returning(models.Food.rating)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    return float(result) if result is not None else None
+
+def apply_restaurant_delta(db, restaurant_id: int, rate_delta: int, count_delta: int):
+    db.execute(
+        update(models.Restaurant)
+        .where(models.Restaurant.id == restaurant_id)
+        .values(
+            rating_sum=models.Restaurant.rating_sum + rate_delta,
+            rating_count=models.Restaurant.rating_count + count_delta
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+def _rated_orders():
+    """Orders feedback can point at: live and archived (see utils/order_archive.py)."""
+    return union_all(
+        select(models.Order.id, models.Order.food_id, models.Order.restaurant_id),
+        select(models.ArchivedOrder.id, models.ArchivedOrder.food_id, models.ArchivedOrder.restaurant_id),
+    ).subquery("rated_orders")
+
+def _actual_food_ratings(db) -> Dict[int, tuple]:
+    orders = _rated_orders()
+    rows = db.execute(
+        select(orders.c.food_id, func.sum(models.Feedback.rate), func.count(models.Feedback.id))
+        .join(orders, orders.c.id == models.Feedback.order_id)
+        .where(orders.c.food_id != None)
+        .group_by(orders.c.food_id)
+    )
+    return {food_id: (int(total or 0), count) for food_id, total, count in rows}
+
+def _actual_restaurant_ratings(db) -> Dict[int, tuple]:
+    orders = _rated_orders()
+    rows = db.execute(
+        select(orders.c.restaurant_id, func.sum(models.Feedback.rate), func.count(models.Feedback.id))
+        .join(orders, orders.c.id == models.Feedback.order_id)
+        .where(orders.c.restaurant_id != None)
+        .group_by(orders.c.restaurant_id)
+    )
+    return {r_id: (int(total or 0), count) for r_id, total, count in rows}
+
+def check_consistency(db, repair: bool = False) -> List[dict]:
+    """
+    Compare stored aggregates with the feedbacks table.
+    Returns the drifted rows; with repair=True they are also corrected.
+    """
+    drift = []
+    actual = _actual_food_ratings(db)
+    stored = db.query(models.Food.food_id, models.Food.rating_sum, models.Food.rating_count)
+    for food_id, rating_sum, rating_count in stored:
+        expected = actual.get(food_id, (0, 0))
+        if (rating_sum or 0, rating_count or 0) != expected:
+            drift.append({"kind": "food", "id": food_id, "stored": (rating_sum, rating_count), "expected": expected})
+
+    actual = _actual_restaurant_ratings(db)
+    stored = db.query(models.Restaurant.id, models.Restaurant.rating_sum, models.Restaurant.rating_count)
+    for r_id, rating_sum, rating_count in stored:
+        expected = actual.get(r_id, (0, 0))
+        if (rating_sum or 0, rating_count or 0) != expected:
+            drift.append({"kind": "restaurant", "id": r_id, "stored": (rating_sum, rating_count), "expected": expected})
+
+    if repair and drift:
+        food_ids = [row["id"] for row in drift if row["kind"] == "food"]
+        restaurant_ids = [row["id"] for row in drift if row["kind"] == "restaurant"]
+        touched = _repair(db, models.Food, models.Food.food_id, "food_id", food_ids, models.Food.restaurant_id)
+        touched |= _repair(db, models.Restaurant, models.Restaurant.id, "restaurant_id", restaurant_ids, models.Restaurant.id)
+        # Ratings are part of the cached catalog: without a bump clients keep their 304s
+        catalog.bump(db, *(r_id for r_id in touched if r_id is not None))
+        db.commit()
+    return drift
+
+def _totals(group_column: str, key):
+    """(sum, count) of the feedback on `key`, as scalar subqueries correlated to the row being updated."""
+    def scalar(aggregate):
+        orders = _rated_orders()
+        return (
+            select(aggregate).select_from(models.Feedback)
+            .join(orders, orders.c.id == models.Feedback.order_id)
+            .where(orders.c[group_column] == key)
+            .scalar_subquery()
+        )
+    return scalar(func.coalesce(func.sum(models.Feedback.rate), 0)), scalar(func.count(models.Feedback.id))
+
+def _repair(db, model, key, group_column: str, ids: List[int], restaurant_column) -> set:
+    """
+    Recompute the aggregates of `ids` in the database, not from the totals read earlier:
+    the rows are locked first, so a feedback delta committed since the drift check is
+    counted, and one still in flight applies on top of the repaired value (it waits).
+    Returns the restaurant ids of the repaired rows.
+    """
+    if not ids:
+        return set()
+    ids = sorted(set(ids))
+    db.execute(select(key).where(key.in_(ids)).order_by(key).with_for_update()).all()
+    total, count = _totals(group_column, key)
+    values = {"rating_sum": total, "rating_count": count}
+    if model is models.Food:
+        values["rating"] = _rating_from(total, count)
+    rows = db.execute(
+        update(model).where(key.in_(ids)).values(**values)
+        .returning(restaurant_column)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    return set(rows)
+
+def backfill(db) -> int:
+    """Rebuild every aggregate from the feedbacks table. Returns the number of rows corrected."""
+    return len(check_consistency(db, repair=True))
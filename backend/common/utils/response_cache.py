@@ -0,0 +1,44 @@
+import hashlib
+from typing import Hashable, NamedTuple, Optional
+from fastapi import Request, Response
+from .ttl_cache import TTLCache
+
+# Server-side cache of serialized JSON bodies, plus conditional GET.
+# Hits skip the database and serialization entirely; clients revalidating
+# with If-None-Match get a bodiless 304 when the bytes haven't changed.
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, lists and `*` allowed)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+def conditional_response(request: Request, cached: CachedBody, cache_control: str = "no-cache") -> Response:
+    """200 with the cached JSON bytes, or 304 when the client already holds them."""
+    headers = {"ETag": cached.etag, "Cache-Control": cache_control}
+    if etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+class ResponseCache(TTLCache):
+    """
+    Bounded TTL/LRU cache of serialized response bodies and their ETags.
+    Per-process only: writes in other workers show up here after the TTL.
+    """
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        return super().get(key)
+
+    def set(self, key: Hashable, body: bytes) -> CachedBody:
+        """Cache `body` under `key` (unless disabled) and return it with its ETag."""
+        return super().set(key, CachedBody(body, make_etag(body)))
@@ -1,32 +1,291 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from sqlalchemy import select, update, insert, delete, or_, func
+from sqlalchemy.exc import IntegrityError
 from ..database import engine
-from datetime import datetime
+from .. import models
+from datetime import datetime, timedelta, timezone
 import logging
+import os
+import socket
+import threading
+import time
+import uuid
 
 logger = logging.getLogger("scheduler")
 
+# leader: every worker runs this module, only the elected one executes jobs
+# standalone: always run jobs in this process (single worker / scripts)
+# off: never run jobs here
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "leader")
+SCHEDULER_THREADS = int(os.getenv("SCHEDULER_THREADS", "4"))
+SCHEDULER_LEASE_TTL = int(os.getenv("SCHEDULER_LEASE_TTL", "30")) # seconds
+ADVISORY_LOCK_KEY = 0x5C4ED # pg_advisory_lock key shared by all workers
+
 # Job Store (Persistent via Database)
 jobstores = {
     'default': SQLAlchemyJobStore(engine=engine, tablename='scheduler_jobs')
 }
 
-scheduler = AsyncIOScheduler(jobstores=jobstores)
+class JobMetrics:
+    """
+    Per-job run counts, duration (submit -> finish) and lag (scheduled -> submit), in milliseconds.
+    Durations need the TimedThreadPoolExecutor below.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = {}
+        self.jobs = {}
 
-def start_scheduler():
-    try:
+    def attach(self, sched):
+        sched.add_listener(self._on_event, EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED)
+
+    def submitted(self, job_id, run_times):
+        """Called by TimedThreadPoolExecutor before the job reaches a thread (events can arrive late)."""
+        started = time.perf_counter()
+        with self._lock:
+            for run_time in run_times:
+                self._started[(job_id, run_time)] = started
+
+    def _job(self, job_id):
+        stats = self.jobs.get(job_id)
+        if stats is None:
+            stats = self.jobs[job_id] = {
+                "runs": 0, "errors": 0, "missed": 0,
+                "last_duration_ms": None, "max_duration_ms": 0.0, "total_duration_ms": 0.0,
+                "last_lag_ms": None, "max_lag_ms": 0.0,
+                "last_run_at": None,
+            }
+        return stats
+
+    def _on_event(self, event):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            stats = self._job(event.job_id)
+            if event.code == EVENT_JOB_SUBMITTED:
+                for run_time in event.scheduled_run_times:
+                    lag_ms = max((now - run_time).total_seconds() * 1000, 0.0)
+                    stats["last_lag_ms"] = round(lag_ms, 3)
+                    stats["max_lag_ms"] = round(max(stats["max_lag_ms"], lag_ms), 3)
+                return
+
+            if event.code == EVENT_JOB_MISSED:
+                stats["missed"] += 1
+                return
+
+            started = self._started.pop((event.job_id, event.scheduled_run_time), None)
+            stats["runs"] += 1
+            if event.code == EVENT_JOB_ERROR:
+                stats["errors"] += 1
+            if started is not None:
+                duration_ms = (time.perf_counter() - started) * 1000
+                stats["last_duration_ms"] = round(duration_ms, 3)
+                stats["max_duration_ms"] = round(max(stats["max_duration_ms"], duration_ms), 3)
+                stats["total_duration_ms"] += duration_ms
+            stats["last_run_at"] = now.isoformat()
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for job_id, stats in self.jobs.items():
+                result[job_id] = {
+                    **stats,
+                    "total_duration_ms": round(stats["total_duration_ms"], 3),
+                    "avg_duration_ms": round(stats["total_duration_ms"] / stats["runs"], 3) if stats["runs"] else None,
+                }
+            return result
+
+class TimedThreadPoolExecutor(ThreadPoolExecutor):
+    """Thread pool executor that stamps each submission for JobMetrics durations."""
+    def __init__(self, metrics: JobMetrics, max_workers: int = 10):
+        super().__init__(max_workers)
+        self.metrics = metrics
+
+    def _do_submit_job(self, job, run_times):
+        self.metrics.submitted(job.id, run_times)
+        return super()._do_submit_job(job, run_times)
+
+job_metrics = JobMetrics()
+
+# Jobs are sync and hit the database: run them on worker threads, never on the event loop
+executors = {
+    'default': TimedThreadPoolExecutor(job_metrics, SCHEDULER_THREADS)
+}
+job_defaults = {
+    'coalesce': True, # A backlog of missed runs executes once
+    'max_instances': 1,
+}
+
+scheduler = BackgroundScheduler(jobstores=jobstores, executors=executors, job_defaults=job_defaults)
+job_metrics.attach(scheduler)
+
+class LeaderElector:
+    """
+    Elects one process (across uvicorn workers / hosts) to run scheduled jobs.
+    Postgres: session-level pg_try_advisory_lock held on a dedicated connection,
+    released automatically if the process dies.
+    Other databases: a lease row in scheduler_leases renewed every ttl/3 seconds,
+    taken over by another worker once it expires.
+    """
+    def __init__(self, bind, name: str = "scheduler", ttl: int = SCHEDULER_LEASE_TTL,
+                 on_elected=None, on_demoted=None):
+        self.bind = bind
+        self.name = name
+        self.ttl = ttl
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.is_leader = False
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.check()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._release()
+
+    def _run(self):
+        while not self._stop.wait(max(self.ttl / 3, 1)):
+            self.check()
+
+    def check(self):
+        """Acquire or renew leadership, firing callbacks on changes."""
+        try:
+            leader = self._try_advisory_lock() if self.bind.dialect.name == "postgresql" else self._try_lease()
+        except Exception as e:
+            logger.error(f"Leader election failed: {e}")
+            leader = False
+
+        if leader and not self.is_leader:
+            logger.info(f"Scheduler leadership acquired by {self.holder}")
+            self.is_leader = True
+            if self.on_elected:
+                self.on_elected()
+        elif not leader and self.is_leader:
+            logger.warning(f"Scheduler leadership lost by {self.holder}")
+            self.is_leader = False
+            if self.on_demoted:
+                self.on_demoted()
+        return self.is_leader
+
+    def _try_advisory_lock(self):
+        if self._conn is not None:
+            try:
+                self._conn.exec_driver_sql("SELECT 1")
+                self._conn.commit()
+                return True
+            except Exception:
+                # Connection (and with it the lock) is gone
+                self._close_conn()
+
+        conn = self.bind.connect()
+        acquired = conn.execute(select(func.pg_try_advisory_lock(ADVISORY_LOCK_KEY))).scalar()
+        conn.commit()
+        if acquired:
+            self._conn = conn
+            return True
+        conn.close()
+        return False
+
+    def _try_lease(self):
+        lease = models.SchedulerLease.__table__
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        with self.bind.begin() as conn:
+            renewed = conn.execute(
+                update(lease)
+                .where(lease.c.name == self.name, or_(lease.c.holder == self.holder, lease.c.expires_at < now))
+                .values(holder=self.holder, expires_at=expires_at)
+            ).rowcount
+        if renewed:
+            return True
+        try:
+            with self.bind.begin() as conn:
+                conn.execute(insert(lease).values(name=self.name, holder=self.holder, expires_at=expires_at))
+            return True
+        except IntegrityError:
+            return False # Someone else holds an unexpired lease
+
+    def _release(self):
+        if self._conn is not None:
+            try:
+                self._conn.execute(select(func.pg_advisory_unlock(ADVISORY_LOCK_KEY)))
+                self._conn.commit()
+            except Exception:
+                pass
+            self._close_conn()
+        elif self.is_leader and self.bind.dialect.name != "postgresql":
+            lease = models.SchedulerLease.__table__
+            try:
+                with self.bind.begin() as conn:
+                    conn.execute(delete(lease).where(lease.c.name == self.name, lease.c.holder == self.holder))
+            except Exception as e:
+                logger.error(f"Failed to release scheduler lease: {e}")
+        self.is_leader = False
+
+    def _close_conn(self):
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+def _run_jobs():
+    if not scheduler.running:
         scheduler.start()
         logger.info("APScheduler Started")
+    else:
+        scheduler.resume()
+        logger.info("APScheduler Resumed")
+
+def _pause_jobs():
+    if scheduler.running:
+        scheduler.pause()
+        logger.info("APScheduler Paused (not leader)")
+
+leader = LeaderElector(engine, on_elected=_run_jobs, on_demoted=_pause_jobs)
+
+def start_scheduler():
+    try:
+        if SCHEDULER_MODE == "off":
+            return
+        if SCHEDULER_MODE == "standalone":
+            _run_jobs()
+            return
+        leader.start()
     except Exception as e:
         logger.error(f"Failed to start APScheduler: {e}")
 
 def stop_scheduler():
     try:
-        scheduler.shutdown()
+        if SCHEDULER_MODE == "leader":
+            leader.stop()
+        if scheduler.running:
+            scheduler.shutdown(wait=False)
         logger.info("APScheduler Shutdown")
     except Exception as e:
         logger.error(f"Failed to stop APScheduler: {e}")
 
+def get_scheduler_status():
+    return {
+        "mode": SCHEDULER_MODE,
+        "holder": leader.holder,
+        "is_leader": leader.is_leader if SCHEDULER_MODE == "leader" else SCHEDULER_MODE == "standalone",
+        "running": scheduler.running,
+        "jobs": job_metrics.snapshot(),
+    }
+
 def schedule_task(func, trigger, **kwargs):
     """Generic helper to add jobs"""
     try:
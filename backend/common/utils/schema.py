@@ -0,0 +1,32 @@
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateColumn
+from ..database import Base
+
+logger = logging.getLogger(__name__)
+
+# create_all only creates missing tables: columns and indexes added to a model after
+# its table exists (restaurants.geo_cell, foods.rating_sum, food_images.derivatives, ...)
+# would never reach older databases. `upgrade` adds them in place, at startup, before
+# the backfills that fill them.
+
+def missing_columns(conn, table) -> list:
+    existing = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    return [c for c in table.columns if c.name not in existing]
+
+def upgrade(engine):
+    """Add model columns and indexes missing from existing tables. Idempotent."""
+    with engine.begin() as conn:
+        tables = set(inspect(conn).get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            for column in missing_columns(conn, table):
+                if not column.nullable and column.server_default is None:
+                    logger.warning(f"Cannot add NOT NULL column {table.name}.{column.name} without a default")
+                    continue
+                ddl = CreateColumn(column).compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+                logger.info(f"Added column {table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
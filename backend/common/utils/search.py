@@ -0,0 +1,305 @@
+import heapq
+import re
+import threading
+import logging
+from typing import Dict, List, Optional, Set
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, object_session
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+# Menu search.
+# Postgres: weighted tsvector (name A, description B) + pg_trgm on food_name, both GIN indexed.
+# Elsewhere (SQLite, or no pg_trgm privileges): in-process inverted index over
+# name/description tokens with a trigram index on the vocabulary for typos.
+# Both return {food_id: score}, higher is more relevant.
+
+WORD_RE = re.compile(r"\w+")
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+PREFIX_SIMILARITY = 0.9
+FUZZY_THRESHOLD = 0.4 # Trigram similarity needed to count a token as a typo of the query term
+MAX_RESULTS = 1000 # Ranked matches handed to the SQL filters, per query
+
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(food_name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+)
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX IF NOT EXISTS ix_foods_search_document ON foods USING gin (({SEARCH_DOCUMENT}))",
+    "CREATE INDEX IF NOT EXISTS ix_foods_food_name_trgm ON foods USING gin (food_name gin_trgm_ops)",
+]
+POSTGRES_QUERY = text(f"""
+    SELECT food_id, ts_rank({SEARCH_DOCUMENT}, q) + similarity(food_name, :term) AS score
+    FROM foods, to_tsquery('simple', :tsquery) AS q
+    WHERE restaurant_id = :restaurant_id
+      AND (({SEARCH_DOCUMENT}) @@ q OR food_name % :term)
+    ORDER BY score DESC
+    LIMIT :limit
+""")
+
+def tokenize(value: Optional[str]) -> List[str]:
+    return WORD_RE.findall(value.lower()) if value else []
+
+def trigrams(token: str) -> Set[str]:
+    """pg_trgm style: padded with two leading and one trailing space."""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class MemorySearchIndex:
+    """
+    Inverted index token -> {food_id: weight}, sharded per restaurant, plus a
+    trigram index over the whole vocabulary for fuzzy lookup.
+    Kept current by mapper events in this process; writes made by other workers
+    are picked up by `catch_up`: every food write bumps its restaurant's
+    catalog_versions row, and a restaurant whose version moved is re-read.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._docs: Dict[int, tuple] = {} # food_id -> (restaurant_id, {token: weight})
+        self._shards: Dict[Optional[int], Dict[str, Dict[int, float]]] = {}
+        self._vocab: Dict[str, int] = {} # token -> number of shards using it
+        self._token_trigrams: Dict[str, Set[str]] = {}
+        self._trigram_tokens: Dict[str, Set[str]] = {}
+        self._max_id = 0
+        self._versions: Dict[int, int] = {} # restaurant_id -> catalog version the shard reflects
+
+    def __len__(self):
+        return len(self._docs)
+
+    def upsert(self, food_id: int, restaurant_id: Optional[int], name: Optional[str], description: Optional[str]):
+        weights: Dict[str, float] = {}
+        for token in tokenize(name):
+            weights[token] = max(weights.get(token, 0.0), NAME_WEIGHT)
+        for token in tokenize(description):
+            weights[token] = max(weights.get(token, 0.0), DESCRIPTION_WEIGHT)
+
+        with self._lock:
+            self._remove(food_id)
+            self._docs[food_id] = (restaurant_id, weights)
+            self._max_id = max(self._max_id, food_id)
+            shard = self._shards.setdefault(restaurant_id, {})
+            for token, weight in weights.items():
+                postings = shard.get(token)
+                if postings is None:
+                    postings = shard[token] = {}
+                    self._add_token(token)
+                postings[food_id] = weight
+
+    def remove(self, food_id: int):
+        with self._lock:
+            self._remove(food_id)
+
+    def _remove(self, food_id: int):
+        doc = self._docs.pop(food_id, None)
+        if doc is None:
+            return
+        restaurant_id, weights = doc
+        shard = self._shards[restaurant_id]
+        for token in weights:
+            postings = shard[token]
+            postings.pop(food_id, None)
+            if not postings:
+                del shard[token]
+                self._drop_token(token)
+
+    def _add_token(self, token: str):
+        count = self._vocab.get(token, 0)
+        self._vocab[token] = count + 1
+        if count == 0:
+            tris = trigrams(token)
+            self._token_trigrams[token] = tris
+            for tri in tris:
+                self._trigram_tokens.setdefault(tri, set()).add(token)
+
+    def _drop_token(self, token: str):
+        # Drop unused tokens from the vocabulary so fuzzy lookups don't keep finding them
+        count = self._vocab[token] - 1
+        if count:
+            self._vocab[token] = count
+            return
+        del self._vocab[token]
+        for tri in self._token_trigrams.pop(token, ()):
+            tokens = self._trigram_tokens[tri]
+            tokens.discard(token)
+            if not tokens:
+                del self._trigram_tokens[tri]
+
+    @staticmethod
+    def _food_rows(db):
+        return db.query(models.Food.food_id, models.Food.restaurant_id, models.Food.food_name, models.Food.description)
+
+    @staticmethod
+    def _catalog_versions(db, restaurant_id: Optional[int] = None) -> Dict[int, int]:
+        query = db.query(models.CatalogVersion.restaurant_id, models.CatalogVersion.version)
+        if restaurant_id is not None:
+            query = query.filter(models.CatalogVersion.restaurant_id == restaurant_id)
+        return dict(query.all())
+
+    def load(self, db):
+        """Warm the index from the foods table (once per process)."""
+        # Versions first: a write landing during the load is re-read by the next catch_up
+        self._versions.update(self._catalog_versions(db))
+        self._add_rows(self._food_rows(db).yield_per(10_000))
+
+    def catch_up(self, db, restaurant_id: Optional[int] = None):
+        """
+        Re-read restaurants (all, or just `restaurant_id`) whose catalog version moved since
+        they were indexed: renames, description edits and deletes made by another worker.
+        Then index foods inserted since the last seen id (bulk imports that bump nothing).
+        """
+        for r_id, version in self._catalog_versions(db, restaurant_id).items():
+            if self._versions.get(r_id) != version:
+                self._reload_restaurant(db, r_id)
+                self._versions[r_id] = version
+        self._add_rows(self._food_rows(db).filter(models.Food.food_id > self._max_id).yield_per(10_000))
+
+    def _reload_restaurant(self, db, restaurant_id: int):
+        rows = self._food_rows(db).filter(models.Food.restaurant_id == restaurant_id).all()
+        current = {row[0] for row in rows}
+        with self._lock:
+            shard = self._shards.get(restaurant_id, {})
+            stale = {food_id for postings in shard.values() for food_id in postings} - current
+            for food_id in stale:
+                self._remove(food_id)
+        self._add_rows(rows)
+
+    def _add_rows(self, rows):
+        for food_id, restaurant_id, name, description in rows:
+            self.upsert(food_id, restaurant_id, name, description)
+
+    def _expand(self, term: str) -> Dict[str, float]:
+        """Vocabulary tokens matching a query term: exact, prefix, or within trigram similarity."""
+        matches = {term: 1.0} if term in self._vocab else {}
+        term_tris = trigrams(term)
+        shared: Dict[str, int] = {}
+        for tri in term_tris:
+            for token in self._trigram_tokens.get(tri, ()):
+                shared[token] = shared.get(token, 0) + 1
+
+        for token, count in shared.items():
+            if token in matches:
+                continue
+            if token.startswith(term):
+                matches[token] = PREFIX_SIMILARITY
+                continue
+            similarity = count / (len(term_tris) + len(self._token_trigrams[token]) - count)
+            if similarity >= FUZZY_THRESHOLD:
+                matches[token] = similarity
+        return matches
+
+    def _term_scores(self, shards, term: str) -> Dict[int, float]:
+        expansions = self._expand(term)
+        lists = [(postings, similarity) for shard in shards for token, similarity in expansions.items()
+                 if (postings := shard.get(token))]
+        if len(lists) == 1 and lists[0][1] == 1.0:
+            return lists[0][0] # Exact single token: the postings are the scores (read only)
+
+        scores: Dict[int, float] = {}
+        for postings, similarity in lists:
+            for food_id, weight in postings.items():
+                score = weight * similarity
+                if score > scores.get(food_id, 0.0):
+                    scores[food_id] = score
+        return scores
+
+    def search(self, query: str, restaurant_id: Optional[int] = None, limit: int = MAX_RESULTS) -> Dict[int, float]:
+        """Top `limit` foods matching every query term, scored by field weight x match similarity."""
+        terms = tokenize(query)
+        if not terms:
+            return {}
+
+        with self._lock:
+            if restaurant_id is None:
+                shards = list(self._shards.values())
+            else:
+                shards = [self._shards[restaurant_id]] if restaurant_id in self._shards else []
+
+            scores: Optional[Dict[int, float]] = None
+            for term in terms:
+                term_scores = self._term_scores(shards, term)
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {f: s + term_scores[f] for f, s in scores.items() if f in term_scores}
+                if not scores:
+                    return {}
+
+            if len(scores) <= limit:
+                return dict(scores)
+            return dict(heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0])))
+
+class FoodSearch:
+    """Picks the Postgres indexes when they can be created, else the in-process index."""
+    def __init__(self):
+        self.backend: Optional[str] = None
+        self.memory = MemorySearchIndex()
+
+    def init(self, db):
+        """Called on startup: create the Postgres search indexes, or warm the in-process index."""
+        if db.bind.dialect.name == "postgresql":
+            try:
+                for statement in POSTGRES_DDL:
+                    db.execute(text(statement))
+                db.commit()
+                self.backend = "postgres"
+                return
+            except Exception as e:
+                db.rollback()
+                logger.warning(f"Postgres search indexes unavailable, using in-process index: {e}")
+        self.backend = "memory"
+        self.memory.load(db)
+
+    def search(self, db, query: str, restaurant_id: Optional[int] = None) -> Dict[int, float]:
+        if self.backend == "postgres":
+            terms = tokenize(query)
+            if not terms:
+                return {}
+            rows = db.execute(POSTGRES_QUERY, {
+                "term": query,
+                "tsquery": " & ".join(f"{t}:*" for t in terms),
+                "restaurant_id": restaurant_id,
+                "limit": MAX_RESULTS,
+            })
+            return {food_id: float(score) for food_id, score in rows}
+
+        self.memory.catch_up(db, restaurant_id)
+        return self.memory.search(query, restaurant_id)
+
+food_search = FoodSearch()
+
+# Food writes reach the in-process index once their session commits (never for rolled
+# back work: catch_up couldn't repair those, their catalog bump is rolled back too).
+PENDING_KEY = "food_search"
+
+def _queue(target, change: tuple):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(PENDING_KEY, []).append(change)
+
+@event.listens_for(models.Food, "after_insert")
+@event.listens_for(models.Food, "after_update")
+def _sync_food_search(mapper, connection, target):
+    if food_search.backend == "postgres":
+        return
+    _queue(target, (target.food_id, target.restaurant_id, target.food_name, target.description))
+
+@event.listens_for(models.Food, "after_delete")
+def _drop_food_search(mapper, connection, target):
+    if food_search.backend == "postgres":
+        return
+    _queue(target, (target.food_id,))
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    for change in session.info.pop(PENDING_KEY, ()):
+        if len(change) == 1:
+            food_search.memory.remove(*change)
+        else:
+            food_search.memory.upsert(*change)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_rolled_back(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
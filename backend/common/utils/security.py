@@ -1,10 +1,12 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt, JWTError
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
+import os
 from .. import schemas, models, database
+from .ttl_cache import TTLCache
 
 # Secret key for JWT encoding (should be in env vars in prod)
 SECRET_KEY = "SECRET_SUPER_SECRET_KEY_CHANGE_ME"
@@ -21,6 +23,7 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -32,22 +35,53 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+class UserCache(TTLCache):
+    """
+    Bounded TTL/LRU cache of resolved users, keyed by token `sub`.
+    Stores detached column snapshots; callers merge them into their own session
+    without a SELECT. Per-process only: other workers see changes after the TTL.
+    """
+    def get(self, sub: str) -> Optional[models.User]:
+        return super().get(sub)
+
+    def set(self, sub: str, user: models.User) -> Optional[models.User]:
+        """Cache a detached snapshot of `user` and return it (None when disabled)."""
+        if self.ttl_seconds <= 0:
+            return None
+        # Copy loaded columns into a detached instance (no session, no relationships)
+        snapshot = models.User(**{c.key: getattr(user, c.key) for c in models.User.__table__.columns})
+        make_transient_to_detached(snapshot)
+        return super().set(sub, snapshot)
+
+    def invalidate_user(self, user_id: int):
+        """Drop every cached sub (id or phone) resolving to this user."""
+        self.discard(lambda sub, snapshot: snapshot.id == user_id)
+
+user_cache = UserCache(
+    max_size=int(os.getenv("USER_CACHE_MAX_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+)
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _decode_subject(token: str) -> str:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         sub: str = payload.get("sub")
         if sub is None:
-            raise credentials_exception
+            raise _credentials_exception()
         # Token data now just holds the subject identifier
         token_data = schemas.TokenData(phone_number=sub) 
     except JWTError:
-        raise credentials_exception
-        
+        raise _credentials_exception()
+    return sub
+
+def _lookup_user(db: Session, sub: str) -> Optional[models.User]:
     # Logic: Try to find by ID (new standard) or Phone (legacy compatibility)
     user = None
     
@@ -72,13 +106,89 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         
     if not user:
          user = db.query(models.User).filter(models.User.phone_number == sub).first()
-         
+    return user
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    sub = _decode_subject(token)
+        
+    # Fast path: cached identity, attached to this session without a query
+    cached = user_cache.get(sub)
+    if cached is not None:
+        return db.merge(cached, load=False)
+        
+    user = _lookup_user(db, sub)
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    user_cache.set(sub, user)
     return user
 
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db = Depends(database.get_async_db)):
+    """
+    Async request path variant. Returns a detached snapshot (column values only),
+    so routes should pass `current_user.id` into services rather than the object.
+    """
+    sub = _decode_subject(token)
+    
+    cached = user_cache.get(sub)
+    if cached is not None:
+        return cached
+        
+    user = await db.run_sync(lambda sync_db: _lookup_user(sync_db, sub))
+    if user is None:
+        raise _credentials_exception()
+    return user_cache.set(sub, user) or user
+
+def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None, description="Bearer token, for EventSource clients that can't set headers"),
+    db: Session = Depends(database.get_db, scope="function")
+):
+    """
+    Auth for long-lived streams. The session is closed as soon as the route returns its
+    response (not when the stream ends), so an open stream holds no pooled connection.
+    Returns a detached user; read column values only.
+    """
+    token = token or access_token
+    if not token:
+        raise _credentials_exception()
+    sub = _decode_subject(token)
+
+    cached = user_cache.get(sub)
+    if cached is not None:
+        return cached
+
+    user = _lookup_user(db, sub)
+    if user is None:
+        raise _credentials_exception()
+    return user_cache.set(sub, user) or user
+
+async def get_stream_user_async(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None, description="Bearer token, for EventSource clients that can't set headers"),
+    db = Depends(database.get_async_db, scope="function")
+):
+    """get_stream_user for the async request path (DB_ASYNC=true)."""
+    token = token or access_token
+    if not token:
+        raise _credentials_exception()
+    sub = _decode_subject(token)
+
+    cached = user_cache.get(sub)
+    if cached is not None:
+        return cached
+
+    user = await db.run_sync(lambda sync_db: _lookup_user(sync_db, sub))
+    if user is None:
+        raise _credentials_exception()
+    return user_cache.set(sub, user) or user
+
 def get_current_active_kitchen_user(current_user: models.User = Depends(get_current_user)):
     # Role 1 is for admin/kitchen staff
     if current_user.role != 1:
         raise HTTPException(status_code=400, detail="Not a kitchen/admin user")
     return current_user
+
+async def get_current_active_kitchen_user_async(current_user: models.User = Depends(get_current_user_async)):
+    if current_user.role != 1:
+        raise HTTPException(status_code=400, detail="Not a kitchen/admin user")
+    return current_user
@@ -26,3 +26,87 @@ def seed_default_restaurant(db: Session):
             print(f"Warning: Could not update sequence (might be SQLite?): {e}")
 
     return default_restaurant
+
+def backfill_geo_cells(db: Session):
+    """
+    Assign grid cells to restaurants inserted before geo indexing (or by Core bulk inserts,
+    which skip the mapper event in utils/geo.py).
+    """
+    from .geo import cell_key
+    pending = db.query(models.Restaurant).filter(
+        models.Restaurant.geo_cell == None,
+        models.Restaurant.latitude != None,
+        models.Restaurant.longitude != None
+    ).all()
+    
+    for restaurant in pending:
+        restaurant.geo_cell = cell_key(restaurant.latitude, restaurant.longitude)
+        
+    if pending:
+        db.commit()
+    return len(pending)
+
+def backfill_order_updated_at(db: Session):
+    """
+    Give orders written before updated_at had a default their creation time, so the
+    kitchen board (versioned on updated_at) orders and reports them like newer ones.
+    """
+    updated = db.query(models.Order).filter(models.Order.updated_at == None)\
+        .update({models.Order.updated_at: models.Order.created_at}, synchronize_session=False)
+    if updated:
+        db.commit()
+    return updated
+
+def backfill_menu_facets(db: Session):
+    """
+    Build the menu filter summary for databases created before it existed (or bulk imports).
+    """
+    from .menu_facets import rebuild
+    has_facets = db.query(models.MenuFacet.id).first() is not None
+    has_foods = db.query(models.Food.food_id).first() is not None
+    if has_foods and not has_facets:
+        rebuild(db)
+        return True
+    return False
+
+def backfill_rating_aggregates(db: Session):
+    """
+    Fill rating_sum/rating_count for feedback written before the running aggregates existed.
+    """
+    from .ratings import backfill
+    unaggregated = db.query(models.Feedback.id).first() is not None and \
+        db.query(models.Food.food_id).filter(models.Food.rating_count > 0).first() is None
+    if unaggregated:
+        return backfill(db)
+    return 0
+
+def backfill_order_batches(db: Session):
+    """
+    Write order_batches headers for checkouts placed before headers existed.
+    Discounts weren't stored then, so final_amount is the line subtotal.
+    """
+    from sqlalchemy import func, insert, select
+    from .order_status import refresh_batch_status
+    has_headers = db.query(models.OrderBatch.id).first() is not None
+    has_batches = db.query(models.Order.id).filter(models.Order.batch_id != None).first() is not None
+    if has_headers or not has_batches:
+        return 0
+
+    subtotal = func.coalesce(func.sum(models.Order.price_at_order * models.Order.quantity), 0.0)
+    rows = db.execute(
+        select(
+            models.Order.batch_id, func.min(models.Order.user_id), func.min(models.Order.restaurant_id),
+            func.min(models.Order.address_id), func.count(models.Order.id), subtotal, func.min(models.Order.created_at)
+        ).where(models.Order.batch_id != None).group_by(models.Order.batch_id)
+    ).all()
+    db.execute(insert(models.OrderBatch), [
+        {
+            "batch_id": batch_id, "user_id": user_id, "restaurant_id": restaurant_id, "address_id": address_id,
+            "item_count": count, "subtotal": total, "discount_amount": 0.0, "final_amount": total,
+            "status": "created", "created_at": created_at, "updated_at": created_at,
+        }
+        for batch_id, user_id, restaurant_id, address_id, count, total, created_at in rows
+    ])
+    refresh_batch_status(db, [r[0] for r in rows])
+    db.commit()
+    return len(rows)
@@ -1,23 +1,62 @@
 from .minio_service import MinioService
+from .images import StoredImage, hash_stream, original_key, image_processor, IMMUTABLE_CACHE_CONTROL
 from fastapi import UploadFile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+import asyncio
+import os
 
 # UPLOAD_DIR = "uploads"
 # os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# The MinIO client is blocking; uploads run here instead of on the event loop
+UPLOAD_THREADS = int(os.getenv("UPLOAD_THREADS", "8"))
+_upload_executor = ThreadPoolExecutor(max_workers=UPLOAD_THREADS, thread_name_prefix="upload")
+
+def _store(file_obj, file_name: str, content_type: str) -> StoredImage:
+    # The content hash names the object: hash the spooled file in chunks, then rewind
+    # and stream it (the hashing pass measured its length)
+    digest, size = hash_stream(file_obj)
+    file_obj.seek(0)
+    key = original_key(digest, file_name)
+    url = MinioService.upload_file(file_obj, key, content_type, size, cache_control=IMMUTABLE_CACHE_CONTROL)
+    if not url:
+        raise Exception("Failed to upload image to MinIO")
+    return StoredImage(url, digest, key)
+
 class StorageService:
+    @staticmethod
+    async def store_image(file: UploadFile) -> StoredImage:
+        """
+        Uploads the original to MinIO under its content hash, with immutable cache headers.
+        Derivatives are not generated; pass the result to image_processor.submit.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_upload_executor, _store, file.file, file.filename, file.content_type)
+
+    @staticmethod
+    async def store_images(files: List[UploadFile]) -> List[StoredImage]:
+        """
+        Uploads several files concurrently. Results are returned in input order.
+        """
+        return list(await asyncio.gather(*(StorageService.store_image(f) for f in files)))
+
     @staticmethod
     async def upload_image(file: UploadFile) -> str:
         """
-        Uploads file to MinIO Storage.
+        Uploads file to MinIO Storage and queues its derivatives.
         Returns the public URL.
         """
-        # Ensure bucket and client are ready
-        # file.file is a SpooledTemporaryFile
-        url = MinioService.upload_file(file.file, file.filename, file.content_type)
-        if not url:
-            raise Exception("Failed to upload image to MinIO")
-            
-        return url
+        stored = await StorageService.store_image(file)
+        image_processor.submit(stored)
+        return stored.url
+
+    @staticmethod
+    async def upload_images(files: List[UploadFile]) -> List[str]:
+        """
+        Uploads several files concurrently and queues their derivatives. URLs are returned in input order.
+        """
+        return list(await asyncio.gather(*(StorageService.upload_image(f) for f in files)))
 
     @staticmethod
     def get_gcs_client():
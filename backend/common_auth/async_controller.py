@@ -0,0 +1,29 @@
+"""
+Async request path (DB_ASYNC=true) for the most frequent auth calls.
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..common import models, schemas, database
+from ..common.utils.security import get_current_user_async
+from .service import AsyncAuthService
+
+router = APIRouter(
+    prefix="/auth",
+    tags=["auth"]
+)
+
+@router.get("/me", response_model=schemas.User)
+async def read_users_me(current_user: models.User = Depends(get_current_user_async)):
+    return current_user
+
+@router.put("/me", response_model=schemas.User)
+async def update_profile(
+    user_update: schemas.UserCreate,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    service = AsyncAuthService(db)
+    updated_user = await service.update_user_profile(current_user.id, user_update, serialize=schemas.User)
+    if not updated_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return updated_user
@@ -2,7 +2,7 @@ from typing import List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from ..common import models, schemas, database
-from ..common.utils.security import get_current_user
+from ..common.utils.security import get_current_user, get_current_active_kitchen_user, user_cache
 from .service import AuthService
 
 router = APIRouter(
@@ -10,6 +10,11 @@ router = APIRouter(
     tags=["auth"]
 )
 
+admin_router = APIRouter(
+    prefix="/admin",
+    tags=["admin"]
+)
+
 @router.post("/register", response_model=schemas.User)
 def register(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
     service = AuthService(db)
@@ -128,6 +133,7 @@ def update_profile_name(
         current_user.name = update_data['name']
         db.commit()
         db.refresh(current_user)
+        user_cache.invalidate_user(current_user.id)
     return {"message": "Profile updated successfully"}
 
 @router.put("/addresses/{address_id}", response_model=schemas.Address)
@@ -189,6 +195,11 @@ def panel(current_user: models.User = Depends(get_current_user)):
         "message": f"Welcome {current_user.name}."
     }
 
+@router.get("/cache-stats")
+def user_cache_stats(current_user: models.User = Depends(get_current_active_kitchen_user)):
+    """Identity cache hit/miss counters (Admin)"""
+    return user_cache.stats()
+
 @router.get("/hi")
 def hi():
     return {"message": "Hi"}
@@ -226,3 +237,16 @@ def register_device_token(token: str, device_type: str = "mobile", current_user:
     
     db.commit()
     return {"message": "Device registered"}
+
+# --- Admin / Ops Endpoints ---
+
+@admin_router.get("/db-pool")
+def db_pool_status(current_user: models.User = Depends(get_current_active_kitchen_user)):
+    """Connection pool occupancy and checkout wait-time histogram"""
+    return database.get_pool_status()
+
+@admin_router.get("/scheduler")
+def scheduler_status(current_user: models.User = Depends(get_current_active_kitchen_user)):
+    """Scheduler leadership and per-job duration/lag metrics"""
+    from ..common.utils.scheduler import get_scheduler_status
+    return get_scheduler_status()
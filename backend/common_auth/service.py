@@ -2,6 +2,7 @@ from typing import Optional
 from datetime import timedelta
 from sqlalchemy.orm import Session
 from ..common import models, schemas
+from ..common.async_service import AsyncServiceProxy
 from ..common.utils import sms, security
 from ..common.utils.security import create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 
@@ -121,6 +122,7 @@ class AuthService:
                     user.name = custom_name
                 user.auth_provider = provider
                 self.db.commit()
+                security.user_cache.invalidate_user(user.id)
             else:
                 # 4. Create New User
                 user = models.User(
@@ -166,6 +168,7 @@ class AuthService:
         
         self.db.commit()
         self.db.refresh(user)
+        security.user_cache.invalidate_user(user.id)
         return user
 
     def update_address(self, user_id: int, address_id: int, address_update: schemas.AddressCreate) -> models.UserAddress:
@@ -252,5 +255,10 @@ class AuthService:
             user.role = 1
             self.db.commit()
             self.db.refresh(user)
+            security.user_cache.invalidate_user(user.id)
             return user
         return None
+
+class AsyncAuthService(AsyncServiceProxy):
+    """Async variant (DB_ASYNC=true), see common/async_service.py"""
+    service_class = AuthService
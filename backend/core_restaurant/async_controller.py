@@ -0,0 +1,208 @@
+"""
+Async request path (DB_ASYNC=true) for the hot read/checkout endpoints.
+Mounted ahead of the sync routers in main.py, so these take precedence for the same paths.
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..common import models, schemas, database
+from ..common.utils.security import get_current_user_async, get_stream_user_async
+from ..common.utils import pagination, order_events
+from ..common.utils.response_cache import conditional_response
+from ..common.utils.catalog import catalog_conditional_async, query_scope, path_scope
+from .service import AsyncCoreRestaurantService, ORDER_PAGE_KEY, menu_sort, home_cache, home_cache_key
+from .table_service import AsyncTableService
+
+orders_router = APIRouter(prefix="/orders", tags=["orders"])
+menu_router = APIRouter(prefix="/menu", tags=["menu"])
+table_router = APIRouter(prefix="/tables", tags=["tables"])
+restaurant_router = APIRouter(prefix="/restaurants", tags=["restaurants"])
+home_router = APIRouter(tags=["home"])
+
+# --- HOME SCREEN ---
+@home_router.get("/home", response_model=schemas.HomeScreen)
+async def get_home(
+    request: Request,
+    lat: Optional[float] = Query(None, description="User Latitude"),
+    lng: Optional[float] = Query(None, description="User Longitude"),
+    restaurant_id: int = Query(1, description="Restaurant whose menu filters are included"),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    key, cell_lat, cell_lng = home_cache_key(lat, lng, restaurant_id)
+    cached = home_cache.get(key)
+    if cached is None:
+        service = AsyncCoreRestaurantService(db)
+        home = await service.get_home(cell_lat, cell_lng, restaurant_id, serialize=schemas.HomeScreen)
+        cached = home_cache.set(key, home.model_dump_json().encode())
+    return conditional_response(request, cached)
+
+# --- RESTAURANT ROUTES ---
+@restaurant_router.get("/", response_model=List[schemas.Restaurant])
+async def get_restaurants(
+    search: Optional[str] = Query(None, description="Search by name"),
+    lat: Optional[float] = Query(None, description="User Latitude"),
+    lng: Optional[float] = Query(None, description="User Longitude"),
+    radius_km: Optional[float] = Query(None, description="Only restaurants within this distance (km); ones without coordinates are left out"),
+    limit: Optional[int] = Query(None, ge=1, description="Max restaurants returned (nearest first when lat/lng given); all by default"),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    service = AsyncCoreRestaurantService(db)
+    return await service.get_restaurants(search, lat, lng, radius_km, limit, serialize=schemas.Restaurant)
+
+@restaurant_router.get("/{restaurant_id}", response_model=schemas.Restaurant, dependencies=[Depends(catalog_conditional_async(path_scope()))])
+async def get_restaurant(
+    restaurant_id: int,
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    service = AsyncCoreRestaurantService(db)
+    res = await service.get_restaurant_by_id(restaurant_id, serialize=schemas.Restaurant)
+    if not res:
+        raise HTTPException(status_code=404, detail="Restaurant not found")
+    return res
+
+# --- MENU ROUTES ---
+@menu_router.get("/filters")
+async def get_menu_filters(
+    restaurant_id: Optional[int] = Query(1, description="Restaurant ID"),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    service = AsyncCoreRestaurantService(db)
+    return await service.get_menu_meta(restaurant_id)
+
+@menu_router.get("/", response_model=List[schemas.Food], dependencies=[Depends(catalog_conditional_async(query_scope()))])
+async def read_menu(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (X-Next-Cursor header)"),
+    search: Optional[str] = Query(None, description="Search by name or description"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    min_price: Optional[float] = Query(None, description="Min price"),
+    max_price: Optional[float] = Query(None, description="Max price"),
+    is_veg: Optional[bool] = Query(None, description="Filter by dietary preference"),
+    sort_by: Optional[str] = Query(None, description="Sort: price_low, price_high, rating, relevance (with search)"),
+    restaurant_id: Optional[int] = Query(1, description="Restaurant ID"),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    service = AsyncCoreRestaurantService(db)
+    try:
+        foods = await service.get_foods(
+            skip=skip, limit=limit,
+            search=search, category=category,
+            min_price=min_price, max_price=max_price,
+            is_veg=is_veg, sort_by=sort_by,
+            restaurant_id=restaurant_id,
+            cursor=cursor,
+            serialize=schemas.Food
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    sort_name, attrs, _ = menu_sort(sort_by, search)
+    next_cursor = pagination.next_cursor(foods, limit, attrs, sort_name)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return foods
+
+# --- TABLE ROUTES ---
+@table_router.get("/", response_model=List[schemas.Table], dependencies=[Depends(catalog_conditional_async(1))])
+async def get_tables(db: AsyncSession = Depends(database.get_async_db)):
+    service = AsyncTableService(db)
+    return await service.get_tables(serialize=schemas.Table)
+
+# --- ORDER ROUTES ---
+@orders_router.post("/checkout", response_model=schemas.BatchOrderSummary)
+async def checkout_orders(
+    checkout_req: schemas.CheckoutRequest,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    service = AsyncCoreRestaurantService(db)
+    try:
+        return await service.checkout(checkout_req, current_user.id, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@orders_router.get("/", response_model=List[schemas.Order])
+async def read_orders(
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (X-Next-Cursor header)"),
+    include_archive: bool = Query(False, description="Also return archived (older delivered/cancelled) orders"),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    service = AsyncCoreRestaurantService(db)
+    try:
+        if current_user.role == 1:
+            orders = await service.get_all_orders(skip=skip, limit=limit, cursor=cursor, serialize=schemas.Order)
+        else:
+            orders = await service.get_user_orders(
+                user_id=current_user.id, skip=skip, limit=limit, cursor=cursor,
+                include_archive=include_archive, serialize=schemas.Order
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = pagination.next_cursor(orders, limit, ORDER_PAGE_KEY, "orders")
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return orders
+
+@orders_router.get("/batches", response_model=List[schemas.OrderBatch])
+async def read_order_batches(
+    response: Response,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (X-Next-Cursor header)"),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    service = AsyncCoreRestaurantService(db)
+    try:
+        batches = await service.get_order_batches(
+            user_id=None if current_user.role == 1 else current_user.id, skip=skip, limit=limit,
+            cursor=cursor, serialize=schemas.OrderBatch
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = pagination.next_cursor(batches, limit, ORDER_PAGE_KEY, "orders")
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return batches
+
+@orders_router.get("/batches/{batch_id}", response_model=schemas.OrderBatchDetail)
+async def read_order_batch(
+    batch_id: str,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    service = AsyncCoreRestaurantService(db)
+    batch = await service.get_order_batch(batch_id, serialize=schemas.OrderBatchDetail)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if current_user.role != 1 and batch.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this order")
+    return batch
+
+@orders_router.get("/stream")
+async def stream_orders(current_user: models.User = Depends(get_stream_user_async)):
+    return order_events.stream_response([order_events.user_channel(current_user.id)])
+
+@orders_router.get("/{order_id}", response_model=schemas.Order)
+async def read_order(
+    order_id: int,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    service = AsyncCoreRestaurantService(db)
+    order = await service.get_order_by_id(order_id, serialize=schemas.Order)
+    if order is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+
+    if current_user.role != 1 and order.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this order")
+
+    return order
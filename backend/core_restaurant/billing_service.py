@@ -1,20 +1,114 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from sqlalchemy import func, select, union_all
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from ..common import models
+from ..common.utils.order_status import CANCELLED
+from .service import CoreRestaurantService
+
+# Bills are one aggregate over the lines' price_at_order * quantity (live and archived),
+# stored as an Invoice per (user, scope) together with the user's BillVersion at the
+# time. Checkouts and cancellations advance that version in their own transaction, so
+# until then the same bill is a single unique-key lookup. The version is read before
+# the lines: lines committed in between make the new invoice stale, never wrongly current.
 
 class BillingService:
     def __init__(self, db: Session):
         self.db = db
 
-    def calculate_bill(self, user_id: int, coupon_code: str = None):
-        # Get all orders for user (maybe filter by 'finished' or 'delivered' in real app)
-        orders = self.db.query(models.Order).filter(models.Order.user_id == user_id).all()
-        
-        total = 0.0
-        for order in orders:
-            if order.food:
-                total += order.food.food_price * order.quantity
-        
-        if coupon_code == "DIWALI10":
-            total = total - (total * 0.1)
-            
-        return total
+    @staticmethod
+    def _scope(batch_id: Optional[str], date_from: Optional[date], date_to: Optional[date],
+               coupon_code: Optional[str]) -> str:
+        return f"batch={batch_id or ''}|from={date_from or ''}|to={date_to or ''}|coupon={coupon_code or ''}"
+
+    def _lines(self, entity, user_id: int, batch_id: Optional[str], date_from: Optional[date], date_to: Optional[date]):
+        query = select((entity.price_at_order * entity.quantity).label("amount")).where(
+            entity.user_id == user_id, entity.status != CANCELLED
+        )
+        if batch_id:
+            query = query.where(entity.batch_id == batch_id)
+        if date_from:
+            query = query.where(entity.created_at >= datetime.combine(date_from, time.min))
+        if date_to:
+            query = query.where(entity.created_at < datetime.combine(date_to + timedelta(days=1), time.min))
+        return query
+
+    def _totals(self, user_id: int, batch_id: Optional[str], date_from: Optional[date], date_to: Optional[date]):
+        """(line count, subtotal) in one statement; archived lines count too."""
+        lines = union_all(
+            self._lines(models.Order, user_id, batch_id, date_from, date_to),
+            self._lines(models.ArchivedOrder, user_id, batch_id, date_from, date_to),
+        ).subquery()
+        count, subtotal = self.db.execute(
+            select(func.count(), func.coalesce(func.sum(lines.c.amount), 0.0)).select_from(lines)
+        ).one()
+        return count, float(subtotal)
+
+    def _is_current(self, invoice: models.Invoice, version: int, coupon_code: Optional[str]) -> bool:
+        """Stored bill still valid: same lines (version), coupon unexpired and unchanged."""
+        if invoice.version != version:
+            return False
+        if invoice.expires_at is not None and invoice.expires_at < datetime.now():
+            return False
+        if coupon_code:
+            # Coupons are edited and deactivated in place: re-check against the stored
+            # subtotal (raises like a fresh bill when the coupon no longer applies)
+            discount, _ = CoreRestaurantService(self.db).validate_coupon(coupon_code, invoice.subtotal)
+            return discount == invoice.discount_amount
+        return True
+
+    def calculate_bill(self, user_id: int, coupon_code: str = None, batch_id: str = None,
+                       date_from: date = None, date_to: date = None) -> Optional[models.Invoice]:
+        """
+        Bill for the user's lines, optionally one checkout (`batch_id`) and/or a created_at
+        date range (inclusive). `coupon_code` is checked like at checkout; without one, a
+        batch keeps the discount it was placed with. None when the batch isn't the user's.
+        """
+        if date_from and date_to and date_from > date_to:
+            raise ValueError("date_from must not be after date_to")
+
+        scope = self._scope(batch_id, date_from, date_to, coupon_code)
+        current = select(models.BillVersion.version).where(models.BillVersion.user_id == user_id).scalar_subquery()
+        row = self.db.execute(
+            select(models.Invoice, func.coalesce(current, 0))
+            .where(models.Invoice.user_id == user_id, models.Invoice.scope == scope)
+        ).first()
+        if row is not None:
+            invoice, version = row
+            if self._is_current(invoice, version, coupon_code):
+                return invoice
+            self.db.delete(invoice)
+            self.db.flush()
+        else:
+            version = self.db.execute(select(func.coalesce(current, 0))).scalar()
+
+        batch = None
+        if batch_id:
+            batch = self.db.query(models.OrderBatch).filter(
+                models.OrderBatch.batch_id == batch_id, models.OrderBatch.user_id == user_id
+            ).first()
+            if batch is None:
+                return None
+
+        count, subtotal = self._totals(user_id, batch_id, date_from, date_to)
+        discount, applied_code, expires_at = 0.0, None, None
+        if coupon_code:
+            discount, coupon = CoreRestaurantService(self.db).validate_coupon(coupon_code, subtotal)
+            applied_code, expires_at = coupon.code, coupon.valid_until
+        elif batch is not None and batch.discount_amount:
+            # Cancelled lines can't leave a discount larger than what is still billed
+            discount, applied_code = min(batch.discount_amount, subtotal), batch.coupon_code
+
+        invoice = models.Invoice(
+            user_id=user_id, scope=scope, batch_id=batch_id, date_from=date_from, date_to=date_to,
+            coupon_code=applied_code, order_count=count, subtotal=subtotal,
+            discount_amount=discount, total_amount=subtotal - discount, expires_at=expires_at, version=version
+        )
+        self.db.add(invoice)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            # A concurrent request stored the same bill first; this one is identical
+            self.db.rollback()
+        return invoice
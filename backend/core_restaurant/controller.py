@@ -1,11 +1,15 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from datetime import date
 from ..common import models, schemas, database
-from ..common.utils.security import get_current_user, get_current_active_kitchen_user
+from ..common.utils.security import get_current_user, get_current_active_kitchen_user, get_stream_user
 from ..common.utils.storage import StorageService
-from .service import CoreRestaurantService
+from ..common.utils import pagination, order_events
+from ..common.utils.response_cache import conditional_response
+from ..common.utils.catalog import catalog_conditional, query_scope, path_scope, GLOBAL_SCOPE
+from ..common.utils.images import image_processor, derivative_urls
+from .service import CoreRestaurantService, ORDER_PAGE_KEY, menu_sort, home_cache, home_cache_key
 from .table_service import TableService
 from .billing_service import BillingService
 
@@ -15,6 +19,28 @@ table_router = APIRouter(prefix="/tables", tags=["tables"])
 reservation_router = APIRouter(prefix="/reservations", tags=["reservations"])
 billing_router = APIRouter(prefix="/bill", tags=["billing"])
 restaurant_router = APIRouter(prefix="/restaurants", tags=["restaurants"])
+home_router = APIRouter(tags=["home"])
+
+# --- HOME SCREEN ---
+@home_router.get("/home", response_model=schemas.HomeScreen)
+def get_home(
+    request: Request,
+    lat: Optional[float] = Query(None, description="User Latitude"),
+    lng: Optional[float] = Query(None, description="User Longitude"),
+    restaurant_id: int = Query(1, description="Restaurant whose menu filters are included"),
+    db: Session = Depends(database.get_db)
+):
+    """
+    Banners, collections, nearby restaurants and menu filters in one response.
+    Served from a per-location cache; send If-None-Match to get 304 when unchanged.
+    """
+    key, cell_lat, cell_lng = home_cache_key(lat, lng, restaurant_id)
+    cached = home_cache.get(key)
+    if cached is None:
+        home = CoreRestaurantService(db).get_home(cell_lat, cell_lng, restaurant_id)
+        body = schemas.HomeScreen.model_validate(home, from_attributes=True).model_dump_json().encode()
+        cached = home_cache.set(key, body)
+    return conditional_response(request, cached)
 
 # --- RESTAURANT ROUTES ---
 @restaurant_router.get("/", response_model=List[schemas.Restaurant])
@@ -22,12 +48,14 @@ def get_restaurants(
     search: Optional[str] = Query(None, description="Search by name"),
     lat: Optional[float] = Query(None, description="User Latitude"),
     lng: Optional[float] = Query(None, description="User Longitude"),
+    radius_km: Optional[float] = Query(None, description="Only restaurants within this distance (km); ones without coordinates are left out"),
+    limit: Optional[int] = Query(None, ge=1, description="Max restaurants returned (nearest first when lat/lng given); all by default"),
     db: Session = Depends(database.get_db)
 ):
     service = CoreRestaurantService(db)
-    return service.get_restaurants(search, lat, lng)
+    return service.get_restaurants(search, lat, lng, radius_km, limit)
 
-@restaurant_router.get("/{restaurant_id}", response_model=schemas.Restaurant)
+@restaurant_router.get("/{restaurant_id}", response_model=schemas.Restaurant, dependencies=[Depends(catalog_conditional(path_scope()))])
 def get_restaurant(
     restaurant_id: int,
     db: Session = Depends(database.get_db)
@@ -49,7 +77,7 @@ def create_restaurant(
 
 # --- Marketing & Discovery Endpoints ---
 
-@restaurant_router.get("/marketing/banners", response_model=List[schemas.Banner])
+@restaurant_router.get("/marketing/banners", response_model=List[schemas.Banner], dependencies=[Depends(catalog_conditional(GLOBAL_SCOPE))])
 def get_banners(db: Session = Depends(database.get_db)):
     service = CoreRestaurantService(db)
     return service.get_banners()
@@ -63,7 +91,7 @@ def create_banner(
     service = CoreRestaurantService(db)
     return service.create_banner(banner)
 
-@restaurant_router.get("/marketing/collections", response_model=List[schemas.Collection])
+@restaurant_router.get("/marketing/collections", response_model=List[schemas.Collection], dependencies=[Depends(catalog_conditional(GLOBAL_SCOPE))])
 def get_collections(db: Session = Depends(database.get_db)):
     service = CoreRestaurantService(db)
     return service.get_collections()
@@ -137,35 +165,52 @@ async def upload_food_image(
     file: UploadFile = File(...),
     current_user: models.User = Depends(get_current_active_kitchen_user)
 ):
-    url = await StorageService.upload_image(file)
-    return {"image_url": url}
+    stored = await StorageService.store_image(file)
+    image_processor.submit(stored)
+    # Derivative keys follow from the content hash; they resolve once processing finishes
+    return {"image_url": stored.url, "derivatives": derivative_urls(stored.digest)}
 
 @menu_router.get("/filters")
-def get_menu_filters(db: Session = Depends(database.get_db)):
+def get_menu_filters(
+    restaurant_id: Optional[int] = Query(1, description="Restaurant ID"),
+    db: Session = Depends(database.get_db)
+):
     service = CoreRestaurantService(db)
-    return service.get_menu_meta()
+    return service.get_menu_meta(restaurant_id)
 
-@menu_router.get("/", response_model=List[schemas.Food])
+@menu_router.get("/", response_model=List[schemas.Food], dependencies=[Depends(catalog_conditional(query_scope()))])
 def read_menu(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (X-Next-Cursor header)"),
     search: Optional[str] = Query(None, description="Search by name or description"),
     category: Optional[str] = Query(None, description="Filter by category"),
     min_price: Optional[float] = Query(None, description="Min price"),
     max_price: Optional[float] = Query(None, description="Max price"),
     is_veg: Optional[bool] = Query(None, description="Filter by dietary preference"),
-    sort_by: Optional[str] = Query(None, description="Sort: price_low, price_high, rating"),
+    sort_by: Optional[str] = Query(None, description="Sort: price_low, price_high, rating, relevance (with search)"),
     restaurant_id: Optional[int] = Query(1, description="Restaurant ID"),
     db: Session = Depends(database.get_db)
 ):
     service = CoreRestaurantService(db)
-    return service.get_foods(
-        skip=skip, limit=limit, 
-        search=search, category=category, 
-        min_price=min_price, max_price=max_price, 
-        is_veg=is_veg, sort_by=sort_by,
-        restaurant_id=restaurant_id
-    )
+    try:
+        foods = service.get_foods(
+            skip=skip, limit=limit, 
+            search=search, category=category, 
+            min_price=min_price, max_price=max_price, 
+            is_veg=is_veg, sort_by=sort_by,
+            restaurant_id=restaurant_id,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    sort_name, attrs, _ = menu_sort(sort_by, search)
+    next_cursor = pagination.next_cursor(foods, limit, attrs, sort_name)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return foods
 
 @menu_router.post("/{food_id}/favorite")
 def toggle_good_favorite(
@@ -209,10 +254,13 @@ async def create_food_item(
     return await service.create_food_with_images(food_create, images)
 
 # --- BILLING ROUTES ---
-@billing_router.get("/{user_id}")
+@billing_router.get("/{user_id}", response_model=schemas.Bill)
 def get_bill(
     user_id: int, 
     coupon_code: Optional[str] = None, 
+    batch_id: Optional[str] = Query(None, description="Bill one checkout"),
+    date_from: Optional[date] = Query(None, description="Orders placed on or after this day"),
+    date_to: Optional[date] = Query(None, description="Orders placed on or before this day"),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -221,10 +269,16 @@ def get_bill(
         raise HTTPException(status_code=403, detail="Not authorized")
         
     service = BillingService(db)
-    return {"total_amount": service.calculate_bill(user_id, coupon_code)}
+    try:
+        bill = service.calculate_bill(user_id, coupon_code, batch_id=batch_id, date_from=date_from, date_to=date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if bill is None:
+        raise HTTPException(status_code=404, detail="Order batch not found")
+    return bill
 
 # --- TABLE ROUTES ---
-@table_router.get("/", response_model=List[schemas.Table])
+@table_router.get("/", response_model=List[schemas.Table], dependencies=[Depends(catalog_conditional(1))])
 def get_tables(db: Session = Depends(database.get_db)):
     service = TableService(db)
     return service.get_tables()
@@ -305,16 +359,74 @@ def create_order(
 
 @orders_router.get("/", response_model=List[schemas.Order])
 def read_orders(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (X-Next-Cursor header)"),
+    include_archive: bool = Query(False, description="Also return archived (older delivered/cancelled) orders"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    service = CoreRestaurantService(db)
+    try:
+        if current_user.role == 1:
+            orders = service.get_all_orders(skip=skip, limit=limit, cursor=cursor)
+        else:
+            orders = service.get_user_orders(
+                user_id=current_user.id, skip=skip, limit=limit, cursor=cursor, include_archive=include_archive
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = pagination.next_cursor(orders, limit, ORDER_PAGE_KEY, "orders")
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return orders
+
+@orders_router.get("/batches", response_model=List[schemas.OrderBatch])
+def read_order_batches(
+    response: Response,
+    skip: int = 0,
+    limit: int = 50,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (X-Next-Cursor header)"),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    """Order history: one header per checkout (totals, discount, status), lines via /orders/batches/{batch_id}."""
     service = CoreRestaurantService(db)
-    if current_user.role == 1:
-        return service.get_all_orders(skip=skip, limit=limit)
-    else:
-        return service.get_user_orders(user_id=current_user.id, skip=skip, limit=limit)
+    try:
+        batches = service.get_order_batches(
+            user_id=None if current_user.role == 1 else current_user.id, skip=skip, limit=limit, cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = pagination.next_cursor(batches, limit, ORDER_PAGE_KEY, "orders")
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return batches
+
+@orders_router.get("/batches/{batch_id}", response_model=schemas.OrderBatchDetail)
+def read_order_batch(
+    batch_id: str,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    service = CoreRestaurantService(db)
+    batch = service.get_order_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Order not found")
+    if current_user.role != 1 and batch.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this order")
+    return batch
+
+@orders_router.get("/stream")
+async def stream_orders(current_user: models.User = Depends(get_stream_user)):
+    """
+    Server-sent events for the caller's orders: `order.created` and `order.status`,
+    each carrying order_id, batch_id, status and updated_at. Replaces polling GET /orders/{id}.
+    """
+    return order_events.stream_response([order_events.user_channel(current_user.id)])
 
 @orders_router.get("/{order_id}", response_model=schemas.Order)
 def read_order(
@@ -1,42 +1,149 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, Float, cast
 from typing import List, Optional
 from datetime import datetime
-from ..common import models, schemas
+import heapq
+import itertools
+import uuid
+from ..common import models, schemas, loaders
+from ..common.async_service import AsyncServiceProxy
+from ..common.utils import geo, pagination, menu_facets, ratings, catalog, search as menu_search
+from ..common.utils.images import image_processor, thumbnail_from, derivatives_for
+from ..common.utils.response_cache import ResponseCache
+import os
+
+GEO_CELL_CHUNK = 500
+
+# /home is cached as serialized bytes per (location cell, restaurant).
+# Distances are measured from the cell centre: ~1.1 km cells keep them within ~0.8 km.
+HOME_CELL_DEG = 0.01
+HOME_RESTAURANT_LIMIT = 20
+home_cache = ResponseCache(
+    max_size=int(os.getenv("HOME_CACHE_MAX_SIZE", "4096")),
+    ttl_seconds=float(os.getenv("HOME_CACHE_TTL_SECONDS", "60"))
+)
+
+@catalog.on_commit
+def _invalidate_home(scopes):
+    # Any committed catalog write (restaurants, foods and so the filters, ratings, banners,
+    # collections) can change /home. Only this process's cache: other workers catch up after the TTL.
+    home_cache.invalidate()
+
+def home_cache_key(lat: Optional[float], lng: Optional[float], restaurant_id: int):
+    """(cache key, cell centre lat, cell centre lng) for a /home request."""
+    if lat is None or lng is None:
+        return (None, restaurant_id), None, None
+    cell = (int(lat // HOME_CELL_DEG), int(lng // HOME_CELL_DEG))
+    return (cell, restaurant_id), (cell[0] + 0.5) * HOME_CELL_DEG, (cell[1] + 0.5) * HOME_CELL_DEG
+
+# Keyset order of paginated listings: (sort key(s), unique id), descending
+ORDER_PAGE_KEY = ("created_at", "id")
+MENU_SORTS = {
+    "price_low": (("food_price", "food_id"), False),
+    "price_high": (("food_price", "food_id"), True),
+    "rating": (("rating", "food_id"), True),
+    "relevance": (("search_score", "food_id"), True), # Only with a search term
+}
+MENU_DEFAULT_SORT = (("food_id",), False)
+
+def menu_sort(sort_by: Optional[str], search: Optional[str] = None):
+    """(cursor name, Food attributes, descending) for a menu sort option."""
+    if sort_by == "relevance" and not search:
+        sort_by = None
+    attrs, descending = MENU_SORTS.get(sort_by, MENU_DEFAULT_SORT)
+    return (sort_by if sort_by in MENU_SORTS else "menu"), attrs, descending
 
 class CoreRestaurantService:
     def __init__(self, db: Session):
         self.db = db
 
     # --- Restaurant Management ---
-    def get_restaurants(self, search: Optional[str] = None, lat: Optional[float] = None, lng: Optional[float] = None):
+    def get_restaurants(
+        self,
+        search: Optional[str] = None,
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        limit: Optional[int] = None
+    ):
         query = self.db.query(models.Restaurant)
         
         if search:
             query = query.filter(models.Restaurant.name.ilike(f"%{search}%"))
         
-        results = query.all()
-        
-        # Calculate Distance if User Location provided
         if lat is not None and lng is not None:
-            import math
-            def calculate_distance(r_lat, r_lng):
-                if r_lat is None or r_lng is None:
-                    return float('inf')
-                # Haversine Formula
-                R = 6371 # Earth radius in km
-                d_lat = math.radians(r_lat - lat)
-                d_lng = math.radians(r_lng - lng)
-                a = math.sin(d_lat/2) * math.sin(d_lat/2) + \
-                    math.cos(math.radians(lat)) * math.cos(math.radians(r_lat)) * \
-                    math.sin(d_lng/2) * math.sin(d_lng/2)
-                c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                return R * c
-
-            # Sort by distance
-            results.sort(key=lambda r: calculate_distance(r.latitude, r.longitude))
+            if radius_km is None and not limit:
+                # Whole listing: every restaurant by distance, as before the grid
+                return self._sort_by_distance(query.all(), lat, lng)
+            # Nearest-K / within radius via Geo Grid
+            return self._get_nearest_restaurants(query, lat, lng, radius_km, limit)
+
+        if limit:
+            query = query.limit(limit)
+        return query.all()
+
+    def _get_nearest_restaurants(self, query, lat: float, lng: float, radius_km: Optional[float], limit: Optional[int]):
+        """
+        Scan grid cells outward from the user (doubling the rings per round) until
+        `limit` restaurants are known to be closer than anything left unscanned.
+        Restaurants without coordinates are not part of the grid; they are only listed
+        (last) when the grid runs out without a radius and the full scan takes over.
+        """
+        max_rings = geo.rings_for_radius(lat, radius_km) if radius_km else geo.MAX_RINGS
+        
+        found = []
+        scanned = 0
+        step = 1
+        while scanned < max_rings:
+            upto = min(scanned + step, max_rings)
+            cells = [key for ring in range(scanned, upto) for key in geo.ring_cells(lat, lng, ring)]
+            
+            # Chunk IN (...) lists to stay under driver parameter limits
+            rows = []
+            for i in range(0, len(cells), GEO_CELL_CHUNK):
+                rows.extend(query.filter(models.Restaurant.geo_cell.in_(cells[i:i + GEO_CELL_CHUNK])).all())
+            
+            # One vectorized distance pass per round
+            if rows:
+                distances = geo.restaurant_coordinates.distances_km(lat, lng, rows)
+                found.extend(zip(distances.tolist(), rows))
+            
+            scanned = upto
+            step *= 2
+            
+            if limit and len(found) >= limit:
+                found.sort(key=lambda f: f[0])
+                if found[limit - 1][0] <= geo.covered_radius_km(lat, scanned):
+                    break
+        else:
+            # MAX_RINGS (~350 km) didn't settle the answer: restaurants further out
+            # (or without coordinates) may belong in it, so rank them all
+            if radius_km is None or geo.covered_radius_km(lat, max_rings) < radius_km:
+                return self._sort_by_distance(query.all(), lat, lng, limit, radius_km)
+
+        if radius_km is not None:
+            found = [f for f in found if f[0] <= radius_km]
+            
+        found.sort(key=lambda f: f[0])
+        if limit:
+            found = found[:limit]
             
-        return results
+        # Expose distance on the response (e.g. "2.3 km away")
+        for distance, r in found:
+            r.distance_km = round(distance, 2)
+        return [r for _, r in found]
+
+    def _sort_by_distance(self, rows, lat: float, lng: float, limit: Optional[int] = None,
+                          radius_km: Optional[float] = None):
+        """Full scan: `rows` nearest first, restaurants without coordinates last."""
+        distances = geo.restaurant_coordinates.distances_km(lat, lng, rows).tolist()
+        found = sorted(zip(distances, rows), key=lambda f: f[0])
+        if radius_km is not None:
+            found = [f for f in found if f[0] <= radius_km]
+        if limit:
+            found = found[:limit]
+        for distance, r in found:
+            r.distance_km = round(distance, 2) if distance != float("inf") else None
+        return [r for _, r in found]
 
     def get_restaurant_by_id(self, restaurant_id: int):
         return self.db.query(models.Restaurant).filter(models.Restaurant.id == restaurant_id).first()
@@ -50,6 +157,8 @@ class CoreRestaurantService:
             longitude=restaurant.longitude
         )
         self.db.add(db_restaurant)
+        self.db.flush()
+        catalog.bump(self.db, db_restaurant.id)
         self.db.commit()
         self.db.refresh(db_restaurant)
         return db_restaurant
@@ -65,16 +174,21 @@ class CoreRestaurantService:
         max_price: Optional[float] = None,
         is_veg: Optional[bool] = None,
         sort_by: Optional[str] = None,
-        restaurant_id: int = 1
+        restaurant_id: int = 1,
+        cursor: Optional[str] = None
     ):
         """
-        Get foods for a specific restaurant with filters
+        Get foods for a specific restaurant with filters.
+        `search` matches name and description (prefix and typo tolerant), see common/utils/search.py.
+        Pass the previous page's `next_cursor` as `cursor` to continue (keyset on sort key, food_id).
         """
         query = self.db.query(models.Food).filter(models.Food.restaurant_id == restaurant_id)
         
         # Filters
+        scores = None
         if search:
-            query = query.filter(models.Food.food_name.ilike(f"%{search}%"))
+            scores = menu_search.food_search.search(self.db, search, restaurant_id)
+            query = query.filter(models.Food.food_id.in_(list(scores)))
         
         if category and category != "All":
              query = query.filter(models.Food.food_category == category)
@@ -88,33 +202,56 @@ class CoreRestaurantService:
         if is_veg is not None:
             query = query.filter(models.Food.is_veg == is_veg)
             
-        if sort_by:
-            if sort_by == "price_low":
-                query = query.order_by(models.Food.food_price.asc())
-            elif sort_by == "price_high":
-                query = query.order_by(models.Food.food_price.desc())
-            elif sort_by == "rating":
-                query = query.order_by(models.Food.rating.desc())
-            # "best_seller" would complex join with Order, skipping for now or mocking
-            
-        return query.offset(skip).limit(limit).all()
+        # "best_seller" would complex join with Order, skipping for now or mocking
+        sort_name, attrs, descending = menu_sort(sort_by, search)
+        if sort_name == "relevance":
+            return self._relevance_page(query, scores, skip, limit, cursor)
+
+        columns = [getattr(models.Food, a) for a in attrs]
+        foods = pagination.paginate(
+            query.options(*loaders.food_options()), columns, cursor, limit,
+            skip=skip, sort=sort_name, descending=descending
+        )
+        if scores is not None:
+            for food in foods:
+                food.search_score = scores.get(food.food_id)
+        return foods
 
-    def get_menu_meta(self):
+    def _relevance_page(self, query, scores, skip: int, limit: int, cursor: Optional[str]):
         """
-        Returns metadata for filters: Min/Max Price, All Categories.
+        Rank the filtered matches by (search_score, food_id) descending.
+        Match sets are capped (search.MAX_RESULTS), so ranking happens on ids in Python
+        and only the page itself is loaded.
         """
-        from sqlalchemy import func
-        min_price = self.db.query(func.min(models.Food.food_price)).scalar() or 0
-        max_price = self.db.query(func.max(models.Food.food_price)).scalar() or 0
-        categories = self.db.query(models.Food.food_category).distinct().all()
-        # categories comes as list of tuples [('Pizza',), ('Burger',)]
-        cat_list = [c[0] for c in categories if c[0]]
-        
-        return {
-            "min_price": min_price,
-            "max_price": max_price,
-            "categories": cat_list
+        ids = [food_id for (food_id,) in query.with_entities(models.Food.food_id)]
+        ranked = sorted(ids, key=lambda food_id: (scores[food_id], food_id), reverse=True)
+        if cursor:
+            raw = pagination.decode_cursor(cursor, "relevance")
+            try:
+                after = (float(raw[0]), int(raw[1]))
+            except (TypeError, ValueError):
+                raise ValueError("Invalid cursor")
+            ranked = [food_id for food_id in ranked if (scores[food_id], food_id) < after]
+        elif skip:
+            ranked = ranked[skip:]
+
+        page_ids = ranked[:limit]
+        foods = {
+            food.food_id: food
+            for food in self.db.query(models.Food).options(*loaders.food_options())
+                .filter(models.Food.food_id.in_(page_ids))
         }
+        page = [foods[food_id] for food_id in page_ids if food_id in foods]
+        for food in page:
+            food.search_score = scores[food.food_id]
+        return page
+
+    def get_menu_meta(self, restaurant_id: int = 1):
+        """
+        Returns metadata for filters: Min/Max Price, Categories (with item counts), Veg/Non-Veg counts.
+        Read from the menu_facets summary, kept current on Food writes.
+        """
+        return menu_facets.get_menu_facets(self.db, restaurant_id)
 
     def create_food(self, food: schemas.FoodCreate):
         # Ensure restaurant_id is set
@@ -130,7 +267,12 @@ class CoreRestaurantService:
             is_veg=food.is_veg,
             restaurant_id=r_id
         )
+        # Image uploaded earlier via /menu/upload-image: use its derivatives if already processed
+        derivatives = derivatives_for(self.db, food.image_url)
+        if derivatives:
+            db_food.thumbnail_url = thumbnail_from(derivatives)
         self.db.add(db_food)
+        catalog.bump(self.db, r_id)
         self.db.commit()
         self.db.refresh(db_food)
         
@@ -143,6 +285,7 @@ class CoreRestaurantService:
                 )
                 self.db.add(db_variant)
             
+            catalog.bump(self.db, r_id)
             self.db.commit()
             self.db.refresh(db_food) # Refresh to load variants
         return db_food
@@ -151,22 +294,26 @@ class CoreRestaurantService:
         # 1. Create Food (without images first)
         db_food = self.create_food(food)
         
-        # 2. Upload Images
+        # 2. Upload Images (concurrently, off the event loop)
         if images:
             from ..common.utils.storage import StorageService
-            for idx, img_file in enumerate(images):
-                url = await StorageService.upload_image(img_file)
-                
+            stored = await StorageService.store_images(images)
+            for idx, image in enumerate(stored):
                 # Create FoodImage
-                db_img = models.FoodImage(food_id=db_food.food_id, image_url=url)
+                db_img = models.FoodImage(food_id=db_food.food_id, image_url=image.url)
                 self.db.add(db_img)
                 
                 # Set first image as primary if not set
                 if idx == 0 and not db_food.image_url:
-                    db_food.image_url = url
+                    db_food.image_url = image.url
             
+            catalog.bump(self.db, db_food.restaurant_id)
             self.db.commit()
             self.db.refresh(db_food)
+
+            # 3. Thumbnails are rendered in the background and written to the rows above
+            for image in stored:
+                image_processor.submit(image)
             
         return db_food
 
@@ -249,11 +396,10 @@ class CoreRestaurantService:
     # Updated Checkout with REAL Coupon Logic
     def checkout(self, checkout_req: schemas.CheckoutRequest, user_id: int, billing_service):
         """
-        Process batch order checkout
+        Process batch order checkout in a single transaction:
+        prefetch foods/variants, price the cart, validate the coupon, then insert all lines and commit once.
         """
-        import uuid
         total_amount = 0.0
-        final_orders = []
         batch_id = str(uuid.uuid4())
         
         # Default restaurant ID from request or 1
@@ -268,38 +414,72 @@ class CoreRestaurantService:
             if not addr:
                 raise ValueError("Invalid Address ID")
         
+        # 1. Prefetch Foods & Variants (one IN query each)
+        food_ids = {item.food_id for item in checkout_req.items}
+        variant_ids = {item.variant_id for item in checkout_req.items if item.variant_id}
+        
+        foods = {
+            f.food_id: f for f in
+            self.db.query(models.Food).filter(models.Food.food_id.in_(food_ids)).all()
+        } if food_ids else {}
+        variants = {
+            v.id: v for v in
+            self.db.query(models.FoodVariant).filter(models.FoodVariant.id.in_(variant_ids)).all()
+        } if variant_ids else {}
+        
+        # 2. Price each line (invalid items are skipped, as with create_order)
+        new_orders = []
         for item in checkout_req.items:
-            # Create individual order entries
-            order_create = schemas.OrderCreate(
+            food = foods.get(item.food_id)
+            if not food:
+                continue
+                
+            price = food.food_price
+            if item.variant_id:
+                variant = variants.get(item.variant_id)
+                if not variant or variant.food_id != item.food_id:
+                    continue
+                price = variant.variant_price
+                
+            new_orders.append(models.Order(
+                batch_id=batch_id,
                 food_id=item.food_id,
                 variant_id=item.variant_id,
+                user_id=user_id,
+                address_id=checkout_req.address_id,
                 quantity=item.quantity,
-                restaurant_id=r_id
-            )
-            # Logic to calculate price locally if create_order doesn't return it before commit? 
-            # create_order commits and refreshes, so we get price back.
-            db_order = self.create_order(order_create, user_id)
-            if db_order:
-                # Update batch details
-                db_order.batch_id = batch_id
-                db_order.address_id = checkout_req.address_id
-                
-                final_orders.append(db_order)
-                if db_order.price_at_order and db_order.quantity:
-                    total_amount += (db_order.price_at_order * db_order.quantity)
+                price_at_order=price,
+                restaurant_id=r_id,
+                status="created"
+            ))
+            if price and item.quantity:
+                total_amount += (price * item.quantity)
+
+        if not new_orders:
+            raise ValueError("No valid items in cart")
         
-        self.db.commit()
-        
-        # Apply Logic for Coupon (REAL)
+        # 3. Apply Logic for Coupon (REAL) - before writing, so a bad coupon leaves no orders
         discount = 0.0
         if checkout_req.coupon_code:
-            try:
-                discount, _ = self.validate_coupon(checkout_req.coupon_code, total_amount)
-            except ValueError as e:
-                # Propagate specific error (e.g. Min Order Value)
-                raise ValueError(str(e))
+            discount, _ = self.validate_coupon(checkout_req.coupon_code, total_amount)
 
         final_amount = total_amount - discount
+
+        # 4. Insert the header and all lines (batched INSERT), commit once
+        self.db.add(models.OrderBatch(
+            batch_id=batch_id,
+            user_id=user_id,
+            restaurant_id=r_id,
+            address_id=checkout_req.address_id,
+            item_count=len(new_orders),
+            subtotal=total_amount,
+            discount_amount=discount,
+            final_amount=final_amount,
+            coupon_code=checkout_req.coupon_code if discount else None,
+            status="created"
+        ))
+        self.db.add_all(new_orders)
+        self.db.commit()
         
         return {
             "batch_id": batch_id,
@@ -327,7 +507,7 @@ class CoreRestaurantService:
             return {"status": "added"}
             
     def get_user_favorites(self, user_id: int):
-        return self.db.query(models.Favorite).filter(models.Favorite.user_id == user_id).all()
+        return self.db.query(models.Favorite).options(*loaders.favorite_options()).filter(models.Favorite.user_id == user_id).all()
 
     def get_food(self, food_id: int):
         return self.db.query(models.Food).filter(models.Food.food_id == food_id).first()
@@ -354,7 +534,11 @@ class CoreRestaurantService:
         # Prefer provided ID, fallback to Food's restaurant, fallback to 1
         r_id = order.restaurant_id if order.restaurant_id else (food.restaurant_id if food.restaurant_id else 1)
             
+        # A single order is a one-line batch, so history (order_batches) covers it too
+        batch_id = str(uuid.uuid4())
+        amount = (price or 0) * (order.quantity or 0)
         db_order = models.Order(
+            batch_id=batch_id,
             food_id=order.food_id,
             variant_id=order.variant_id,
             user_id=user_id,
@@ -363,19 +547,75 @@ class CoreRestaurantService:
             restaurant_id=r_id,
             status="created"
         )
+        self.db.add(models.OrderBatch(
+            batch_id=batch_id, user_id=user_id, restaurant_id=r_id, item_count=1,
+            subtotal=amount, final_amount=amount, status="created"
+        ))
         self.db.add(db_order)
         self.db.commit()
         self.db.refresh(db_order)
         return db_order
 
-    def get_all_orders(self, skip: int = 0, limit: int = 100):
-        return self.db.query(models.Order).offset(skip).limit(limit).all()
+    def _order_page(self, query, skip: int, limit: int, cursor: Optional[str], entity=models.Order):
+        """Newest first, keyset on (created_at, id)"""
+        columns = [getattr(entity, a) for a in ORDER_PAGE_KEY]
+        return pagination.paginate(
+            query, columns, cursor, limit,
+            skip=skip, sort="orders", descending=True
+        )
+
+    def get_all_orders(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None):
+        query = self.db.query(models.Order).options(*loaders.order_options())
+        return self._order_page(query, skip, limit, cursor)
 
-    def get_user_orders(self, user_id: int, skip: int = 0, limit: int = 100):
-        return self.db.query(models.Order).filter(models.Order.user_id == user_id).offset(skip).limit(limit).all()
+    def get_user_orders(self, user_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                        include_archive: bool = False):
+        """
+        A user's orders, newest first. Delivered/cancelled orders older than
+        ORDER_ARCHIVE_DAYS live in orders_archive and are only read with `include_archive`.
+        """
+        query = self.db.query(models.Order).options(*loaders.order_options())\
+            .filter(models.Order.user_id == user_id)
+        if not include_archive:
+            return self._order_page(query, skip, limit, cursor)
+
+        # Deep history: the same keyset page from both tables, merged (ids are unique across them)
+        offset = 0 if cursor else skip
+        archived = self.db.query(models.ArchivedOrder).options(*loaders.archived_order_options())\
+            .filter(models.ArchivedOrder.user_id == user_id)
+        recent = self._order_page(query, 0, offset + limit, cursor)
+        older = self._order_page(archived, 0, offset + limit, cursor, entity=models.ArchivedOrder)
+        merged = heapq.merge(recent, older, key=lambda o: (o.created_at, o.id), reverse=True)
+        return list(itertools.islice(merged, offset, offset + limit))
 
     def get_order_by_id(self, order_id: int):
-        return self.db.query(models.Order).filter(models.Order.id == order_id).first()
+        """One order, from orders_archive once it has been archived (ids are unique across both)."""
+        order = self.db.query(models.Order).options(*loaders.order_options()).filter(models.Order.id == order_id).first()
+        if order is None:
+            order = self.db.query(models.ArchivedOrder).options(*loaders.archived_order_options())\
+                .filter(models.ArchivedOrder.id == order_id).first()
+        return order
+
+    def get_order_batches(self, user_id: Optional[int] = None, skip: int = 0, limit: int = 100,
+                          cursor: Optional[str] = None):
+        """Order history as checkout headers, newest first (all users when user_id is None)."""
+        query = self.db.query(models.OrderBatch)
+        if user_id is not None:
+            query = query.filter(models.OrderBatch.user_id == user_id)
+        return self._order_page(query, skip, limit, cursor, entity=models.OrderBatch)
+
+    def get_order_batch(self, batch_id: str):
+        """One checkout with its lines (from orders_archive once they have been archived)."""
+        batch = self.db.query(models.OrderBatch).filter(models.OrderBatch.batch_id == batch_id).first()
+        if batch is None:
+            return None
+        lines = self.db.query(models.Order).options(*loaders.order_options())\
+            .filter(models.Order.batch_id == batch_id).order_by(models.Order.id).all()
+        if len(lines) < (batch.item_count or 0):
+            lines += self.db.query(models.ArchivedOrder).options(*loaders.archived_order_options())\
+                .filter(models.ArchivedOrder.batch_id == batch_id).order_by(models.ArchivedOrder.id).all()
+        batch.orders = lines
+        return batch
 
     # --- Marketing & Discovery ---
     def get_banners(self):
@@ -384,12 +624,26 @@ class CoreRestaurantService:
     def create_banner(self, banner: schemas.BannerCreate):
         db_banner = models.Banner(**banner.model_dump())
         self.db.add(db_banner)
+        catalog.bump(self.db, catalog.GLOBAL_SCOPE)
         self.db.commit()
         self.db.refresh(db_banner)
         return db_banner
 
     def get_collections(self):
-        return self.db.query(models.Collection).all()
+        return self.db.query(models.Collection).options(*loaders.collection_options()).all()
+
+    def get_home(self, lat: Optional[float] = None, lng: Optional[float] = None,
+                 restaurant_id: int = 1, limit: int = HOME_RESTAURANT_LIMIT):
+        """
+        Everything the app's home screen shows, in one call (see schemas.HomeScreen):
+        banners, collections, nearest restaurants and the menu filter summary.
+        """
+        return {
+            "banners": self.get_banners(),
+            "collections": self.get_collections(),
+            "restaurants": self.get_restaurants(lat=lat, lng=lng, limit=limit),
+            "filters": self.get_menu_meta(restaurant_id),
+        }
 
     def create_collection(self, collection: schemas.CollectionCreate):
         db_coll = models.Collection(
@@ -402,6 +656,7 @@ class CoreRestaurantService:
             db_coll.foods = foods
             
         self.db.add(db_coll)
+        catalog.bump(self.db, catalog.GLOBAL_SCOPE)
         self.db.commit()
         self.db.refresh(db_coll)
         self.db.refresh(db_coll)
@@ -439,7 +694,7 @@ class CoreRestaurantService:
     def get_user_coupons(self, user_id: int):
         # Return claimed coupons that are not used and still valid
         now = datetime.now()
-        return self.db.query(models.UserCoupon).join(models.Coupon).filter(
+        return self.db.query(models.UserCoupon).join(models.Coupon).options(*loaders.user_coupon_options()).filter(
             models.UserCoupon.user_id == user_id,
             models.UserCoupon.is_used == False,
             models.Coupon.valid_until >= now,
@@ -451,15 +706,24 @@ class CoreRestaurantService:
             models.Order.id == order_id, 
             models.Order.user_id == user_id
         ).first()
+        if not order:
+            # Delivered orders are rateable after they move to orders_archive
+            order = self.db.query(models.ArchivedOrder).filter(
+                models.ArchivedOrder.id == order_id,
+                models.ArchivedOrder.user_id == user_id
+            ).first()
         
         if not order:
             raise ValueError("Order not found or does not belong to user")
             
         existing = self.db.query(models.Feedback).filter(models.Feedback.order_id == order_id).first()
         if existing:
+            # Re-rating replaces the previous score, the count stays the same
+            rate_delta, count_delta = rate - (existing.rate or 0), 0
             existing.rate = rate
             existing.comment = comment
         else:
+            rate_delta, count_delta = rate, 1
             feedback = models.Feedback(
                 user_id=user_id,
                 order_id=order_id,
@@ -467,21 +731,20 @@ class CoreRestaurantService:
                 comment=comment
             )
             self.db.add(feedback)
+        self.db.flush()
         
+        # Update running aggregates in the same transaction (no AVG over all feedbacks)
+        new_rating = None
+        if order.food_id is not None:
+            new_rating = ratings.apply_food_delta(self.db, order.food_id, rate_delta, count_delta)
+        if order.restaurant_id is not None:
+            ratings.apply_restaurant_delta(self.db, order.restaurant_id, rate_delta, count_delta)
+        # Ratings show on the menu, the restaurant and in collections
+        catalog.bump(self.db, catalog.GLOBAL_SCOPE, *([order.restaurant_id] if order.restaurant_id is not None else []))
         self.db.commit()
-        
-        # Update Food Rating Link
-        food_id = order.food_id
-        avg_rating = self.db.query(func.avg(cast(models.Feedback.rate, Float)))\
-            .join(models.Order, models.Order.id == models.Feedback.order_id)\
-            .filter(models.Order.food_id == food_id)\
-            .scalar()
-            
-        if avg_rating is not None:
-             food = self.get_food(food_id)
-             if food:
-                 food.rating = round(float(avg_rating), 1)
-                 self.db.add(food)
-                 self.db.commit()
                  
-        return {"status": "success", "new_rating": round(float(avg_rating or 0), 1)}
+        return {"status": "success", "new_rating": new_rating or 0.0}
+
+class AsyncCoreRestaurantService(AsyncServiceProxy):
+    """Async variant (DB_ASYNC=true), see common/async_service.py"""
+    service_class = CoreRestaurantService
@@ -1,5 +1,7 @@
 from sqlalchemy.orm import Session
 from ..common import models, schemas
+from ..common.async_service import AsyncServiceProxy
+from ..common.utils import catalog
 from datetime import date
 
 class TableService:
@@ -14,6 +16,7 @@ class TableService:
         r_id = table.restaurant_id if table.restaurant_id else 1
         db_table = models.Table(name=table.name, seat=table.seat, restaurant_id=r_id)
         self.db.add(db_table)
+        catalog.bump(self.db, r_id)
         self.db.commit()
         self.db.refresh(db_table)
         return db_table
@@ -115,3 +118,7 @@ class TableService:
         self.db.commit()
         self.db.refresh(db_wait)
         return db_wait
+
+class AsyncTableService(AsyncServiceProxy):
+    """Async variant (DB_ASYNC=true), see common/async_service.py"""
+    service_class = TableService
@@ -0,0 +1,90 @@
+"""
+Async request path (DB_ASYNC=true) for the kitchen screen.
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..common import models, schemas, database
+from ..common.utils.security import get_current_active_kitchen_user_async
+from ..common.utils import pagination
+from ..common.utils.order_status import InvalidTransition
+from .service import KITCHEN_PAGE_KEY, BULK_STATUS_LIMIT, AsyncKitchenService
+
+router = APIRouter(
+    prefix="/kitchen",
+    tags=["kitchen"]
+)
+
+@router.get("/orders", response_model=List[schemas.Order])
+async def read_kitchen_orders(
+    response: Response,
+    status: str = "created",
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (X-Next-Cursor header)"),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_active_kitchen_user_async)
+):
+    service = AsyncKitchenService(db)
+    try:
+        orders = await service.get_orders_by_status(status, limit=limit, cursor=cursor, serialize=schemas.Order)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = pagination.next_cursor(orders, limit, KITCHEN_PAGE_KEY, "kitchen")
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return orders
+
+@router.get("/board", response_model=schemas.KitchenBoard)
+async def read_kitchen_board(
+    restaurant_id: int = 1,
+    since_version: Optional[str] = Query(None, description="version from the previous board response"),
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_active_kitchen_user_async)
+):
+    service = AsyncKitchenService(db)
+    try:
+        return await service.get_board(restaurant_id, since_version=since_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/orders/status", response_model=schemas.BulkOrderStatusResult)
+async def update_orders_status(
+    status_update: schemas.BulkOrderStatusUpdate,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_active_kitchen_user_async)
+):
+    """Move a whole checkout batch (batch_id) or a list of orders (order_ids) in one statement."""
+    if (status_update.batch_id is None) == (status_update.order_ids is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of batch_id or order_ids")
+    if status_update.order_ids is not None and len(status_update.order_ids) > BULK_STATUS_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_STATUS_LIMIT} order_ids per request")
+
+    service = AsyncKitchenService(db)
+    try:
+        return await service.update_orders_status(
+            status_update.status, batch_id=status_update.batch_id,
+            order_ids=status_update.order_ids, expected_status=status_update.expected_status
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.put("/orders/{order_id}/status", response_model=schemas.Order)
+async def update_order_status(
+    order_id: int,
+    status_update: schemas.OrderUpdateStatus,
+    db: AsyncSession = Depends(database.get_async_db),
+    current_user: models.User = Depends(get_current_active_kitchen_user_async)
+):
+    service = AsyncKitchenService(db)
+    try:
+        order = await service.update_order_status(
+            order_id, status=status_update.status, expected_status=status_update.expected_status, serialize=schemas.Order
+        )
+    except InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    return order
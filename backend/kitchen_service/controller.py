@@ -1,9 +1,11 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from ..common import models, schemas, database
-from ..common.utils.security import get_current_active_kitchen_user
-from .service import KitchenService
+from ..common.utils.security import get_current_active_kitchen_user, get_stream_user
+from ..common.utils import pagination, order_events
+from ..common.utils.order_status import InvalidTransition
+from .service import KITCHEN_PAGE_KEY, BULK_STATUS_LIMIT, KitchenService
 
 router = APIRouter(
     prefix="/kitchen",
@@ -12,12 +14,71 @@ router = APIRouter(
 
 @router.get("/orders", response_model=List[schemas.Order])
 def read_kitchen_orders(
+    response: Response,
     status: str = "created",
+    limit: int = 100,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (X-Next-Cursor header)"),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_active_kitchen_user)
 ):
     service = KitchenService(db)
-    return service.get_orders_by_status(status)
+    try:
+        orders = service.get_orders_by_status(status, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    next_cursor = pagination.next_cursor(orders, limit, KITCHEN_PAGE_KEY, "kitchen")
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return orders
+
+@router.get("/board", response_model=schemas.KitchenBoard)
+def read_kitchen_board(
+    restaurant_id: int = 1,
+    since_version: Optional[str] = Query(None, description="version from the previous board response"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_kitchen_user)
+):
+    """
+    All active orders of the restaurant (every non-terminal status) in one slim list.
+    With since_version, only the orders changed since: upsert `orders` by id, drop `removed`.
+    """
+    service = KitchenService(db)
+    try:
+        return service.get_board(restaurant_id, since_version=since_version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stream")
+async def stream_kitchen(
+    restaurant_id: int = 1,
+    current_user: models.User = Depends(get_stream_user)
+):
+    """Server-sent events for every order of the restaurant (new orders and status changes)."""
+    if current_user.role != 1:
+        raise HTTPException(status_code=400, detail="Not a kitchen/admin user")
+    return order_events.stream_response([order_events.kitchen_channel(restaurant_id)])
+
+@router.put("/orders/status", response_model=schemas.BulkOrderStatusResult)
+def update_orders_status(
+    status_update: schemas.BulkOrderStatusUpdate,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_active_kitchen_user)
+):
+    """Move a whole checkout batch (batch_id) or a list of orders (order_ids) in one statement."""
+    if (status_update.batch_id is None) == (status_update.order_ids is None):
+        raise HTTPException(status_code=400, detail="Provide exactly one of batch_id or order_ids")
+    if status_update.order_ids is not None and len(status_update.order_ids) > BULK_STATUS_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_STATUS_LIMIT} order_ids per request")
+
+    service = KitchenService(db)
+    try:
+        return service.update_orders_status(
+            status_update.status, batch_id=status_update.batch_id,
+            order_ids=status_update.order_ids, expected_status=status_update.expected_status
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/orders/{order_id}/status", response_model=schemas.Order)
 def update_order_status(
@@ -27,7 +88,14 @@ def update_order_status(
     current_user: models.User = Depends(get_current_active_kitchen_user)
 ):
     service = KitchenService(db)
-    order = service.update_order_status(order_id, status=status_update.status)
+    try:
+        order = service.update_order_status(
+            order_id, status=status_update.status, expected_status=status_update.expected_status
+        )
+    except InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     return order
@@ -1,37 +1,144 @@
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
-from datetime import datetime
-from ..common import models
+from typing import List, Optional
+from datetime import timedelta
+from ..common import models, loaders
+from ..common.async_service import AsyncServiceProxy
+from ..common.utils import pagination, order_events
+from ..common.utils.order_status import CANCELLED, TERMINAL_STATUSES, InvalidTransition, allowed_sources, bump_bill_versions, notify_customers, refresh_batch_status
+
+KITCHEN_PAGE_KEY = ("created_at", "id")
+
+# Kitchen board: every order still in the kitchen's hands, as slim rows.
+# The version is the newest updated_at the client has seen (opaque token). Deltas
+# re-read BOARD_DELTA_OVERLAP before it, so a write whose transaction started
+# earlier but committed later is not missed; clients apply rows by id, so repeats are harmless.
+BOARD_DELTA_OVERLAP = timedelta(seconds=2)
+BOARD_VERSION_SORT = "board"
+BULK_STATUS_LIMIT = 500 # order_ids per bulk transition
 
 class KitchenService:
     def __init__(self, db: Session):
         self.db = db
 
-    def get_orders_by_status(self, status: str, restaurant_id: int = 1):
-        return self.db.query(models.Order).filter(
+    def get_orders_by_status(self, status: str, restaurant_id: int = 1, limit: int = 100, cursor: Optional[str] = None):
+        """Oldest first (the kitchen works FIFO), keyset on (created_at, id)"""
+        query = self.db.query(models.Order).options(*loaders.order_options()).filter(
             models.Order.status == status,
             models.Order.restaurant_id == restaurant_id
+        )
+        columns = [getattr(models.Order, a) for a in KITCHEN_PAGE_KEY]
+        return pagination.paginate(query, columns, cursor, limit, sort="kitchen")
+
+    def _board_query(self):
+        return (
+            select(
+                models.Order.id, models.Order.batch_id, models.Order.food_id, models.Food.food_name,
+                models.Order.variant_id, models.FoodVariant.variant_name, models.Order.quantity,
+                models.Order.status, models.Order.created_at, models.Order.updated_at
+            )
+            .outerjoin(models.Food, models.Food.food_id == models.Order.food_id)
+            .outerjoin(models.FoodVariant, models.FoodVariant.id == models.Order.variant_id)
+        )
+
+    def get_board(self, restaurant_id: int = 1, since_version: Optional[str] = None):
+        """
+        Whole board (oldest first) or, with `since_version`, only the orders changed since.
+        Raises ValueError for an invalid version token.
+        """
+        since = None
+        if since_version:
+            (since,) = pagination.decode_values(since_version, [models.Order.updated_at], BOARD_VERSION_SORT)
+
+        query = self._board_query().where(models.Order.restaurant_id == restaurant_id)
+        if since is None:
+            query = query.where(models.Order.status.not_in(TERMINAL_STATUSES))
+        else:
+            query = query.where(models.Order.updated_at > since - BOARD_DELTA_OVERLAP)
+        rows = self.db.execute(query.order_by(models.Order.created_at, models.Order.id)).all()
+
+        latest = max((r.updated_at for r in rows if r.updated_at is not None), default=since)
+        if latest is None and since is None:
+            # Empty board: version from the restaurant's newest change, if any
+            latest = self.db.execute(
+                select(func.max(models.Order.updated_at)).where(models.Order.restaurant_id == restaurant_id)
+            ).scalar()
+
+        return {
+            "version": pagination.encode_cursor([latest], BOARD_VERSION_SORT) if latest is not None else None,
+            "full": since is None,
+            "orders": [dict(r._mapping) for r in rows if r.status not in TERMINAL_STATUSES],
+            "removed": [r.id for r in rows if r.status in TERMINAL_STATUSES],
+        }
+
+    def _transition(self, condition, status: str, expected: Optional[str] = None):
+        """
+        Move every order matching `condition` whose current status allows it, in one
+        conditional UPDATE (a concurrent writer can't be overwritten). Commits, then
+        pushes stream events and one notification per batch. Returns the updated rows.
+        """
+        rows = self.db.execute(
+            update(models.Order)
+            .where(condition, models.Order.status.in_(allowed_sources(status, expected)))
+            .values(status=status, updated_at=func.now())
+            .returning(
+                models.Order.id, models.Order.user_id, models.Order.restaurant_id,
+                models.Order.batch_id, models.Order.status, models.Order.updated_at
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        refresh_batch_status(self.db, {row.batch_id for row in rows})
+        if status == CANCELLED:
+            bump_bill_versions(self.db, {row.user_id for row in rows})
+        self.db.commit()
+
+        if rows:
+            order_events.publish_orders(row._mapping for row in rows)
+            notify_customers(rows, status)
+        return rows
+
+    def update_order_status(self, order_id: int, status: str, expected_status: Optional[str] = None):
+        """
+        None when the order doesn't exist; raises InvalidTransition when its current
+        status (or `expected_status`, if the caller's view is stale) doesn't allow `status`.
+        """
+        rows = self._transition(models.Order.id == order_id, status, expected_status)
+        if not rows:
+            current = self.db.execute(select(models.Order.status).where(models.Order.id == order_id)).scalar()
+            if current is None:
+                return None
+            raise InvalidTransition(order_id, current, status)
+
+        return self.db.query(models.Order).options(*loaders.order_options()).populate_existing().filter(
+            models.Order.id == order_id
+        ).first()
+
+    def update_orders_status(self, status: str, batch_id: Optional[str] = None,
+                             order_ids: Optional[List[int]] = None, expected_status: Optional[str] = None):
+        """
+        Transition a whole checkout batch, or a list of ids, in one statement.
+        Lines that can't make the move are left as they are and reported in `skipped`.
+        """
+        if batch_id is not None:
+            condition = models.Order.batch_id == batch_id
+        else:
+            condition = models.Order.id.in_(order_ids or [])
+        rows = self._transition(condition, status, expected_status)
+
+        updated = sorted(row.id for row in rows)
+        skipped = self.db.execute(
+            select(models.Order.id, models.Order.status)
+            .where(condition, models.Order.id.not_in(updated))
+            .order_by(models.Order.id)
         ).all()
+        missing = sorted(set(order_ids or []) - set(updated) - {row.id for row in skipped})
+        return {
+            "status": status,
+            "updated": updated,
+            "skipped": [{"id": row.id, "status": row.status} for row in skipped],
+            "not_found": missing,
+        }
 
-    def update_order_status(self, order_id: int, status: str):
-        order = self.db.query(models.Order).filter(models.Order.id == order_id).first()
-        if order:
-            order.status = status
-            order.updated_at = datetime.utcnow()
-            self.db.commit()
-            self.db.refresh(order)
-            
-            # Send Notification
-            try:
-                from ..common.utils import notification_service
-                devices = self.db.query(models.UserDevice).filter(models.UserDevice.user_id == order.user_id).all()
-                for device in devices:
-                    notification_service.send_push_notification(
-                        token=device.fcm_token,
-                        title=f"Order Update: {status.title()}",
-                        body=f"Your order #{order.id} is now {status}.",
-                        data={"order_id": str(order.id), "status": status}
-                    )
-            except Exception as e:
-                print(f"Failed to send notification: {e}")
-                
-        return order
+class AsyncKitchenService(AsyncServiceProxy):
+    """Async variant (DB_ASYNC=true), see common/async_service.py"""
+    service_class = KitchenService
@@ -22,12 +22,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
 # Create tables on startup
 @app.on_event("startup")
 def startup_event():
-    Base.metadata.create_all(bind=engine)
+    # Base.metadata.create_all, with `orders` monthly partitioned on Postgres
+    from .common.utils.order_archive import create_tables
+    create_tables(engine)
     
     # Initialize Background Services
     from .common.utils.scheduler import start_scheduler
@@ -40,7 +43,7 @@ def startup_event():
 
     # Seed Default Data
     from .common.database import SessionLocal
-    from .common.utils.seed_restaurant import seed_default_restaurant
+    from .common.utils.seed_restaurant import seed_default_restaurant, backfill_geo_cells, backfill_menu_facets, backfill_rating_aggregates, backfill_order_batches, backfill_order_updated_at
     from .common_auth.service import AuthService
     import os
 
@@ -48,6 +51,17 @@ def startup_event():
     try:
         # 1. Default Restaurant
         seed_default_restaurant(db)
+        backfill_geo_cells(db)
+        backfill_order_updated_at(db)
+        backfill_menu_facets(db)
+        backfill_rating_aggregates(db)
+        backfill_order_batches(db)
+        
+        from .common.utils.geo import restaurant_coordinates
+        restaurant_coordinates.load(db)
+
+        from .common.utils.search import food_search
+        food_search.init(db)
         
         # 2. Super Admin Bootstrap
         admin_email = os.getenv("SUPER_ADMIN_EMAIL", "admin@admin.com")
@@ -61,16 +75,38 @@ def startup_event():
 @app.on_event("shutdown")
 def shutdown_event():
     from .common.utils.scheduler import stop_scheduler
+    from .common.utils.notification_service import notification_dispatcher
+    from .common.utils.images import image_processor
+    from .common.utils.order_events import broker
     stop_scheduler()
+    broker.stop()
+    notification_dispatcher.stop()
+    image_processor.stop()
 
 # Include Routers from Services
+# Async request path (DB_ASYNC=true): registered first so these routes take precedence
+from .common.database import DB_ASYNC
+if DB_ASYNC:
+    from .common_auth import async_controller as auth_async_controller
+    from .core_restaurant import async_controller as core_async_controller
+    from .kitchen_service import async_controller as kitchen_async_controller
+    app.include_router(auth_async_controller.router)
+    app.include_router(core_async_controller.orders_router)
+    app.include_router(core_async_controller.menu_router)
+    app.include_router(core_async_controller.table_router)
+    app.include_router(core_async_controller.restaurant_router)
+    app.include_router(core_async_controller.home_router)
+    app.include_router(kitchen_async_controller.router)
+
 app.include_router(auth_controller.router)
+app.include_router(auth_controller.admin_router)
 app.include_router(core_controller.orders_router)
 app.include_router(core_controller.menu_router)
 app.include_router(core_controller.table_router)
 app.include_router(core_controller.reservation_router)
 app.include_router(core_controller.billing_router)
 app.include_router(core_controller.restaurant_router)
+app.include_router(core_controller.home_router)
 app.include_router(kitchen_controller.router)
 
 @app.get("/")
@@ -0,0 +1,47 @@
+import pytest
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from backend.common.utils.security import user_cache
+
+@pytest.fixture(autouse=True)
+def reset_user_cache():
+    # Test modules recreate the schema, so user ids get reused between tests
+    user_cache.clear()
+    yield
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+@contextmanager
+def count_queries():
+    """Count SQL statements issued by any engine inside the block."""
+    counter = QueryCounter()
+    event.listen(Engine, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, "before_cursor_execute", counter._record)
+
+@pytest.fixture
+def query_budget():
+    """
+    Usage: `with query_budget(5): client.get(...)`
+    Fails if the block issues more than the given number of SQL statements.
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        with count_queries() as counter:
+            yield counter
+        assert counter.count <= max_queries, (
+            f"Query budget exceeded: {counter.count} > {max_queries}\n" + "\n---\n".join(counter.statements)
+        )
+    return budget
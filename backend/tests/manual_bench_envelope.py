@@ -0,0 +1,86 @@
+"""
+Benchmark: response envelope on a 1,000-item /menu/ style payload.
+Compares the old buffering BaseHTTPMiddleware (json.loads + re-encode) with
+the streaming ASGI wrapper in common/middleware.py.
+
+Run: python -m backend.tests.manual_bench_envelope
+"""
+import json
+import time
+import tracemalloc
+from typing import List
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+from backend.common import schemas
+from backend.common.middleware import ResponseWrapperMiddleware
+from backend.common.responses import success_response
+
+N_ITEMS = 1000
+N_REQUESTS = 200
+
+class LegacyBufferingMiddleware(BaseHTTPMiddleware):
+    """Previous implementation, kept here for comparison only."""
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        if response.status_code >= 400:
+            return response
+        if "application/json" not in response.headers.get("content-type", ""):
+            return response
+        response_body = [section async for section in response.body_iterator]
+        data = json.loads(b"".join(response_body).decode())
+        new_headers = dict(response.headers)
+        new_headers.pop("content-length", None)
+        return JSONResponse(content=success_response(data=data), status_code=response.status_code, headers=new_headers)
+
+MENU = [
+    {
+        "food_id": i,
+        "food_name": f"Dish {i}",
+        "food_category": "Mains",
+        "food_price": 100.0 + i,
+        "food_quantity": 10,
+        "description": "Slow cooked with house spices",
+        "is_veg": i % 2 == 0,
+        "rating": 4.2,
+        "restaurant_id": 1,
+        "variants": [{"id": i * 2, "food_id": i, "variant_name": "Half", "variant_price": 80.0}],
+        "images": [{"id": i, "food_id": i, "image_url": f"http://cdn/{i}.jpg"}],
+    }
+    for i in range(N_ITEMS)
+]
+
+def build_app(middleware):
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/menu/", response_model=List[schemas.Food])
+    def read_menu():
+        return MENU
+
+    return app
+
+def measure(name, middleware):
+    client = TestClient(build_app(middleware))
+    body = client.get("/menu/").json()
+    assert body["success"] is True and len(body["data"]) == N_ITEMS
+
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for _ in range(N_REQUESTS):
+        client.get("/menu/")
+    wall_ms = (time.perf_counter() - start) * 1000 / N_REQUESTS
+    cpu_ms = (time.process_time() - cpu_start) * 1000 / N_REQUESTS
+
+    tracemalloc.start()
+    client.get("/menu/")
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{name:<28} {wall_ms:7.2f} ms wall  {cpu_ms:7.2f} ms cpu  {peak / 1024:8.0f} KiB peak")
+
+if __name__ == "__main__":
+    print(f"Payload: {N_ITEMS} foods, {N_REQUESTS} requests (includes TestClient overhead)")
+    measure("Buffering middleware", LegacyBufferingMiddleware)
+    measure("Streaming ASGI envelope", ResponseWrapperMiddleware)
@@ -0,0 +1,76 @@
+"""
+Benchmark: nearest restaurant lookup over 100k synthetic restaurants.
+Compares the legacy path (load all rows + Python haversine sort) with the geo grid path.
+
+Run: python -m backend.tests.manual_bench_geo
+"""
+import random
+import time
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from backend.common.database import Base
+from backend.common import models
+from backend.common.utils import geo
+from backend.core_restaurant.service import CoreRestaurantService
+
+N_RESTAURANTS = 100_000
+N_QUERIES = 20
+LIMIT = 20
+
+engine = create_engine("sqlite:///:memory:")
+SessionLocal = sessionmaker(bind=engine)
+
+def seed(db):
+    random.seed(42)
+    rows = []
+    for i in range(N_RESTAURANTS):
+        # Spread across India (roughly 8-35N, 68-97E)
+        lat = random.uniform(8, 35)
+        lng = random.uniform(68, 97)
+        rows.append({
+            "name": f"Restaurant {i}",
+            "latitude": lat,
+            "longitude": lng,
+            "geo_cell": geo.cell_key(lat, lng),
+        })
+    db.execute(insert(models.Restaurant), rows)
+    db.commit()
+
+def legacy_nearest(db, lat, lng):
+    results = db.query(models.Restaurant).all()
+    results.sort(key=lambda r: geo.haversine_km(lat, lng, r.latitude, r.longitude))
+    return results[:LIMIT]
+
+def run():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    seed(db)
+    service = CoreRestaurantService(db)
+
+    random.seed(7)
+    points = [(random.uniform(10, 30), random.uniform(72, 90)) for _ in range(N_QUERIES)]
+
+    start = time.perf_counter()
+    for lat, lng in points:
+        legacy = legacy_nearest(db, lat, lng)
+        db.expunge_all()
+    legacy_ms = (time.perf_counter() - start) * 1000 / N_QUERIES
+
+    start = time.perf_counter()
+    for lat, lng in points:
+        indexed = service.get_restaurants(lat=lat, lng=lng, limit=LIMIT)
+        db.expunge_all()
+    indexed_ms = (time.perf_counter() - start) * 1000 / N_QUERIES
+
+    # Sanity: both paths agree on the nearest set
+    lat, lng = points[0]
+    assert [r.id for r in legacy_nearest(db, lat, lng)] == [r.id for r in service.get_restaurants(lat=lat, lng=lng, limit=LIMIT)]
+
+    print(f"Restaurants: {N_RESTAURANTS}, queries: {N_QUERIES}, limit: {LIMIT}")
+    print(f"Legacy (full scan + sort): {legacy_ms:8.2f} ms/query")
+    print(f"Geo grid (nearest-K):      {indexed_ms:8.2f} ms/query")
+    print(f"Speedup: {legacy_ms / indexed_ms:.1f}x")
+    db.close()
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+"""
+Benchmark: order status push notifications against a local fake FCM sink.
+Compares the old inline per-token sends with the background dispatcher.
+
+Run: python -m backend.tests.manual_bench_notifications
+"""
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend.common.database import Base
+from backend.common import models
+from backend.common.utils.notification_service import FakeFCMSink, NotificationDispatcher
+
+N_USERS = 200
+DEVICES_PER_USER = 3
+FCM_LATENCY = 0.01 # 10ms per call to the fake sink
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+SessionLocal = sessionmaker(bind=engine)
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    users = [models.User(name=f"U{i}", phone_number=f"9{i:09d}") for i in range(N_USERS)]
+    db.add_all(users)
+    db.commit()
+    db.add_all([
+        models.UserDevice(user_id=u.id, fcm_token=f"tok_{u.id}_{d}")
+        for u in users for d in range(DEVICES_PER_USER)
+    ])
+    db.commit()
+    ids = [u.id for u in users]
+    db.close()
+    return ids
+
+def inline_sends(user_ids):
+    """Previous behaviour: query devices and send one token at a time, inside the request."""
+    sink = FakeFCMSink(latency=FCM_LATENCY)
+    db = SessionLocal()
+    start = time.perf_counter()
+    for user_id in user_ids:
+        devices = db.query(models.UserDevice).filter(models.UserDevice.user_id == user_id).all()
+        for device in devices:
+            sink.send_multicast([device.fcm_token], "Order Update: Progress", "Your order is now progress.", {"status": "progress"})
+    elapsed = time.perf_counter() - start
+    db.close()
+    return elapsed, elapsed, len(sink.calls)
+
+def dispatched_sends(user_ids):
+    sink = FakeFCMSink(latency=FCM_LATENCY)
+    dispatcher = NotificationDispatcher(session_factory=SessionLocal, sink=sink)
+    start = time.perf_counter()
+    for user_id in user_ids:
+        dispatcher.notify_user(user_id, "Order Update: Progress", "Your order is now progress.", {"status": "progress"})
+    request_path = time.perf_counter() - start
+    dispatcher.flush()
+    delivered = time.perf_counter() - start
+    dispatcher.stop()
+    return request_path, delivered, len(sink.calls)
+
+if __name__ == "__main__":
+    user_ids = seed()
+    print(f"{N_USERS} status updates x {DEVICES_PER_USER} devices, fake FCM latency {FCM_LATENCY * 1000:.0f}ms")
+    for name, fn in (("Inline per-token", inline_sends), ("Dispatcher (multicast)", dispatched_sends)):
+        request_path, delivered, calls = fn(user_ids)
+        print(f"{name:<24} request path {request_path * 1000:8.1f} ms  all delivered {delivered * 1000:8.1f} ms  FCM calls {calls}")
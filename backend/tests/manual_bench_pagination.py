@@ -0,0 +1,90 @@
+"""
+Benchmark: deep pages of the order history.
+Fetches page 1,000 (limit 100) of a 1M-row orders table with the legacy
+offset query and with the keyset cursor, using the same composite index.
+
+Run: python -m backend.tests.manual_bench_pagination [--rows 1000000] [--url sqlite:////tmp/bench_orders.db]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from backend.common.database import Base
+from backend.common import models
+from backend.common.utils import pagination
+from backend.core_restaurant.service import CoreRestaurantService, ORDER_PAGE_KEY
+
+LIMIT = 100
+PAGE = 1000
+REPEAT = 5
+CHUNK = 50_000
+
+def seed(db, rows):
+    start = datetime(2023, 1, 1)
+    for offset in range(0, rows, CHUNK):
+        db.execute(insert(models.Order), [
+            {
+                "food_id": 1, "user_id": 1 + i % 1000, "restaurant_id": 1,
+                "quantity": 1, "price_at_order": 100.0, "status": "delivered",
+                # Several orders per second, so the id tiebreak matters
+                "created_at": start + timedelta(seconds=i // 3),
+            }
+            for i in range(offset, min(offset + CHUNK, rows))
+        ])
+        db.commit()
+
+def timed(fn):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def run(url, rows):
+    engine = create_engine(url)
+    SessionLocal = sessionmaker(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    if db.query(models.Order).count() != rows:
+        db.query(models.Order).delete()
+        db.commit()
+        print(f"Seeding {rows} orders...")
+        seed(db, rows)
+
+    service = CoreRestaurantService(db)
+    skip = (PAGE - 1) * LIMIT
+
+    # Cursor for the start of page 1,000 (what a client holds after paging there)
+    previous = service.get_all_orders(skip=skip - 1, limit=1)[0]
+    cursor = pagination.encode_cursor([getattr(previous, a) for a in ORDER_PAGE_KEY], "orders")
+    db.expunge_all()
+
+    def offset_page():
+        page = service.get_all_orders(skip=skip, limit=LIMIT)
+        db.expunge_all()
+        return page
+
+    def cursor_page():
+        page = service.get_all_orders(limit=LIMIT, cursor=cursor)
+        db.expunge_all()
+        return page
+
+    offset_time, offset_rows = timed(offset_page)
+    cursor_time, cursor_rows = timed(cursor_page)
+    assert [o.id for o in offset_rows] == [o.id for o in cursor_rows]
+
+    print(f"{url}  rows={rows}  page={PAGE}  limit={LIMIT}")
+    print(f"offset (skip={skip}): {offset_time * 1000:.1f} ms")
+    print(f"cursor:               {cursor_time * 1000:.1f} ms")
+    print(f"Speedup: {offset_time / cursor_time:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:////tmp/bench_orders.db"))
+    args = parser.parse_args()
+    run(args.url, args.rows)
@@ -0,0 +1,89 @@
+"""
+Benchmark: menu search over 500k synthetic foods in one restaurant.
+Compares the legacy `food_name ILIKE '%term%'` page with the search index
+(in-process index on SQLite; pass --url postgresql://... for tsvector/pg_trgm).
+
+Run: python -m backend.tests.manual_bench_search [--rows 500000] [--url sqlite:////tmp/bench_foods.db]
+"""
+import argparse
+import os
+import random
+import time
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from backend.common.database import Base
+from backend.common import models
+from backend.common.utils.search import food_search
+from backend.core_restaurant.service import CoreRestaurantService
+
+LIMIT = 20
+REPEAT = 5
+CHUNK = 50_000
+QUERIES = ["paneer", "chiken tikka", "masala dosa", "garlic", "biryani", "spicy veg", "chocolate"]
+
+ADJECTIVES = ["Spicy", "Crispy", "Tandoori", "Butter", "Garlic", "Smoky", "Classic", "Royal", "Masala", "Creamy"]
+DISHES = ["Paneer", "Chicken", "Mutton", "Dosa", "Biryani", "Noodles", "Burger", "Pizza", "Tikka", "Kebab", "Brownie", "Shake"]
+DESCRIPTIONS = ["served with mint chutney", "slow cooked in a rich gravy", "with a side of salad",
+                "topped with chocolate sauce", "a veg favourite", "finished in the tandoor"]
+
+def seed(db, rows):
+    random.seed(42)
+    for offset in range(0, rows, CHUNK):
+        db.execute(insert(models.Food), [
+            {
+                "restaurant_id": 1,
+                "food_name": f"{random.choice(ADJECTIVES)} {random.choice(DISHES)}",
+                "description": random.choice(DESCRIPTIONS),
+                "food_category": "Mains", "food_price": 100.0 + i % 400, "food_quantity": 10, "rating": 0.0,
+            }
+            for i in range(offset, min(offset + CHUNK, rows))
+        ])
+        db.commit()
+
+def timed(fn):
+    best = float("inf")
+    for _ in range(REPEAT):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def legacy_search(db, term):
+    return db.query(models.Food).filter(
+        models.Food.restaurant_id == 1,
+        models.Food.food_name.ilike(f"%{term}%")
+    ).offset(0).limit(LIMIT).all()
+
+def run(url, rows):
+    engine = create_engine(url)
+    SessionLocal = sessionmaker(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+
+    if db.query(models.Food).count() != rows:
+        db.query(models.Food).delete()
+        db.commit()
+        print(f"Seeding {rows} foods...")
+        seed(db, rows)
+
+    t0 = time.perf_counter()
+    food_search.init(db)
+    print(f"Search backend: {food_search.backend}  (init {time.perf_counter() - t0:.1f}s)")
+
+    service = CoreRestaurantService(db)
+    print(f"{'query':<16}{'ilike ms':>10}{'hits':>6}{'index ms':>10}{'hits':>6}{'relevance ms':>14}")
+    for term in QUERIES:
+        legacy_time, legacy_rows = timed(lambda: legacy_search(db, term))
+        db.expunge_all()
+        index_time, index_rows = timed(lambda: service.get_foods(search=term, limit=LIMIT, restaurant_id=1))
+        db.expunge_all()
+        ranked_time, _ = timed(lambda: service.get_foods(search=term, limit=LIMIT, sort_by="relevance", restaurant_id=1))
+        db.expunge_all()
+        print(f"{term:<16}{legacy_time * 1000:>10.1f}{len(legacy_rows):>6}{index_time * 1000:>10.1f}{len(index_rows):>6}{ranked_time * 1000:>14.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--url", default=os.getenv("BENCH_DATABASE_URL", "sqlite:////tmp/bench_foods.db"))
+    args = parser.parse_args()
+    run(args.url, args.rows)
@@ -0,0 +1,62 @@
+"""
+Load test: idle order/kitchen stream subscribers.
+Opens N_SUBSCRIBERS SSE streams (the real sse_events generator and broker, no HTTP
+framing), measures the memory each idle one holds, then times one order write
+fanned out to every subscriber.
+
+Run: DATABASE_URL=sqlite:// python -m backend.tests.manual_bench_streams
+"""
+import asyncio
+import gc
+import threading
+import time
+import tracemalloc
+from backend.common.utils.order_events import OrderBroker, kitchen_channel, user_channel
+from backend.common.utils import order_events
+
+N_SUBSCRIBERS = 10_000
+
+async def consume(stream, received):
+    async for chunk in stream:
+        if "\ndata: " in chunk:
+            received.append(1)
+
+async def main():
+    broker = OrderBroker(backend="local", heartbeat=3600)
+    order_events.broker = broker # sse_events subscribes on the module-level broker
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    received = []
+    # Customers on their own channels; every one of them also watches restaurant 1's board
+    # so a single event reaches all N (worst case fan-out)
+    tasks = []
+    for i in range(N_SUBSCRIBERS):
+        channels = [user_channel(i), kitchen_channel(1)]
+        stream = order_events.sse_events(channels)
+        tasks.append(asyncio.create_task(consume(stream, received)))
+    while broker.subscriber_count() < N_SUBSCRIBERS:
+        await asyncio.sleep(0.01)
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    held = sum(s.size_diff for s in after.compare_to(before, "filename"))
+    tracemalloc.stop()
+    print(f"{N_SUBSCRIBERS} idle subscribers: {held / 1024 / 1024:.1f} MiB, {held / N_SUBSCRIBERS:.0f} bytes each "
+          f"(generator, queue, consumer task; excludes the socket and HTTP server buffers)")
+
+    # One write, published from a worker thread as a sync route would
+    event = {"type": "order.status", "order_id": 1, "user_id": 0, "restaurant_id": 1, "status": "progress"}
+    start = time.perf_counter()
+    threading.Thread(target=broker.publish, args=([event],)).start()
+    while len(received) < N_SUBSCRIBERS:
+        await asyncio.sleep(0)
+    print(f"One event to {N_SUBSCRIBERS} subscribers: {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"(stats {broker.get_status()})")
+
+    broker.close_all()
+    await asyncio.gather(*tasks)
+    print(f"Closed; subscribers left: {broker.subscriber_count()}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""
+Benchmark: uploading the images of one food item against a fake object store
+(50 ms per request + 20 MB/s), while measuring how long the event loop is stalled.
+Compares the legacy path (blocking put_object on the loop, one image after another)
+with StorageService.upload_images (thread pool, concurrent).
+
+Run: python -m backend.tests.manual_bench_uploads
+"""
+import asyncio
+import io
+import time
+from fastapi import UploadFile
+from backend.common.utils.minio_service import MinioService, FakeObjectStore
+from backend.common.utils.storage import StorageService
+
+N_IMAGES = 5
+IMAGE_BYTES = 2 * 1024 * 1024
+
+def make_files():
+    return [UploadFile(io.BytesIO(b"\0" * IMAGE_BYTES), filename=f"bench{i}.jpg", size=IMAGE_BYTES) for i in range(N_IMAGES)]
+
+async def loop_monitor(stop, stalls, interval=0.005):
+    """Max delay of a 5 ms ticker: how long requests would wait for the loop."""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - t0 - interval)
+
+async def legacy(files):
+    urls = []
+    for f in files:
+        f.file.seek(0, 2)
+        length = f.file.tell()
+        f.file.seek(0)
+        urls.append(MinioService.upload_file(f.file, f.filename, f.content_type, length))
+    return urls
+
+async def measure(name, upload):
+    files = make_files()
+    stop, stalls = asyncio.Event(), []
+    monitor = asyncio.create_task(loop_monitor(stop, stalls))
+    await asyncio.sleep(0.02)
+    t0 = time.perf_counter()
+    urls = await upload(files)
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await monitor
+    assert len(urls) == N_IMAGES
+    print(f"{name:<12} total={elapsed * 1000:7.1f} ms   max loop stall={max(stalls) * 1000:7.1f} ms")
+
+async def run():
+    MinioService.use_client(FakeObjectStore(latency=0.05, bandwidth=20 * 1024 * 1024))
+    print(f"{N_IMAGES} images x {IMAGE_BYTES // 1024} KiB")
+    await measure("legacy", legacy)
+    await measure("threadpool", StorageService.upload_images)
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,57 @@
+"""
+Load test: requests/second at N concurrent clients against a running server.
+Run it once against a sync deployment and once with DB_ASYNC=true:
+
+    DB_ASYNC=false uvicorn backend.main:app --port 8001
+    python -m backend.tests.manual_load_async --url http://127.0.0.1:8001 --clients 500
+
+    DB_ASYNC=true uvicorn backend.main:app --port 8001
+    python -m backend.tests.manual_load_async --url http://127.0.0.1:8001 --clients 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+PATHS = ["/menu/?limit=20", "/restaurants/?limit=20", "/tables/"]
+
+async def client_loop(client, deadline, latencies, errors):
+    i = 0
+    while time.perf_counter() < deadline:
+        path = PATHS[i % len(PATHS)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            res = await client.get(path)
+            if res.status_code != 200:
+                errors.append(res.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+async def run(url, clients, duration):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        latencies, errors = [], []
+        deadline = time.perf_counter() + duration
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, deadline, latencies, errors) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    print(f"{url}  clients={clients}  duration={elapsed:.1f}s")
+    print(f"Requests OK: {len(latencies)}  errors: {len(errors)}")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} req/s")
+    if latencies:
+        latencies.sort()
+        print(f"Latency p50={statistics.median(latencies) * 1000:.1f}ms  p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.clients, args.duration))
@@ -144,3 +144,17 @@ def test_checkout_with_coupon():
     res = client.post("/orders/checkout", json=checkout_payload_fail, headers=user_headers)
     assert res.status_code == 400 # Should fail now as per updated service logic
     assert "Minimum order value" in res.json()["message"]
+
+    # Coupon is validated before writing, so no orphaned order lines are left behind
+    db = TestingSessionLocal()
+    assert db.query(models.Order).filter(models.Order.food_id == food_id2).count() == 0
+    assert db.query(models.Order).filter(models.Order.food_id == food_id).count() == 1
+    db.close()
+
+    # Nothing valid in the cart: rejected, no empty checkout header
+    res = client.post("/orders/checkout", json={"items": [{"food_id": 99999, "quantity": 1}, {"food_id": food_id, "variant_id": 99999, "quantity": 1}]}, headers=user_headers)
+    assert res.status_code == 400
+    assert res.json()["message"] == "No valid items in cart"
+    db = TestingSessionLocal()
+    assert db.query(models.OrderBatch).filter(models.OrderBatch.item_count == 0).count() == 0
+    db.close()
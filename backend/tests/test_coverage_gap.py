@@ -282,8 +282,11 @@ def test_food_with_images():
         ("images", ("img2.jpg", b"fake2", "image/jpeg"))
     ]
     
-    # Mock Storage
-    with patch("backend.common.utils.minio_service.MinioService.upload_file", side_effect=["http://minio/1.jpg", "http://minio/2.jpg"]):
+    # Mock Storage (uploads run concurrently and are keyed by content hash, so map by content)
+    def fake_upload(file_data, file_name, content_type, size=None, cache_control=None):
+        return f"http://minio/{file_data.read()[-1:].decode()}.jpg"
+
+    with patch("backend.common.utils.minio_service.MinioService.upload_file", side_effect=fake_upload):
         res = client.post(
             "/menu/", # Updated to root endpoint
             data={"food_data": json.dumps(food_data)}, 
@@ -296,3 +299,505 @@ def test_food_with_images():
         assert len(data["images"]) == 2
         assert data["image_url"] == "http://minio/1.jpg" # Primary set to first
         assert data["images"][1]["image_url"] == "http://minio/2.jpg"
+
+def test_user_cache_hits_and_invalidation():
+    from backend.common.utils.security import user_cache
+    admin_headers, _ = get_auth_headers(role=1)
+    
+    # First call resolves from DB, second is served from cache
+    res = client.get("/auth/me", headers=admin_headers)
+    assert res.status_code == 200
+    res = client.get("/auth/me", headers=admin_headers)
+    assert res.status_code == 200
+    assert user_cache.hits >= 1
+    
+    # Mutations invalidate the cached identity
+    res = client.put("/auth/profile", json={"name": "Renamed Admin"}, headers=admin_headers)
+    assert res.status_code == 200
+    res = client.get("/auth/me", headers=admin_headers)
+    assert res.json()["data"]["name"] == "Renamed Admin"
+    
+    res = client.get("/auth/cache-stats", headers=admin_headers)
+    assert res.status_code == 200
+    stats = res.json()["data"]
+    assert stats["hits"] >= 2
+    assert stats["misses"] >= 1
+
+def test_admin_db_pool_status():
+    admin_headers, _ = get_auth_headers(role=1)
+    user_headers, _ = get_auth_headers(role=0)
+    
+    res = client.get("/admin/db-pool", headers=user_headers)
+    assert res.status_code == 400 # Not a kitchen/admin user
+    
+    res = client.get("/admin/db-pool", headers=admin_headers)
+    assert res.status_code == 200
+    data = res.json()["data"]
+    assert "pool_class" in data
+    assert "wait_histogram" in data
+
+def test_rating_aggregates_and_consistency_check():
+    headers, user_id = get_auth_headers(role=0)
+    db = TestingSessionLocal()
+    food = models.Food(food_name="Dosa", food_category="South", food_price=80, food_quantity=10, restaurant_id=1)
+    db.add(food)
+    db.commit()
+    orders = [models.Order(food_id=food.food_id, user_id=user_id, quantity=1, price_at_order=80, restaurant_id=1) for _ in range(2)]
+    db.add_all(orders)
+    db.commit()
+    order_ids = [o.id for o in orders]
+    food_id = food.food_id
+    db.close()
+
+    res = client.post("/orders/feedback", json={"order_id": order_ids[0], "rate": 5, "comment": "Great"}, headers=headers)
+    assert res.json()["data"]["new_rating"] == 5.0
+    res = client.post("/orders/feedback", json={"order_id": order_ids[1], "rate": 2, "comment": "Cold"}, headers=headers)
+    assert res.json()["data"]["new_rating"] == 3.5
+
+    # Re-rating replaces the old score instead of adding a review
+    res = client.post("/orders/feedback", json={"order_id": order_ids[1], "rate": 4, "comment": "Better"}, headers=headers)
+    assert res.json()["data"]["new_rating"] == 4.5
+
+    db = TestingSessionLocal()
+    food = db.query(models.Food).get(food_id)
+    assert (food.rating_sum, food.rating_count, food.rating) == (9, 2, 4.5)
+    restaurant = db.query(models.Restaurant).get(1)
+    assert (restaurant.rating_sum, restaurant.rating_count, restaurant.rating) == (9, 2, 4.5)
+
+    from backend.common.utils import ratings
+    assert ratings.check_consistency(db) == []
+
+    # Drift is reported and repaired, and the restaurant's cached catalog invalidated
+    food.rating_sum, food.rating_count = 0, 0
+    db.commit()
+    version = db.get(models.CatalogVersion, 1).version
+    drift = ratings.check_consistency(db, repair=True)
+    assert drift == [{"kind": "food", "id": food_id, "stored": (0, 0), "expected": (9, 2)}]
+    db.expire_all()
+    assert (food.rating_sum, food.rating_count, food.rating) == (9, 2, 4.5)
+    assert db.get(models.CatalogVersion, 1).version == version + 1
+    assert ratings.check_consistency(db) == []
+    db.close()
+
+def test_concurrent_uploads_to_fake_object_store():
+    import asyncio
+    import hashlib
+    import time
+    from fastapi import UploadFile
+    from backend.common.utils.minio_service import MinioService, FakeObjectStore
+    from backend.common.utils.storage import StorageService
+
+    store = FakeObjectStore(latency=0.2)
+    previous = MinioService._client
+    MinioService.use_client(store)
+    try:
+        files = [UploadFile(io.BytesIO(f"image-{i}".encode()), filename=f"img{i}.jpg", size=7) for i in range(4)]
+        start = time.perf_counter()
+        urls = [s.url for s in asyncio.run(StorageService.store_images(files))]
+        elapsed = time.perf_counter() - start
+
+        # Content-hash keys, input order kept
+        digests = [hashlib.sha256(f"image-{i}".encode()).hexdigest() for i in range(4)]
+        assert urls == [MinioService.public_url(f"{d}/original.jpg") for d in digests]
+        assert elapsed < 0.6 # 4 x 0.2s uploads overlap
+        data, _, metadata = store.objects[(MinioService._bucket, f"{digests[2]}/original.jpg")]
+        assert data == b"image-2"
+        assert metadata["Cache-Control"] == "public, max-age=31536000, immutable"
+
+        # Unknown length is streamed in parts without seeking
+        class ForwardOnly(io.RawIOBase):
+            def __init__(self, data):
+                self._data = io.BytesIO(data)
+            def read(self, n=-1):
+                return self._data.read(n)
+            def seek(self, *args):
+                raise AssertionError("stream was seeked")
+
+        store.latency = 0
+        MinioService.upload_file(ForwardOnly(b"x" * 1000), "stream.jpg", "image/jpeg")
+        assert store.objects[(MinioService._bucket, "stream.jpg")][0] == b"x" * 1000
+    finally:
+        MinioService._client = previous
+
+def test_image_derivatives_generated_off_request_path():
+    import json
+    from PIL import Image
+    from backend.common.utils.minio_service import MinioService, FakeObjectStore
+    from backend.common.utils.images import image_processor, DERIVATIVE_FORMATS
+    admin_headers, _ = get_auth_headers(role=1)
+
+    photo = io.BytesIO()
+    Image.new("RGB", (1200, 800), (200, 80, 40)).save(photo, "JPEG")
+    store = FakeObjectStore()
+    previous = (MinioService._client, image_processor.session_factory)
+    MinioService.use_client(store)
+    image_processor.session_factory = TestingSessionLocal
+    try:
+        food_data = {"food_name": "Paneer Tikka", "food_category": "Starters", "food_price": 220, "food_quantity": 10}
+        res = client.post(
+            "/menu/",
+            data={"food_data": json.dumps(food_data)},
+            files=[("images", ("tikka.jpg", photo.getvalue(), "image/jpeg"))],
+            headers=admin_headers
+        )
+        assert res.status_code == 200
+        food_id = res.json()["data"]["food_id"]
+        image_processor.flush(timeout=30)
+
+        db = TestingSessionLocal()
+        food = db.query(models.Food).get(food_id)
+        image = food.images[0]
+        assert "webp" in DERIVATIVE_FORMATS
+        assert set(image.derivatives) == set(DERIVATIVE_FORMATS)
+        assert set(image.derivatives["webp"]) == {"160", "480", "960"}
+        assert food.thumbnail_url == image.derivatives["webp"]["160"]
+        db.close()
+
+        key = food.thumbnail_url.split(f"/{MinioService._bucket}/", 1)[1]
+        data, content_type, metadata = store.objects[(MinioService._bucket, key)]
+        assert content_type == "image/webp"
+        assert metadata["Cache-Control"] == "public, max-age=31536000, immutable"
+        assert Image.open(io.BytesIO(data)).size == (160, 107)
+
+        # Standalone upload returns the derivative URLs it will publish
+        res = client.post("/menu/upload-image", files={"file": ("banner.jpg", photo.getvalue(), "image/jpeg")}, headers=admin_headers)
+        assert res.json()["data"]["image_url"] == image.image_url # Same content, same key
+        assert res.json()["data"]["derivatives"]["webp"]["160"] == food.thumbnail_url
+        image_processor.flush(timeout=30)
+
+        # A food created afterwards from that URL (in any worker) finds the recorded derivatives
+        banner_url = res.json()["data"]["image_url"]
+        food_data = {"food_name": "Tikka Roll", "food_category": "Rolls", "food_price": 150, "food_quantity": 5, "image_url": banner_url}
+        res = client.post("/menu/", data={"food_data": json.dumps(food_data)}, headers=admin_headers)
+        assert res.json()["data"]["thumbnail_url"] == food.thumbnail_url
+    finally:
+        MinioService._client, image_processor.session_factory = previous
+
+def test_home_screen_cache_and_conditional_get():
+    from backend.core_restaurant.service import home_cache
+    admin_headers, _ = get_auth_headers(role=1)
+    home_cache.invalidate()
+    db = TestingSessionLocal()
+    db.add(models.Food(food_name="Idli", food_category="South", food_price=40, food_quantity=10, restaurant_id=1))
+    db.commit()
+    db.close()
+
+    res = client.get("/home", params={"lat": 12.9716, "lng": 77.5946})
+    assert res.status_code == 200
+    data = res.json()["data"]
+    assert set(data) == {"banners", "collections", "restaurants", "filters"}
+    assert data["filters"]["total_items"] == 1
+    etag = res.headers["etag"]
+
+    # Same location cell: served from cache, 304 when the client holds the ETag
+    hits = home_cache.hits
+    res = client.get("/home", params={"lat": 12.9719, "lng": 77.5941}, headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.content == b""
+    assert home_cache.hits == hits + 1
+
+    # Creating a banner invalidates every cached screen
+    res = client.post("/restaurants/marketing/banners", json={"image_url": "http://img/b.jpg", "title": "50% Off"}, headers=admin_headers)
+    assert res.status_code == 200
+    res = client.get("/home", params={"lat": 12.9716, "lng": 77.5946}, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["etag"] != etag
+    assert [b["title"] for b in res.json()["data"]["banners"]] == ["50% Off"]
+
+    # So does a food write: the screen carries the menu filter summary
+    etag = res.headers["etag"]
+    import json
+    res = client.post("/menu/", data={"food_data": json.dumps({"food_name": "Vada", "food_category": "Snacks", "food_price": 30, "food_quantity": 10})}, headers=admin_headers)
+    assert res.status_code == 200
+    res = client.get("/home", params={"lat": 12.9716, "lng": 77.5946}, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.json()["data"]["filters"]["total_items"] == 2
+
+def test_catalog_conditional_get(query_budget):
+    admin_headers, _ = get_auth_headers(role=1)
+    res = client.get("/menu/", params={"restaurant_id": 1})
+    assert res.status_code == 200
+    etag = res.headers["etag"]
+
+    # Unchanged catalog: 304 after the version lookup alone
+    with query_budget(1):
+        res = client.get("/menu/", params={"restaurant_id": 1}, headers={"If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.content == b""
+    # Other listings of the same catalog have their own ETag
+    res = client.get("/menu/", params={"restaurant_id": 1, "sort_by": "rating"}, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+
+    # A menu write bumps the restaurant's version
+    client.post("/menu/", data={"food_data": '{"food_name": "Vada", "food_category": "South", "food_price": 30, "food_quantity": 5}'}, headers=admin_headers)
+    res = client.get("/menu/", params={"restaurant_id": 1}, headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert [f["food_name"] for f in res.json()["data"]] == ["Vada"]
+    res = client.get("/menu/", params={"restaurant_id": 1}, headers={"If-Modified-Since": res.headers["last-modified"]})
+    assert res.status_code == 304
+
+    # Tables and marketing are versioned by their own writes
+    etag = client.get("/tables/").headers["etag"]
+    assert client.get("/tables/", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/tables/", json={"name": 7, "seat": 4}, headers=admin_headers)
+    assert client.get("/tables/", headers={"If-None-Match": etag}).status_code == 200
+
+    etag = client.get("/restaurants/marketing/banners").headers["etag"]
+    assert client.get("/restaurants/marketing/banners", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/restaurants/marketing/banners", json={"image_url": "http://img/b.jpg"}, headers=admin_headers)
+    assert client.get("/restaurants/marketing/banners", headers={"If-None-Match": etag}).status_code == 200
+
+def read_stream(path, action, headers=None):
+    """GET an SSE stream while `action` runs on another thread, then end the stream."""
+    import threading, time
+    from backend.common.utils.order_events import broker
+
+    def run():
+        try:
+            deadline = time.monotonic() + 5
+            while broker.subscriber_count() == 0 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            action()
+        finally:
+            broker.close_all() # Queued behind the events action() published
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    res = client.get(path, headers=headers)
+    thread.join()
+    assert broker.subscriber_count() == 0
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+    import json
+    return [json.loads(line[6:]) for line in res.text.splitlines() if line.startswith("data: ")]
+
+def test_order_and_kitchen_streams():
+    admin_headers, _ = get_auth_headers(role=1)
+    user_headers, user_id = get_auth_headers(role=0)
+    import json
+    res = client.post("/menu/", data={"food_data": json.dumps({"food_name": "S", "food_category": "T", "food_price": 10, "food_quantity": 10})}, headers=admin_headers)
+    food_id = res.json()["data"]["food_id"]
+
+    # Kitchen screen sees new orders; EventSource passes the token as a query parameter
+    token = admin_headers["Authorization"].split()[1]
+    created = {}
+    def place_order():
+        created["id"] = client.post("/orders/", json={"food_id": food_id, "quantity": 1}, headers=user_headers).json()["data"]["id"]
+    events = read_stream(f"/kitchen/stream?restaurant_id=1&access_token={token}", place_order)
+    assert [(e["type"], e["order_id"], e["status"]) for e in events] == [("order.created", created["id"], "created")]
+
+    # Customer sees status changes of their own orders only
+    def progress():
+        client.put(f"/kitchen/orders/{created['id']}/status", json={"status": "pending"}, headers=admin_headers)
+    events = read_stream("/orders/stream", progress, headers=user_headers)
+    assert [(e["type"], e["order_id"], e["status"], e["user_id"]) for e in events] == [("order.status", created["id"], "pending", user_id)]
+
+    assert client.get("/orders/stream").status_code == 401
+    assert client.get(f"/kitchen/stream", headers=user_headers).status_code == 400
+
+def test_postgres_order_events_off_the_commit_path():
+    import queue, threading, time
+    from types import SimpleNamespace
+    from backend.common.utils.order_events import PostgresBackend
+
+    # Stand-in for a psycopg 3 engine: NOTIFY payloads come back through Connection.notifies()
+    notifications, senders = queue.Queue(), []
+    class Conn:
+        def __enter__(self):
+            senders.append(threading.current_thread().name)
+            return self
+        def __exit__(self, *exc):
+            pass
+        def execute(self, stmt):
+            notifications.put(SimpleNamespace(payload=list(stmt.compile().params.values())[1]))
+        def commit(self):
+            pass
+    class Cursor:
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            pass
+        def execute(self, sql):
+            assert sql == "LISTEN order_events"
+    class Driver:
+        autocommit = False
+        def cursor(self):
+            return Cursor()
+        def notifies(self, timeout):
+            try:
+                yield notifications.get(timeout=timeout)
+            except queue.Empty:
+                return
+    bind = SimpleNamespace(connect=Conn, raw_connection=lambda: SimpleNamespace(driver_connection=Driver(), invalidate=lambda: None))
+
+    delivered = []
+    backend = PostgresBackend(SimpleNamespace(deliver=delivered.append), bind)
+    backend.POLL_SECONDS = 0.05
+    backend.start()
+    try:
+        backend.publish([{"type": "order.created", "order_id": 1}])
+        deadline = time.monotonic() + 5
+        while not delivered and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        backend.stop()
+    assert delivered == [{"type": "order.created", "order_id": 1}]
+    # The committing thread only enqueued; the NOTIFY went out on the publisher thread
+    assert senders == ["order-events-publisher"]
+
+def test_order_state_machine_and_bulk_transitions():
+    from unittest.mock import patch
+    from backend.common.utils.notification_service import notification_dispatcher
+    admin_headers, _ = get_auth_headers(role=1)
+    user_headers, user_id = get_auth_headers(role=0)
+    import json
+    res = client.post("/menu/", data={"food_data": json.dumps({"food_name": "B", "food_category": "T", "food_price": 10, "food_quantity": 10})}, headers=admin_headers)
+    food_id = res.json()["data"]["food_id"]
+
+    res = client.post("/orders/checkout", json={"items": [{"food_id": food_id, "quantity": q} for q in (1, 2, 3)]}, headers=user_headers)
+    batch_id = res.json()["data"]["batch_id"]
+    ids = sorted(o["id"] for o in client.get("/orders/", headers=user_headers).json()["data"])
+
+    # Whole batch in one statement, one push for the batch
+    with patch.object(notification_dispatcher, "notify_user") as notify:
+        res = client.put("/kitchen/orders/status", json={"status": "progress", "batch_id": batch_id}, headers=admin_headers)
+    assert res.status_code == 200, res.text
+    assert res.json()["data"]["updated"] == ids
+    assert notify.call_count == 1
+    assert notify.call_args.args[0] == user_id
+    assert notify.call_args.kwargs["data"] == {"order_id": str(ids[0]), "status": "progress", "batch_id": batch_id, "order_ids": ",".join(map(str, ids))}
+
+    # Backwards, stale expectation, unknown status
+    url = f"/kitchen/orders/{ids[0]}/status"
+    assert client.put(url, json={"status": "pending"}, headers=admin_headers).status_code == 409
+    assert client.put(url, json={"status": "finished", "expected_status": "created"}, headers=admin_headers).status_code == 409
+    assert client.put(url, json={"status": "cooking"}, headers=admin_headers).status_code == 400
+    assert client.put("/kitchen/orders/99999/status", json={"status": "finished"}, headers=admin_headers).status_code == 404
+    res = client.put(url, json={"status": "delivered", "expected_status": "progress"}, headers=admin_headers)
+    assert res.status_code == 200
+    assert res.json()["data"]["status"] == "delivered"
+
+    # Lines that can't move are reported, not overwritten
+    res = client.put("/kitchen/orders/status", json={"status": "cancelled", "order_ids": [ids[0], ids[1], 99999]}, headers=admin_headers)
+    result = res.json()["data"]
+    assert result["updated"] == [ids[1]]
+    assert result["skipped"] == [{"id": ids[0], "status": "delivered"}]
+    assert result["not_found"] == [99999]
+
+    assert client.put("/kitchen/orders/status", json={"status": "progress"}, headers=admin_headers).status_code == 400
+
+def test_order_batch_headers_for_history():
+    admin_headers, _ = get_auth_headers(role=1)
+    user_headers, user_id = get_auth_headers(role=0)
+    import json
+    res = client.post("/menu/", data={"food_data": json.dumps({"food_name": "H", "food_category": "T", "food_price": 10, "food_quantity": 10})}, headers=admin_headers)
+    food_id = res.json()["data"]["food_id"]
+
+    batch_id = client.post("/orders/checkout", json={"items": [{"food_id": food_id, "quantity": 2}, {"food_id": food_id, "quantity": 1}]}, headers=user_headers).json()["data"]["batch_id"]
+    single = client.post("/orders/", json={"food_id": food_id, "quantity": 4}, headers=user_headers).json()["data"]
+
+    res = client.get("/orders/batches?limit=1", headers=user_headers)
+    assert res.status_code == 200, res.text
+    assert [b["batch_id"] for b in res.json()["data"]] == [single["batch_id"]] # Newest first
+    older = client.get(f"/orders/batches?limit=1&cursor={res.headers['X-Next-Cursor']}", headers=user_headers).json()["data"]
+    assert [(b["batch_id"], b["item_count"], b["subtotal"], b["final_amount"], b["status"]) for b in older] == [(batch_id, 2, 30.0, 30.0, "created")]
+    assert "orders" not in older[0]
+
+    # Header status follows the lines: least advanced one that isn't cancelled
+    detail = client.get(f"/orders/batches/{batch_id}", headers=user_headers).json()["data"]
+    first, second = sorted(o["id"] for o in detail["orders"])
+    client.put("/kitchen/orders/status", json={"status": "progress", "batch_id": batch_id}, headers=admin_headers)
+    client.put(f"/kitchen/orders/{first}/status", json={"status": "cancelled"}, headers=admin_headers)
+    client.put(f"/kitchen/orders/{second}/status", json={"status": "finished"}, headers=admin_headers)
+    detail = client.get(f"/orders/batches/{batch_id}", headers=user_headers).json()["data"]
+    assert detail["status"] == "finished"
+    assert [(o["id"], o["status"]) for o in detail["orders"]] == [(first, "cancelled"), (second, "finished")]
+
+    db = TestingSessionLocal()
+    other = models.User(name="Other", phone_number="7777777777", role=0)
+    db.add(other)
+    db.commit()
+    from backend.common.utils import security
+    other_headers = {"Authorization": f"Bearer {security.create_access_token(data={'sub': str(other.id)})}"}
+    db.close()
+    assert client.get(f"/orders/batches/{batch_id}", headers=other_headers).status_code == 403
+    assert client.get("/orders/batches", headers=other_headers).json()["data"] == []
+    assert client.get("/orders/batches/unknown", headers=user_headers).status_code == 404
+
+    # Checkouts placed before headers existed get them at startup
+    from backend.common.utils.seed_restaurant import backfill_order_batches
+    db = TestingSessionLocal()
+    db.query(models.OrderBatch).delete()
+    db.commit()
+    assert backfill_order_batches(db) == 2
+    rebuilt = db.query(models.OrderBatch).filter(models.OrderBatch.batch_id == batch_id).one()
+    assert (rebuilt.item_count, rebuilt.subtotal, rebuilt.status, rebuilt.user_id) == (2, 30.0, "finished", user_id)
+    db.close()
+
+def test_bill_aggregate_coupons_and_snapshots(query_budget):
+    admin_headers, _ = get_auth_headers(role=1)
+    user_headers, user_id = get_auth_headers(role=0)
+    import json
+    from datetime import date, datetime, timedelta
+    res = client.post("/menu/", data={"food_data": json.dumps({"food_name": "B", "food_category": "T", "food_price": 10, "food_quantity": 10})}, headers=admin_headers)
+    food_id = res.json()["data"]["food_id"]
+    db = TestingSessionLocal()
+    db.add(models.Coupon(code="TENOFF", discount_type="percentage", discount_value=10, min_order_value=0,
+                         valid_until=datetime.now() + timedelta(days=1), is_active=True))
+    db.commit()
+    db.close()
+
+    batch_id = client.post("/orders/checkout", json={"items": [{"food_id": food_id, "quantity": 2}], "coupon_code": "TENOFF"}, headers=user_headers).json()["data"]["batch_id"]
+    single = client.post("/orders/", json={"food_id": food_id, "quantity": 1}, headers=user_headers).json()["data"]
+    # Bills use the price the line was placed at, not today's menu price
+    db = TestingSessionLocal()
+    db.query(models.Food).filter(models.Food.food_id == food_id).update({"food_price": 99})
+    db.commit()
+    db.close()
+
+    bill = client.get(f"/bill/{user_id}", headers=user_headers).json()["data"]
+    assert (bill["order_count"], bill["subtotal"], bill["discount_amount"], bill["total_amount"]) == (2, 30.0, 0.0, 30.0)
+    bill = client.get(f"/bill/{user_id}?batch_id={batch_id}", headers=user_headers).json()["data"]
+    assert (bill["subtotal"], bill["discount_amount"], bill["total_amount"], bill["coupon_code"]) == (20.0, 2.0, 18.0, "TENOFF")
+    bill = client.get(f"/bill/{user_id}?coupon_code=TENOFF", headers=user_headers).json()["data"]
+    assert (bill["discount_amount"], bill["total_amount"]) == (3.0, 27.0)
+    assert client.get(f"/bill/{user_id}?coupon_code=DIWALI10", headers=user_headers).status_code == 400
+    assert client.get(f"/bill/{user_id}?batch_id=unknown", headers=user_headers).status_code == 404
+    tomorrow = date.today() + timedelta(days=1)
+    assert client.get(f"/bill/{user_id}?date_from={tomorrow}", headers=user_headers).json()["data"]["order_count"] == 0
+
+    # Repeated bill: served from the stored invoice, no line aggregate
+    with query_budget(3) as counter:
+        assert client.get(f"/bill/{user_id}", headers=user_headers).json()["data"]["total_amount"] == 30.0
+    assert not any("orders_archive" in s for s in counter.statements)
+
+    # Cancelling a line or placing a new order drops the stored bills
+    client.put(f"/kitchen/orders/{single['id']}/status", json={"status": "cancelled"}, headers=admin_headers)
+    assert client.get(f"/bill/{user_id}", headers=user_headers).json()["data"]["total_amount"] == 20.0
+    client.post("/orders/", json={"food_id": food_id, "quantity": 1}, headers=user_headers)
+    bill = client.get(f"/bill/{user_id}", headers=user_headers).json()["data"]
+    assert (bill["order_count"], bill["total_amount"]) == (2, 119.0)
+
+    # Coupon edits and deactivation apply to stored bills too
+    db = TestingSessionLocal()
+    db.query(models.Coupon).filter(models.Coupon.code == "TENOFF").update({"discount_value": 20})
+    db.commit()
+    bill = client.get(f"/bill/{user_id}?coupon_code=TENOFF", headers=user_headers).json()["data"]
+    assert (bill["discount_amount"], bill["total_amount"]) == (23.8, 95.2)
+    db.query(models.Coupon).filter(models.Coupon.code == "TENOFF").update({"is_active": False})
+    db.commit()
+    db.close()
+    assert client.get(f"/bill/{user_id}?coupon_code=TENOFF", headers=user_headers).status_code == 400
+
+    # A checkout committing between the aggregate and the invoice insert leaves a stale version
+    from backend.core_restaurant.billing_service import BillingService
+    totals = BillingService._totals
+    def racing_totals(self, *args):
+        result = totals(self, *args)
+        client.post("/orders/", json={"food_id": food_id, "quantity": 1}, headers=user_headers)
+        return result
+    with patch.object(BillingService, "_totals", racing_totals):
+        bill = client.get(f"/bill/{user_id}?date_from={date.today()}", headers=user_headers).json()["data"]
+    assert bill["order_count"] == 2
+    bill = client.get(f"/bill/{user_id}?date_from={date.today()}", headers=user_headers).json()["data"]
+    assert (bill["order_count"], bill["total_amount"]) == (3, 218.0)
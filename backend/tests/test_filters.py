@@ -60,6 +60,47 @@ def test_menu_meta():
     assert data["max_price"] == 200.0
     assert "Italian" in data["categories"]
     assert "American" in data["categories"]
+    assert {"category": "Italian", "count": 2} in data["category_counts"]
+    assert data["veg_count"] == 2
+    assert data["non_veg_count"] == 1
+
+def test_menu_meta_is_per_restaurant_and_incremental():
+    db = TestingSessionLocal()
+    db.add(models.Restaurant(id=2, name="Other", address="Loc", is_active=True))
+    db.add(models.Food(restaurant_id=2, food_name="Sushi", food_category="Japanese", food_price=900.0, food_quantity=5, is_veg=False))
+    db.commit()
+
+    res = client.get("/menu/filters?restaurant_id=2")
+    data = res.json()["data"]
+    assert data["categories"] == ["Japanese"]
+    assert data["min_price"] == 900.0 and data["max_price"] == 900.0
+
+    # Restaurant 1 is unaffected
+    data = client.get("/menu/filters").json()["data"]
+    assert "Japanese" not in data["categories"]
+    assert data["max_price"] == 200.0
+
+    # New food through the service bumps the summary
+    from backend.core_restaurant.service import CoreRestaurantService
+    from backend.common import schemas
+    CoreRestaurantService(db).create_food(schemas.FoodCreate(
+        food_name="Tiramisu", food_category="Italian", food_price=50.0, food_quantity=5, is_veg=True, restaurant_id=1
+    ))
+    data = client.get("/menu/filters").json()["data"]
+    assert data["min_price"] == 50.0
+    assert {"category": "Italian", "count": 3} in data["category_counts"]
+    assert data["veg_count"] == 3
+
+    # Edits that move a food between categories / prices are recomputed
+    burger = db.query(models.Food).filter(models.Food.food_name == "Burger").first()
+    burger.food_category = "Italian"
+    burger.food_price = 180.0
+    db.commit()
+    db.close()
+    data = client.get("/menu/filters").json()["data"]
+    assert data["categories"] == ["Italian"]
+    assert data["max_price"] == 180.0
+    assert data["total_items"] == 4
 
 def test_menu_filtering():
     # 1. Filter by Category
@@ -92,3 +133,63 @@ def test_menu_sorting():
     data = res.json()["data"]
     assert data[0]["food_name"] == "Burger" # 5.0
     assert data[2]["food_name"] == "Pasta"  # 3.5
+
+def test_menu_search():
+    db = TestingSessionLocal()
+    db.add(models.Food(restaurant_id=1, food_name="Margherita", food_category="Italian", food_price=120.0, food_quantity=10, description="Wood fired pizza with basil"))
+    db.add(models.Food(restaurant_id=1, food_name="Garlic Bread", food_category="Italian", food_price=80.0, food_quantity=10, description="Goes well with pizza"))
+    db.commit()
+    db.close()
+
+    # Name and description both match
+    res = client.get("/menu/?search=pizza")
+    names = {f["food_name"] for f in res.json()["data"]}
+    assert names == {"Pizza", "Margherita", "Garlic Bread"}
+
+    # Typos and prefixes
+    res = client.get("/menu/?search=piza")
+    assert "Pizza" in {f["food_name"] for f in res.json()["data"]}
+    res = client.get("/menu/?search=marg")
+    assert [f["food_name"] for f in res.json()["data"]] == ["Margherita"]
+
+    # All terms must match
+    res = client.get("/menu/?search=pizza basil")
+    assert [f["food_name"] for f in res.json()["data"]] == ["Margherita"]
+
+    # Relevance: name match first, then description matches
+    res = client.get("/menu/?search=pizza&sort_by=relevance")
+    data = res.json()["data"]
+    assert data[0]["food_name"] == "Pizza"
+    assert data[0]["search_score"] > data[1]["search_score"]
+
+    # Relevance pages with a cursor
+    res = client.get("/menu/?search=pizza&sort_by=relevance&limit=2")
+    assert len(res.json()["data"]) == 2
+    cursor = res.headers["X-Next-Cursor"]
+    res = client.get(f"/menu/?search=pizza&sort_by=relevance&limit=2&cursor={cursor}")
+    assert [f["food_name"] for f in res.json()["data"]] == [data[2]["food_name"]]
+
+    # Another worker renames one food and deletes another: neither fires this process's
+    # mapper events, but both bump the restaurant's catalog version
+    from sqlalchemy import text
+    from backend.common.utils import catalog
+    db = TestingSessionLocal()
+    db.execute(text("UPDATE foods SET food_name = 'Cheese Toast' WHERE food_name = 'Garlic Bread'"))
+    db.execute(text("DELETE FROM foods WHERE food_name = 'Margherita'"))
+    catalog.bump(db, 1)
+    db.commit()
+    db.close()
+    res = client.get("/menu/?search=cheese")
+    assert [f["food_name"] for f in res.json()["data"]] == ["Cheese Toast"]
+    res = client.get("/menu/?search=pizza")
+    assert {f["food_name"] for f in res.json()["data"]} == {"Pizza", "Cheese Toast"}
+
+    # A rename that is rolled back never reaches the index
+    db = TestingSessionLocal()
+    food = db.query(models.Food).filter(models.Food.food_name == "Pizza").one()
+    food.food_name = "Calzone"
+    db.flush()
+    db.rollback()
+    db.close()
+    assert client.get("/menu/?search=calzone").json()["data"] == []
+    assert "Pizza" in {f["food_name"] for f in client.get("/menu/?search=pizza").json()["data"]}
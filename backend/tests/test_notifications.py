@@ -4,7 +4,9 @@ from backend.common import models
 from backend.common.database import Base, engine, get_db, SessionLocal
 from backend.common.utils import scheduler, notification_service
 from unittest.mock import patch, MagicMock
+from datetime import datetime
 import pytest
+import time
 
 client = TestClient(app)
 
@@ -69,3 +71,138 @@ def test_notification_send():
             
             assert success is True
             mock_send.assert_called_once()
+
+def test_dispatcher_batches_and_prunes(db_session):
+    # Two users, three devices; one token is dead
+    u1 = models.User(name="A", phone_number="1111111111", role=0)
+    u2 = models.User(name="B", phone_number="2222222222", role=0)
+    db_session.add_all([u1, u2])
+    db_session.commit()
+    db_session.add_all([
+        models.UserDevice(user_id=u1.id, fcm_token="tok_a1"),
+        models.UserDevice(user_id=u1.id, fcm_token="tok_dead"),
+        models.UserDevice(user_id=u2.id, fcm_token="tok_b1"),
+    ])
+    db_session.commit()
+    
+    sink = notification_service.FakeFCMSink(invalid_tokens={"tok_dead"}, fail_first=1)
+    dispatcher = notification_service.NotificationDispatcher(
+        session_factory=SessionLocal, sink=sink, batch_window=0.2, backoff_base=0
+    )
+    
+    # Same message for both users coalesces into one multicast
+    dispatcher.notify_users([u1.id, u2.id], "Sale", "20% off today", {"promo": "1"})
+    dispatcher.flush()
+    dispatcher.stop()
+    
+    # First call fails transiently, retry succeeds
+    assert len(sink.calls) == 2
+    assert sorted(sink.calls[1]["tokens"]) == ["tok_a1", "tok_b1", "tok_dead"]
+    assert dispatcher.stats["sent"] == 2
+    assert dispatcher.stats["pruned"] == 1
+    
+    db_session.expire_all()
+    tokens = {d.fcm_token for d in db_session.query(models.UserDevice).all()}
+    assert tokens == {"tok_a1", "tok_b1"}
+
+def test_fcm_sink_prunes_only_dead_tokens():
+    from firebase_admin import messaging, exceptions as firebase_exceptions
+    responses = [
+        MagicMock(success=True, exception=None),
+        MagicMock(success=False, exception=messaging.UnregisteredError("gone")),
+        MagicMock(success=False, exception=firebase_exceptions.InvalidArgumentError("data too big")),
+        MagicMock(success=False, exception=firebase_exceptions.UnavailableError("try later")),
+    ]
+    with patch("firebase_admin.messaging.send_each_for_multicast") as send, \
+         patch.object(notification_service, "_is_initialized", True):
+        send.return_value = MagicMock(responses=responses)
+        results = notification_service.FCMSink().send_multicast(["ok", "dead", "bad", "busy"], "T", "B", {"k": "v"})
+    # A rejected payload is a send failure, not a dead device
+    assert results == [notification_service.SEND_OK, notification_service.SEND_INVALID,
+                       notification_service.SEND_REJECTED, notification_service.SEND_RETRY]
+
+def test_cancel_stale_orders_in_chunks(db_session):
+    from datetime import datetime, timedelta
+    from backend.common import jobs
+
+    user = models.User(name="A", phone_number="1111111111", role=0)
+    db_session.add(user)
+    db_session.commit()
+
+    old = datetime.utcnow() - timedelta(hours=2)
+    db_session.add_all([models.Order(user_id=user.id, quantity=1, status="created", created_at=old) for _ in range(25)])
+    db_session.add(models.Order(user_id=user.id, quantity=1, status="pending", created_at=old))
+    db_session.add_all([models.Order(user_id=user.id, quantity=1, status="created") for _ in range(2)])
+    db_session.commit()
+
+    batches = []
+    threshold = datetime.utcnow() - timedelta(minutes=30)
+    assert jobs.cancel_stale_orders(db_session, threshold, batch_size=10, on_batch=batches.append) == 25
+    assert [len(b) for b in batches] == [10, 10, 5]
+    assert all(row.user_id == user.id for batch in batches for row in batch)
+
+    db_session.expire_all()
+    statuses = [o.status for o in db_session.query(models.Order).order_by(models.Order.id)]
+    assert statuses == ["cancelled"] * 25 + ["pending"] + ["created"] * 2
+
+    # Job feeds the cancelled rows into the notification path: one push per checkout
+    db_session.add_all([models.Order(user_id=user.id, batch_id="stale", quantity=1, status="created", created_at=old) for _ in range(3)])
+    db_session.commit()
+    with patch.object(notification_service.notification_dispatcher, "notify_user") as notify:
+        jobs.cancel_pending_orders_job()
+    assert notify.call_count == 1
+    assert notify.call_args.args[0] == user.id
+    assert notify.call_args.kwargs["data"]["status"] == "cancelled"
+    assert notify.call_args.kwargs["data"]["batch_id"] == "stale"
+    assert len(notify.call_args.kwargs["data"]["order_ids"].split(",")) == 3
+    assert notify.call_args.kwargs["body"] == "Your order (3 items) is now cancelled because it wasn't confirmed in time."
+
+def test_scheduler_leader_lease(db_session):
+    elected = []
+    a = scheduler.LeaderElector(engine, name="test", ttl=30, on_elected=lambda: elected.append("a"))
+    b = scheduler.LeaderElector(engine, name="test", ttl=30, on_elected=lambda: elected.append("b"))
+
+    assert a.check() is True
+    assert b.check() is False
+    assert a.check() is True # Renewal keeps it
+    assert elected == ["a"]
+
+    # Graceful release hands over on the next check
+    a.stop()
+    assert b.check() is True
+
+    # An expired lease is taken over
+    db_session.query(models.SchedulerLease).filter(models.SchedulerLease.name == "test").update({"expires_at": datetime(2000, 1, 1)})
+    db_session.commit()
+    assert a.check() is True
+    assert b.check() is False
+    assert elected == ["a", "b", "a"]
+
+def test_scheduler_job_metrics():
+    from apscheduler.schedulers.background import BackgroundScheduler
+    import threading
+
+    done = threading.Event()
+    caller = {}
+    def job():
+        caller["thread"] = threading.current_thread().name
+        done.set()
+
+    metrics = scheduler.JobMetrics()
+    sched = BackgroundScheduler(executors={"default": scheduler.TimedThreadPoolExecutor(metrics, 2)})
+    metrics.attach(sched)
+    sched.add_job(job, "date", id="quick")
+    sched.start()
+    try:
+        assert done.wait(5)
+        for _ in range(50):
+            if metrics.snapshot().get("quick", {}).get("runs"):
+                break
+            time.sleep(0.05)
+    finally:
+        sched.shutdown()
+
+    stats = metrics.snapshot()["quick"]
+    assert stats["runs"] == 1 and stats["errors"] == 0
+    assert stats["last_duration_ms"] is not None and stats["last_lag_ms"] is not None
+    assert caller["thread"] != threading.main_thread().name